@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the context pipeline: replays sessions through VibeCoderContextManager with
+stub_lm_server.py standing in for the LM Studio summarizer (separate process, no GPU needed).
+
+For every turn the user message is prepared with prepare_prompt_for_lm_studio, then the user and
+assistant messages are appended, like a real chat loop. Reported per (mode, session length):
+  - prompt-build latency p50 / p95 / max
+  - summarizer calls (total, per turn, per prompt) and stub-side failures
+  - tokens sent to the chat model vs. sending the full history, summed over built prompts
+  - bytes read / written through syscalls by this process (rchar/wchar, page-cache hits included,
+    socket traffic to the stub subtracted; Linux): what the history backend asks the OS to move,
+    not what reaches the disk
+
+  python3 bench_context_pipeline.py                                    # 10, 100, 1000 turns, all modes
+  python3 bench_context_pipeline.py --turns 10000 --backend sqlite --modes hierarchical prefix_stable
+  python3 bench_context_pipeline.py --recorded ~/.vibe-coder/history/my-session.json
+  python3 bench_context_pipeline.py --stub-latency 0.5 --stub-tps 60 --fail-rate 0.2 --json
+
+With --max-prompts N only N evenly spaced turns (plus the last) build a prompt; appends still run
+every turn. The JSON backend rewrites the whole file per message, so runs above --max-json-turns
+are skipped; use --backend sqlite for 10k-turn sessions.
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+import requests  # noqa: F401  imported up front so its module reads don't count as disk I/O
+
+from vibe_coder_context_manager import VibeCoderContextManager
+
+MODES = {
+    "single": {},
+    "hierarchical": {"summary_mode": "hierarchical"},
+    "prefix_stable": {"prompt_layout": "prefix_stable"},
+    "hierarchical+prefix_stable": {"summary_mode": "hierarchical", "prompt_layout": "prefix_stable"},
+}
+SESSION = "bench-session"
+
+
+# --- sessions -------------------------------------------------------------
+
+def synthetic_turns(n):
+    """Deterministic coding-chat turns: questions, pasted code (often repeated), tracebacks, long logs."""
+    turns = []
+    for i in range(n):
+        kind = i % 5
+        if kind == 0:
+            user = f"Turn {i}: the parser in src/parser_{i % 7}.py drops the last token, can you check it?"
+        elif kind == 1:
+            user = (f"Here is the current file src/parser_{i % 7}.py:\n```python\n"
+                    + "\n".join(f"def rule_{j}(tokens):\n    return tokens[{j}:]" for j in range(12))
+                    + "\n```")
+        elif kind == 2:
+            user = ("Still failing:\nTraceback (most recent call last):\n"
+                    f'  File "src/parser_{i % 7}.py", line {40 + i % 3}, in parse\n    return rule_3(tokens)\n'
+                    "IndexError: list index out of range")
+        elif kind == 3:
+            user = "Build log:\n" + "\n".join(f"[{k:04d}] compiling module_{k}.c ... ok" for k in range(60))
+        else:
+            user = f"Turn {i}: great, now add a test for the empty-input case and keep the old behaviour."
+        assistant = (f"Reply {i}: updated rule_{i % 12} to stop at len(tokens) and added a guard for empty input. "
+                     "```python\ndef parse(tokens):\n    if not tokens:\n        return []\n    return rule_3(tokens)\n```")
+        turns.append((user, assistant))
+    return turns
+
+
+def recorded_turns(path):
+    """(user, assistant) pairs from a history JSON file in the manager's format."""
+    history = json.loads(Path(path).expanduser().read_text(encoding="utf-8"))
+    turns, pending = [], None
+    for m in history:
+        if m.get("role") == "user":
+            pending = m.get("content") or ""
+        elif m.get("role") == "assistant" and pending is not None:
+            turns.append((pending, m.get("content") or ""))
+            pending = None
+    return turns
+
+
+# --- measurement helpers --------------------------------------------------
+
+def io_counters():
+    """(bytes read, bytes written) through syscalls by this process, or None if unavailable."""
+    try:
+        fields = dict(line.split(": ") for line in Path("/proc/self/io").read_text().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_chars, counters.write_chars
+    except (ImportError, AttributeError):
+        return None
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Stub:
+    """stub_lm_server.py in a child process, so its socket I/O is not counted as ours."""
+
+    def __init__(self, latency, tps, fail_rate):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, str(HERE / "stub_lm_server.py"), "--port", str(self.port),
+             "--latency", str(latency), "--tokens-per-second", str(tps), "--fail-rate", str(fail_rate)],
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 10
+        while True:
+            try:
+                self.stats()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("stub server did not start")
+                time.sleep(0.05)
+
+    def _call(self, path, method="GET"):
+        req = urllib.request.Request(self.url + path, method=method, data=b"" if method == "POST" else None)
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return json.loads(resp.read())
+
+    def stats(self):
+        return self._call("/stats")["stats"]
+
+    def reset(self):
+        self._call("/stats/reset", "POST")
+
+    def close(self):
+        self.proc.terminate()
+        self.proc.wait(timeout=5)
+
+
+def _free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- replay ---------------------------------------------------------------
+
+def replay(turns, mode, backend, stub, max_prompts):
+    workdir = tempfile.mkdtemp(prefix="vibe-pipeline-bench-")
+    try:
+        store = None
+        if backend == "sqlite":
+            from vibe_coder_sqlite_store import SQLiteHistoryStore
+            store = SQLiteHistoryStore(str(Path(workdir) / "history.db"))
+        manager = VibeCoderContextManager(
+            history_dir=workdir, history_store=store,
+            summarizer_url=f"{stub.url}/v1/chat/completions", **MODES[mode],
+        )
+        n = len(turns)
+        step = max(1, n // max_prompts) if max_prompts else 1
+        sampled = set(range(0, n, step)) | {n - 1}
+
+        stub.reset()
+        io_before = io_counters()
+        start = time.perf_counter()
+        latencies, sent, full = [], 0, 0
+        history_tokens = 0
+        last = {}
+        for i, (user, assistant) in enumerate(turns):
+            if i in sampled:
+                t0 = time.perf_counter()
+                prompt = manager.prepare_prompt_for_lm_studio(SESSION, user)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                prompt_tokens = manager._estimate_tokens_for_messages(prompt)
+                full_tokens = history_tokens + manager._estimate_tokens(user)
+                sent += prompt_tokens
+                full += full_tokens
+                last = {"prompt_tokens": prompt_tokens, "full_tokens": full_tokens}
+            manager.add_message(SESSION, "user", user)
+            manager.add_message(SESSION, "assistant", assistant)
+            history_tokens += manager._estimate_tokens(user) + manager._estimate_tokens(assistant)
+        wall = time.perf_counter() - start
+        io_after = io_counters()
+        stats = stub.stats()
+
+        row = {
+            "mode": mode,
+            "backend": backend,
+            "turns": n,
+            "prompts_built": len(latencies),
+            "wall_s": round(wall, 2),
+            "prompt_ms_p50": round(statistics.median(latencies), 2),
+            "prompt_ms_p95": round(percentile(latencies, 95), 2),
+            "prompt_ms_max": round(max(latencies), 2),
+            "summarizer_calls": stats["requests"],
+            "summarizer_calls_per_turn": round(stats["requests"] / n, 3),
+            "summarizer_calls_per_prompt": round(stats["requests"] / len(latencies), 3),
+            "summarizer_failures": stats["failures"],
+            "summarizer_prompt_tokens": stats["prompt_tokens"],
+            "tokens_sent": sent,
+            "tokens_full_history": full,
+            "tokens_sent_ratio": round(sent / full, 3) if full else None,
+            "last_prompt_tokens": last.get("prompt_tokens"),
+            "last_full_tokens": last.get("full_tokens"),
+        }
+        if io_before and io_after:
+            # Everything we wrote to / read from the stub's socket is known from its byte counters
+            row["syscall_read_bytes"] = max(0, io_after[0] - io_before[0] - stats["bytes_out"])
+            row["syscall_write_bytes"] = max(0, io_after[1] - io_before[1] - stats["bytes_in"])
+            row["syscall_bytes_per_turn"] = round((row["syscall_read_bytes"] + row["syscall_write_bytes"]) / n)
+        else:
+            row["syscall_read_bytes"] = row["syscall_write_bytes"] = row["syscall_bytes_per_turn"] = None
+        return row
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--recorded", help="replay this history JSON file instead of synthetic sessions")
+    parser.add_argument("--max-prompts", type=int, default=300, help="build prompts on at most this many turns (0 = all)")
+    parser.add_argument("--max-json-turns", type=int, default=2000)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="stub first-token latency (s)")
+    parser.add_argument("--stub-tps", type=float, default=0.0, help="stub tokens/s (0 = instant)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="stub failure probability")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    sessions = [recorded_turns(args.recorded)] if args.recorded else [synthetic_turns(n) for n in args.turns]
+    stub = Stub(args.stub_latency, args.stub_tps, args.fail_rate)
+    rows = []
+    try:
+        for turns in sessions:
+            if not turns:
+                continue
+            for mode in args.modes:
+                if args.backend == "json" and len(turns) > args.max_json_turns:
+                    print(f"skip {mode} @ {len(turns)} turns: JSON backend rewrites the file per message "
+                          f"(raise --max-json-turns or use --backend sqlite)", file=sys.stderr)
+                    continue
+                row = replay(turns, mode, args.backend, stub, args.max_prompts)
+                rows.append(row)
+                if not args.json:
+                    print(" ".join(f"{k}={v}" for k, v in row.items()), flush=True)
+    finally:
+        stub.close()
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark vector-store backends for VibeCoderRAG on a synthetic corpus.
+For each size: index time, cold startup (fresh process: import + open + first query),
+query latency p50/p95 (all chunks and session-filtered) and disk footprint.
+Backends: mmap (brute force), mmap-ivf (after build_ivf), chroma (skipped if chromadb is not installed).
+All backends use the same HashingEmbedder, so only storage and search are compared.
+
+  python3 bench_vector_store.py                       # 1k, 10k, 100k
+  python3 bench_vector_store.py --sizes 1000 10000 --backends mmap chroma --json
+"""
+import argparse
+import importlib.util
+import json
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from vibe_coder_vector_store import ChromaVectorStore, HashingEmbedder, MmapVectorStore
+
+SESSIONS = 50
+WORDS_PER_CHUNK = 60
+QUERIES = 100
+BATCH = 1000
+
+_STARTUP_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {here!r})
+from vibe_coder_vector_store import {cls}, HashingEmbedder
+store = {cls}({path!r}, embed=HashingEmbedder())
+store.query("regex parser fix", top_k=5)
+print(time.perf_counter() - start)
+"""
+
+
+def make_corpus(size, seed=0):
+    """Chunks of code-ish words with a Zipf-like vocabulary, spread over SESSIONS sessions."""
+    rng = random.Random(seed)
+    vocab = [f"{rng.choice(['parse', 'fix', 'load', 'sync', 'cache', 'model', 'route', 'async'])}_{i}" for i in range(5000)]
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]
+    docs = [" ".join(rng.choices(vocab, weights=weights, k=WORDS_PER_CHUNK)) for _ in range(size)]
+    metas = [{"session_id": f"s{i % SESSIONS}", "role": "assistant", "timestamp": "2026-01-01T00:00:00"} for i in range(size)]
+    return docs, metas
+
+
+def make_queries(docs, seed=1):
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(docs[rng.randrange(len(docs))].split(), 6)) for _ in range(QUERIES)]
+
+
+def open_store(backend, path):
+    if backend == "chroma":
+        return ChromaVectorStore(path, embed=HashingEmbedder())
+    return MmapVectorStore(path, embed=HashingEmbedder())
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def time_queries(store, queries, session_id=None):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append([h["id"] for h in store.query(q, top_k=5, session_id=session_id)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, results
+
+
+def cold_start(backend, path):
+    cls = "ChromaVectorStore" if backend == "chroma" else "MmapVectorStore"
+    code = _STARTUP_SNIPPET.format(here=str(HERE), cls=cls, path=path)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    return wall, float(out.stdout.strip().splitlines()[-1])
+
+
+def bench(backend, size, docs, metas, queries, workdir, flat_results):
+    path = str(Path(workdir) / f"{backend}-{size}")
+    store = open_store("chroma" if backend == "chroma" else "mmap", path)
+    start = time.perf_counter()
+    for i in range(0, size, BATCH):
+        ids = [f"c{j}" for j in range(i, min(size, i + BATCH))]
+        store.add(ids, docs[i:i + BATCH], metas[i:i + BATCH])
+    if backend == "mmap-ivf":
+        store.build_ivf()
+    index_s = time.perf_counter() - start
+
+    latencies, results = time_queries(store, queries)
+    filtered, _ = time_queries(store, queries, session_id="s7")
+    wall, in_process = cold_start("chroma" if backend == "chroma" else "mmap", path)
+    row = {
+        "backend": backend,
+        "chunks": size,
+        "index_s": round(index_s, 2),
+        "startup_s": round(wall, 3),
+        "open_and_first_query_s": round(in_process, 3),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(percentile(latencies, 95), 2),
+        "filtered_p50_ms": round(statistics.median(filtered), 2),
+        "disk_mb": round(store.disk_bytes() / 1e6, 1),
+    }
+    if flat_results is not None:
+        # Share of exact top-5 hits this backend also returns (approximate search quality)
+        overlap = [len(set(a) & set(b)) / max(1, len(a)) for a, b in zip(flat_results, results)]
+        row["top5_overlap_vs_flat"] = round(statistics.mean(overlap), 3)
+    return row, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["mmap", "mmap-ivf", "chroma"],
+                        choices=["mmap", "mmap-ivf", "chroma"])
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    backends = list(args.backends)
+    if "chroma" in backends and importlib.util.find_spec("chromadb") is None:
+        print("chromadb not installed; skipping the chroma backend", file=sys.stderr)
+        backends.remove("chroma")
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="vibe-vector-bench-")
+    try:
+        for size in args.sizes:
+            docs, metas = make_corpus(size)
+            queries = make_queries(docs)
+            flat_results = None
+            for backend in backends:
+                row, results = bench(backend, size, docs, metas, queries, workdir, flat_results)
+                if backend == "mmap":
+                    flat_results = results
+                rows.append(row)
+                if not args.json:
+                    print(" ".join(f"{k}={v}" for k, v in row.items()), flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Async HTTP service around VibeCoderContextManager (same stack as the voice server: FastAPI + uvicorn).
+
+- POST /prepare_prompt         build the compressed prompt for a session (+ prefix-reuse estimate)
+- POST /messages               append a message to a session
+- GET  /history/{session_id}   full history, or a page with ?limit=&before=
+- GET  /search?q=              search across sessions
+- GET  /segments/{session_id}  archived segment summaries (hierarchical mode), ?q= to rank by relevance
+- GET  /segments/{session_id}/{index}  one segment with its raw messages
+- POST /v1/chat/completions    OpenAI-compatible proxy to LM Studio: send only the new turn plus
+                               "session_id"; the compressed prompt is built server-side, streamed
+                               through, and the user message + reply are recorded when it finishes.
+
+Connections to LM Studio are pooled in one httpx.AsyncClient. Manager calls (disk I/O, summarizer)
+run in worker threads so the event loop keeps streaming.
+
+Run: uvicorn context_server:app --host 127.0.0.1 --port 8769
+"""
+
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from vibe_coder_context_manager import VibeCoderContextManager
+
+LM_STUDIO_URL = os.environ.get("LM_STUDIO_URL", "http://localhost:1234")
+HISTORY_DIR = os.environ.get("VIBE_HISTORY_DIR", "~/.vibe-coder/history")
+# Set to a path to use the SQLite backend instead of JSON files
+HISTORY_DB = os.environ.get("VIBE_HISTORY_DB")
+# "single" or "hierarchical" (segment summaries + digest, for very long sessions)
+SUMMARY_MODE = os.environ.get("VIBE_SUMMARY_MODE", "single")
+# "default" or "prefix_stable" (keeps the prompt head identical between turns for LM Studio's prompt cache)
+PROMPT_LAYOUT = os.environ.get("VIBE_PROMPT_LAYOUT", "default")
+DEFAULT_SYSTEM_PROMPT = "You are a helpful, high-vibe coding assistant."
+UPSTREAM_TIMEOUT = httpx.Timeout(300.0, connect=5.0)
+UPSTREAM_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+# Proxied requests mark their model as used in the unload helper's memory budget (LRU); "" disables
+UNLOAD_HELPER_URL = os.environ.get("ATOM_UNLOAD_HELPER_URL", "http://localhost:8766").rstrip("/")
+TOUCH_TIMEOUT = httpx.Timeout(1.0)
+
+
+def _build_manager() -> VibeCoderContextManager:
+    store = None
+    if HISTORY_DB:
+        from vibe_coder_sqlite_store import SQLiteHistoryStore
+        store = SQLiteHistoryStore(HISTORY_DB)
+    return VibeCoderContextManager(history_dir=HISTORY_DIR, history_store=store, summary_mode=SUMMARY_MODE,
+                                   prompt_layout=PROMPT_LAYOUT)
+
+
+manager = _build_manager()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.upstream = httpx.AsyncClient(base_url=LM_STUDIO_URL, timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS)
+    try:
+        yield
+    finally:
+        await app.state.upstream.aclose()
+
+
+app = FastAPI(title="ATOM Context", version="1.0.0", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:5173",
+        "http://127.0.0.1:5173",
+        "http://localhost:4173",
+        "http://127.0.0.1:4173",
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+class PrepareRequest(BaseModel):
+    session_id: str
+    new_user_message: str
+    main_system_prompt: Optional[str] = None
+    rag_context: Optional[str] = None
+
+
+class MessageRequest(BaseModel):
+    session_id: str
+    role: str
+    content: str
+
+
+async def _prepare(session_id: str, new_user_message: str, system_prompt: Optional[str],
+                   rag_context: Optional[str] = None) -> List[Dict[str, str]]:
+    return await asyncio.to_thread(
+        manager.prepare_prompt_for_lm_studio,
+        session_id,
+        new_user_message,
+        system_prompt or DEFAULT_SYSTEM_PROMPT,
+        rag_context,
+    )
+
+
+async def _record_turn(session_id: str, user_message: str, reply: str) -> None:
+    """Append the user turn and the assistant reply together, so a failed call leaves no dangling user turn."""
+    await asyncio.to_thread(manager.add_messages, session_id, [("user", user_message), ("assistant", reply)])
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "service": "context", "upstream": LM_STUDIO_URL,
+            "backend": "sqlite" if HISTORY_DB else "json", "summary_mode": SUMMARY_MODE, "prompt_layout": PROMPT_LAYOUT}
+
+
+@app.post("/prepare_prompt")
+async def prepare_prompt(body: PrepareRequest):
+    messages = await _prepare(body.session_id, body.new_user_message, body.main_system_prompt, body.rag_context)
+    return {"messages": messages, "prefix": manager.prefix_stats(body.session_id)}
+
+
+@app.post("/messages")
+async def add_message(body: MessageRequest):
+    if body.role not in ("user", "assistant"):
+        raise HTTPException(400, "role must be user or assistant")
+    await asyncio.to_thread(manager.add_message, body.session_id, body.role, body.content)
+    return {"ok": True}
+
+
+@app.get("/history/{session_id}")
+async def get_history(session_id: str, limit: Optional[int] = None, before: Optional[int] = None):
+    if limit is None:
+        return {"messages": await asyncio.to_thread(manager.get_full_history, session_id)}
+    return await asyncio.to_thread(manager.get_history_page, session_id, limit, before)
+
+
+@app.get("/search")
+async def search(q: str, session_id: Optional[str] = None, limit: int = 20):
+    return {"results": await asyncio.to_thread(manager.search_history, q, session_id, limit)}
+
+
+@app.get("/segments/{session_id}")
+async def list_segments(session_id: str, q: Optional[str] = None, limit: int = 3):
+    if q:
+        return {"segments": await asyncio.to_thread(manager.find_segments, session_id, q, limit)}
+    return {"segments": await asyncio.to_thread(manager.list_segments, session_id)}
+
+
+@app.get("/segments/{session_id}/{index}")
+async def get_segment(session_id: str, index: int):
+    segment = await asyncio.to_thread(manager.get_segment, session_id, index)
+    if segment is None:
+        raise HTTPException(404, f"no segment {index} for session {session_id}")
+    return segment
+
+
+def _split_request(payload: Dict[str, Any]):
+    """
+    From an OpenAI-style body pick the new user message (last user message) and system prompt
+    (first system message, or "main_system_prompt"). Returns (session_id, user_message, system_prompt, rag_context).
+    """
+    session_id = payload.pop("session_id", None)
+    system_prompt = payload.pop("main_system_prompt", None)
+    rag_context = payload.pop("rag_context", None)
+    messages = payload.get("messages") or []
+    if not session_id:
+        raise HTTPException(400, "session_id is required")
+    user_messages = [m for m in messages if m.get("role") == "user"]
+    if not user_messages or not isinstance(user_messages[-1].get("content"), str):
+        raise HTTPException(400, "messages must end with a text user message")
+    if system_prompt is None:
+        system_prompt = next((m.get("content") for m in messages if m.get("role") == "system"), None)
+    return session_id, user_messages[-1]["content"], system_prompt, rag_context
+
+
+def _delta_text(line: bytes) -> Optional[str]:
+    """Content delta from one SSE line of a streamed chat completion (None for anything else)."""
+    if not line.startswith(b"data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == b"[DONE]":
+        return None
+    try:
+        chunk = json.loads(data)
+        return chunk["choices"][0].get("delta", {}).get("content") or None
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+async def _touch_model(client: httpx.AsyncClient, model: Any) -> None:
+    """Best effort: the budget only needs a rough last-used time, so failures are ignored."""
+    try:
+        await client.post(f"{UNLOAD_HELPER_URL}/budget/touch", json={"model": model, "owner": "lm_studio"},
+                          timeout=TOUCH_TIMEOUT)
+    except httpx.HTTPError:
+        pass
+
+
+_background_tasks: set = set()
+
+
+def _touch_in_background(client: httpx.AsyncClient, model: Any) -> None:
+    if not UNLOAD_HELPER_URL or not isinstance(model, str) or not model:
+        return
+    task = asyncio.create_task(_touch_model(client, model))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """
+    Drop-in for LM Studio's endpoint. Extra body fields: "session_id" (required),
+    "main_system_prompt" and "rag_context" (optional). Only the last user message of "messages"
+    is used; history comes from the session.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Invalid JSON")
+    session_id, user_message, system_prompt, rag_context = _split_request(payload)
+    payload["messages"] = await _prepare(session_id, user_message, system_prompt, rag_context)
+    client: httpx.AsyncClient = request.app.state.upstream
+    _touch_in_background(client, payload.get("model"))
+
+    try:
+        if not payload.get("stream"):
+            resp = await client.post("/v1/chat/completions", json=payload)
+            data = resp.json()
+            if resp.status_code == 200:
+                reply = (data.get("choices") or [{}])[0].get("message", {}).get("content") or ""
+                await _record_turn(session_id, user_message, reply)
+            return JSONResponse(data, status_code=resp.status_code)
+
+        # An SSE stream should not be compressed; aiter_bytes() below still decodes if it is
+        upstream = await client.send(client.build_request("POST", "/v1/chat/completions", json=payload,
+                                                          headers={"Accept-Encoding": "identity"}), stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(502, f"LM Studio unreachable at {LM_STUDIO_URL}: {e}")
+    except ValueError:
+        raise HTTPException(502, "LM Studio returned a non-JSON response")
+
+    if upstream.status_code != 200:
+        body = await upstream.aread()
+        await upstream.aclose()
+        return JSONResponse({"error": body.decode("utf-8", "replace")}, status_code=upstream.status_code)
+
+    async def relay():
+        parts: List[str] = []
+        pending = b""
+        finished = False
+        try:
+            async for chunk in upstream.aiter_bytes():
+                yield chunk
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    line = line.strip()
+                    if line == b"data: [DONE]":
+                        finished = True
+                    text = _delta_text(line)
+                    if text:
+                        parts.append(text)
+        finally:
+            # Also on client disconnect, where Starlette skips the response's background task
+            await upstream.aclose()
+        # Recorded once upstream is exhausted; a client disconnect stops the generator before this.
+        # A stream that ends without [DONE] was cut off, and a partial reply is not recorded.
+        if finished:
+            await _record_turn(session_id, user_message, "".join(parts))
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality + latency evaluation for VibeCoderRAG on a synthetic, labelled corpus (offline).
+
+The corpus is generated locally and deterministically (--seed): labelled "fix" messages (an error in
+a function of a file, its cause, the fix and a code block), each with one natural-language question
+that should retrieve it, plus distractors sharing the same vocabulary (other fixes of the same
+errors / files, chat noise) until the collection reaches the requested number of chunks.
+Everything is indexed through VibeCoderRAG.index_message, so _chunk_text and the store are exercised
+exactly as in the app. A hit is relevant if its chunk comes from the question's fix message.
+
+Reported per (backend, embedder, chunk size, collection size):
+  - recall@k: share of questions with a relevant chunk in the top k, for every --k
+  - mrr: mean reciprocal rank of the first relevant chunk (within max k)
+  - tokens injected: what rag.retrieve(top_k=--inject-k) adds to the prompt, mean / p95
+  - index latency per message and query latency, p50 / p95 (ms)
+
+  python3 eval_rag.py                                   # 1k and 10k chunks, mmap backend, hashing embedder
+  python3 eval_rag.py --sizes 1000 10000 50000 --backends mmap mmap-ivf chroma
+  python3 eval_rag.py --chunk-sizes 300 500 800 --embedders hashing-384 hashing-1024
+  python3 eval_rag.py --embedders st:all-MiniLM-L6-v2   # sentence-transformers, if installed
+  python3 eval_rag.py --out run.json && python3 eval_rag.py --compare run.json
+
+Output (--out / --json) is stable: keys sorted, fixed rounding, no timestamps or paths, so two runs
+can be diffed or compared with --compare (prints per-metric deltas for matching rows).
+"""
+import argparse
+import importlib.util
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from vibe_coder_rag import CHUNK_OVERLAP, CHUNK_SIZE, VibeCoderRAG, _chunk_text
+from vibe_coder_vector_store import IVF_MIN_ROWS, ChromaVectorStore, HashingEmbedder, MmapVectorStore
+
+FORMAT_VERSION = 1
+QUALITY_KEYS = ("mrr",)  # plus recall@k; higher is better
+LATENCY_KEYS = ("index_ms_p50", "index_ms_p95", "query_ms_p50", "query_ms_p95")
+
+FILES = [
+    "src/parser.py", "src/config.py", "src/server.py", "src/cache.py", "src/auth.py", "src/models.py",
+    "src/routes.py", "src/worker.py", "src/utils.py", "src/db.py", "src/lib/stores.js", "src/lib/api.js",
+    "src/lib/ChatInput.svelte", "src/lib/markdown.js", "scripts/deploy.sh", "scripts/backup.py",
+    "voice-server/app.py", "context_manager/rag.py", "tests/test_parser.py", "src/lib/settings.ts",
+]
+FUNCTIONS = [
+    "load_config", "parse_tokens", "handle_request", "refresh_cache", "verify_token", "save_session",
+    "render_markdown", "stream_reply", "retry_upload", "normalize_path", "merge_settings", "open_connection",
+    "schedule_job", "decode_audio", "build_index", "format_date", "read_chunk", "flush_queue",
+    "resolve_model", "split_messages", "apply_patch", "watch_files", "compress_history", "validate_input",
+]
+ERRORS = [
+    ("KeyError", "'port'", "the key is missing when the env file is empty", "fall back to dict.get with a default"),
+    ("TypeError", "'NoneType' object is not subscriptable", "the helper returns None on a cache miss",
+     "return an empty list instead of None"),
+    ("IndexError", "list index out of range", "the loop reads one past the last token",
+     "stop at len(tokens) - 1 and guard empty input"),
+    ("UnicodeDecodeError", "'utf-8' codec can't decode byte 0xff", "the file is read as text but is binary",
+     "open it in binary mode and decode with errors='replace'"),
+    ("TimeoutError", "timed out after 30s", "the request has no timeout and the server hangs",
+     "pass timeout=10 and retry with backoff"),
+    ("RecursionError", "maximum recursion depth exceeded", "the tree walk follows symlinks in a loop",
+     "track visited inodes and skip repeats"),
+    ("PermissionError", "[Errno 13] Permission denied", "the temp dir is created with the wrong umask",
+     "create it with mode 0o700 under the user's cache dir"),
+    ("JSONDecodeError", "Expecting value: line 1 column 1", "the endpoint returns HTML on a 502",
+     "check the status code and content type before json()"),
+    ("ReferenceError", "window is not defined", "the module touches window during SSR",
+     "move the access into onMount"),
+    ("ValueError", "invalid literal for int() with base 10", "the header value has a trailing unit",
+     "strip the unit with a regex before int()"),
+    ("ConnectionResetError", "[Errno 104] Connection reset by peer", "keep-alive sockets are reused after the server closed them",
+     "disable keep-alive for the upload client"),
+    ("AssertionError", "expected 3 segments, got 2", "the last partial segment is dropped",
+     "include the remainder when the length is not a multiple of the size"),
+]
+QUESTIONS = [
+    "{func} in {file} throws {etype} again, how did we fix that?",
+    "what was the fix for the {etype} ({emsg}) in {func}?",
+    "remind me why {func} failed with {etype} and what we changed",
+    "{etype} in {base}: {emsg} -- didn't we solve this before?",
+    "how did we handle {func} when {cause}?",
+]
+CHATTER = [
+    "Sounds good, let's look at {func} in {file} after lunch.",
+    "Can you rename {func} to something clearer? It's used in {file} and a few tests.",
+    "The CI run for {file} is green now, thanks. Next up is the {etype} report from yesterday.",
+    "I pushed the change to {file}; {func} is about 20% faster in the benchmark.",
+    "Let's not touch {func} until the release is out. Add a TODO in {file} instead.",
+]
+
+
+# --- corpus ---------------------------------------------------------------
+
+def _fix_message(rng, file, func, error):
+    etype, emsg, cause, fix = error
+    var = rng.choice(["value", "items", "payload", "result", "entry"])
+    code = "\n".join([
+        f"def {func}({var}):",
+        f"    # {fix}",
+        f"    if not {var}:",
+        "        return []",
+        f"    return [{rng.choice(['x', 'item', 'row'])} for {rng.choice(['x', 'item', 'row'])} in {var}]",
+    ])
+    explanation = " ".join(rng.sample([
+        f"I also added a regression test next to {func}.",
+        "The other callers were checked and are not affected.",
+        f"This only happened on the first run after a fresh install of {file}.",
+        "Logging now includes the offending value so the next report is easier to read.",
+        "The behaviour for valid input is unchanged.",
+        "The same pattern exists in two other modules; left them for a follow-up.",
+    ], 3))
+    return (f"Fixed the {etype} in {func}() ({file}): {etype}: {emsg}. Cause: {cause}. Fix: {fix}.\n"
+            f"```python\n{code}\n```\n{explanation}")
+
+
+def make_corpus(target_chunks, labelled, chunk_size, chunk_overlap, seed=0):
+    """
+    (messages, queries): messages are (session_id, role, content, fix_id or None); queries are
+    (question, fix_id). Messages are added until their chunks reach target_chunks.
+    """
+    rng = random.Random(seed)
+    combos = [(f, g, e) for f in FILES for g in FUNCTIONS for e in ERRORS]
+    rng.shuffle(combos)
+    messages, queries = [], []
+    for fix_id, (file, func, error) in enumerate(combos[:labelled]):
+        messages.append((f"s{fix_id % 40}", "assistant", _fix_message(rng, file, func, error), fix_id))
+        etype, emsg, cause, _ = error
+        question = rng.choice(QUESTIONS).format(
+            func=func, file=file, base=Path(file).name, etype=etype, emsg=emsg, cause=cause)
+        queries.append((question, fix_id))
+
+    chunks = sum(len(_chunk_text(m[2], chunk_size, chunk_overlap)) for m in messages)
+    # Distractors: unqueried fixes (same errors, files and functions in other combinations) and chat
+    unlabelled = combos[labelled:] or combos
+    i = 0
+    while chunks < target_chunks:
+        if rng.random() < 0.6:
+            # Never a labelled combination, so every question has exactly one right answer
+            file, func, error = unlabelled[i % len(unlabelled)]
+            content = _fix_message(rng, file, func, error)
+            i += 1
+        else:
+            content = rng.choice(CHATTER).format(
+                func=rng.choice(FUNCTIONS), file=rng.choice(FILES), etype=rng.choice(ERRORS)[0])
+        messages.append((f"s{len(messages) % 40}", rng.choice(["user", "assistant"]), content, None))
+        chunks += len(_chunk_text(content, chunk_size, chunk_overlap))
+    # Labelled fixes spread through the collection, not all at the start
+    rng.shuffle(messages)
+    return messages, queries
+
+
+# --- backends / embedders -------------------------------------------------
+
+def make_embedder(spec):
+    """hashing-<dim> or st:<sentence-transformers model>."""
+    if spec.startswith("hashing-"):
+        return HashingEmbedder(int(spec.split("-", 1)[1]))
+    if spec.startswith("st:"):
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(spec[3:])
+
+        def embed(texts):
+            return model.encode(list(texts), normalize_embeddings=True)
+        embed.dim = model.get_sentence_embedding_dimension()
+        embed.name = spec
+        return embed
+    raise SystemExit(f"unknown embedder {spec!r}: use hashing-<dim> or st:<model>")
+
+
+def open_rag(backend, embedder, path, chunk_size, chunk_overlap):
+    if backend == "chroma":
+        store = ChromaVectorStore(path, embed=embedder)
+    else:
+        # mmap-ivf probes its lists at every size; with the default IVF_MIN_ROWS, small collections
+        # would silently fall back to brute force and report the same numbers as mmap
+        store = MmapVectorStore(path, embed=embedder, dim=getattr(embedder, "dim", 384),
+                                ivf_min_rows=0 if backend == "mmap-ivf" else IVF_MIN_ROWS)
+    return VibeCoderRAG(store=store, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+# --- evaluation -----------------------------------------------------------
+
+def evaluate(backend, embedder_spec, size, chunk_size, chunk_overlap, ks, inject_k, labelled, seed, workdir):
+    messages, queries = make_corpus(size, labelled, chunk_size, chunk_overlap, seed)
+    # Relevance judgments: chunk text -> fix ids whose message produced it
+    owners = {}
+    for _, _, content, fix_id in messages:
+        if fix_id is not None:
+            for chunk in _chunk_text(content, chunk_size, chunk_overlap):
+                owners.setdefault(chunk, set()).add(fix_id)
+
+    path = str(Path(workdir) / f"{backend}-{embedder_spec.replace(':', '_')}-{size}-{chunk_size}")
+    rag = open_rag(backend, make_embedder(embedder_spec), path, chunk_size, chunk_overlap)
+    index_ms = []
+    for session_id, role, content, _ in messages:
+        start = time.perf_counter()
+        rag.index_message(session_id, role, content)
+        index_ms.append((time.perf_counter() - start) * 1000)
+    ivf = {}
+    if backend == "mmap-ivf":
+        nlist = rag.store.build_ivf()
+        ivf = {"ivf_lists": nlist, "ivf_nprobe": rag.store.effective_nprobe(nlist)}
+
+    max_k = max(ks)
+    query_ms, ranks, injected = [], [], []
+    for question, fix_id in queries:
+        start = time.perf_counter()
+        hits = rag.retrieve_chunks(question, top_k=max_k)
+        query_ms.append((time.perf_counter() - start) * 1000)
+        rank = next((r for r, h in enumerate(hits, 1) if fix_id in owners.get(h["document"], ())), None)
+        ranks.append(rank)
+        injected.append(max(1, len(rag.retrieve(question, top_k=inject_k)) // 4))  # same estimate as the manager
+
+    row = {
+        "backend": backend,
+        "embedder": embedder_spec,
+        "chunks": rag.store.count(),
+        "messages": len(messages),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "queries": len(queries),
+        "mrr": round(statistics.mean(1 / r if r else 0.0 for r in ranks), 4),
+        "inject_k": inject_k,
+        "tokens_injected_mean": round(statistics.mean(injected), 1),
+        "tokens_injected_p95": percentile(injected, 95),
+        "index_ms_p50": round(statistics.median(index_ms), 3),
+        "index_ms_p95": round(percentile(index_ms, 95), 3),
+        "query_ms_p50": round(statistics.median(query_ms), 3),
+        "query_ms_p95": round(percentile(query_ms, 95), 3),
+        **ivf,  # nprobe == lists means the probe covered everything (exact search)
+    }
+    for k in ks:
+        row[f"recall@{k}"] = round(sum(1 for r in ranks if r and r <= k) / len(ranks), 4)
+    return row
+
+
+def _row_key(row):
+    return (row["backend"], row["embedder"], row["chunk_size"], row["chunk_overlap"], row["chunks"] // 100)
+
+
+def compare(rows, baseline):
+    """Per-metric deltas (current - baseline) for rows matching on backend/embedder/chunking/size."""
+    base = {_row_key(r): r for r in baseline.get("results", [])}
+    lines = []
+    for row in rows:
+        old = base.get(_row_key(row))
+        if old is None:
+            continue
+        label = f"{row['backend']} {row['embedder']} chunk={row['chunk_size']} n={row['chunks']}"
+        metrics = [k for k in row if k.startswith("recall@")] + list(QUALITY_KEYS) + ["tokens_injected_mean"] + list(LATENCY_KEYS)
+        deltas = [f"{k} {old[k]} -> {row[k]} ({row[k] - old[k]:+.4g})" for k in metrics if k in old]
+        lines.append(label + "\n    " + "\n    ".join(deltas))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="collection sizes (chunks)")
+    parser.add_argument("--backends", nargs="+", default=["mmap"], choices=["mmap", "mmap-ivf", "chroma"])
+    parser.add_argument("--embedders", nargs="+", default=["hashing-384"], help="hashing-<dim> or st:<model>")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[CHUNK_SIZE])
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="recall@k cut-offs")
+    parser.add_argument("--inject-k", type=int, default=5, help="top_k used for the tokens-injected measurement")
+    parser.add_argument("--labelled", type=int, default=200, help="labelled fixes (one question each)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to diff against")
+    parser.add_argument("--json", action="store_true", help="print the JSON report")
+    args = parser.parse_args()
+
+    backends = list(args.backends)
+    if "chroma" in backends and importlib.util.find_spec("chromadb") is None:
+        print("chromadb not installed; skipping the chroma backend", file=sys.stderr)
+        backends.remove("chroma")
+
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="vibe-rag-eval-")
+    try:
+        for size in args.sizes:
+            for chunk_size in args.chunk_sizes:
+                for embedder in args.embedders:
+                    for backend in backends:
+                        row = evaluate(backend, embedder, size, chunk_size, args.chunk_overlap, sorted(args.k),
+                                       args.inject_k, args.labelled, args.seed, workdir)
+                        rows.append(row)
+                        if not args.json:
+                            print(" ".join(f"{k}={v}" for k, v in row.items()), flush=True)
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    Path(workdir).mkdir()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format_version": FORMAT_VERSION,
+        "config": {"seed": args.seed, "labelled": args.labelled, "k": sorted(args.k), "inject_k": args.inject_k},
+        "results": rows,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    if args.json:
+        print(text)
+    if args.compare:
+        for line in compare(rows, json.loads(Path(args.compare).read_text(encoding="utf-8"))):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for VibeCoderContextManager session histories.
+- Several worker processes, each with several threads, append to ONE session at the same time.
+- Checks that no message was lost or duplicated and that the file is valid JSON at the end.
+- Checks that optimistic version checks reject a stale writer.
+Uses a temporary history dir; no LM Studio needed. Exit code 0 = pass, 1 = fail.
+
+  python3 stress_history.py                      # 4 processes x 4 threads x 25 messages
+  python3 stress_history.py --processes 8 --threads 8 --messages 50
+"""
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from vibe_coder_context_manager import HistoryConflictError, VibeCoderContextManager
+
+SESSION = "stress-session"
+
+
+def _worker(history_dir: str, worker_id: int, threads: int, messages: int) -> None:
+    """One process: `threads` threads sharing one manager, each appending `messages` messages."""
+    manager = VibeCoderContextManager(history_dir=history_dir)
+
+    def append(thread_id: int) -> None:
+        for i in range(messages):
+            manager.add_message(SESSION, "user", f"p{worker_id}-t{thread_id}-m{i}")
+
+    pool = [threading.Thread(target=append, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def check_concurrent_appends(history_dir: str, processes: int, threads: int, messages: int) -> bool:
+    start = time.time()
+    procs = [
+        multiprocessing.Process(target=_worker, args=(history_dir, p, threads, messages))
+        for p in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    duration = time.time() - start
+
+    manager = VibeCoderContextManager(history_dir=history_dir)
+    path = manager._get_history_path(SESSION)
+    try:
+        history = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        print(f"FAIL: history file is not valid JSON: {e}")
+        return False
+
+    expected = {f"p{p}-t{t}-m{i}" for p in range(processes) for t in range(threads) for i in range(messages)}
+    contents = [m["content"] for m in history]
+    lost = expected - set(contents)
+    duplicated = len(contents) - len(set(contents))
+    total = len(expected)
+    print(f"Appends: {total} from {processes} processes x {threads} threads in {duration:.2f}s "
+          f"({total / duration:.0f} appends/s)")
+    print(f"Messages on disk: {len(history)}  lost: {len(lost)}  duplicated: {duplicated}")
+    if any(p.exitcode != 0 for p in procs):
+        print("FAIL: a worker process crashed")
+        return False
+    leftovers = [f.name for f in Path(history_dir).glob(".*.tmp")]
+    if leftovers:
+        print(f"FAIL: temp files left behind: {leftovers}")
+        return False
+    return not lost and not duplicated and len(history) == total
+
+
+def check_optimistic_conflict(history_dir: str) -> bool:
+    manager = VibeCoderContextManager(history_dir=history_dir)
+    session = "stress-conflict"
+    manager.add_message(session, "user", "first")
+    history, version = manager.load_history_with_version(session)
+    manager.add_message(session, "user", "written by someone else")
+    try:
+        manager.save_full_history(session, history + [{"role": "user", "content": "stale"}], expected_version=version)
+    except HistoryConflictError:
+        print("Optimistic check: stale write rejected")
+        return True
+    print("FAIL: stale write with an outdated version was accepted")
+    return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=25)
+    args = parser.parse_args()
+
+    history_dir = tempfile.mkdtemp(prefix="vibe-stress-")
+    try:
+        ok = check_concurrent_appends(history_dir, args.processes, args.threads, args.messages)
+        ok = check_optimistic_conflict(history_dir) and ok
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible chat-completions server for running the context pipeline without LM Studio.
+Standard library only. Replies are deterministic: a markdown "summary" built from the prompt's words.
+
+- POST /v1/chat/completions   stream or not; honours max_tokens
+- GET  /v1/models             one fake model
+- GET  /stats                 requests, failures, prompt/completion tokens, bytes in/out, per model
+- POST /stats/reset
+- POST /config                change latency / rate / failures at runtime, e.g. {"fail_rate": 0.5}
+
+Failure injection: fail_rate (probability) or fail_every (every Nth request) with fail_mode
+"error" (HTTP 500), "timeout" (sleep hang_seconds, then close without replying) or "malformed" (invalid JSON).
+
+  python3 stub_lm_server.py --port 1234 --latency 0.2 --tokens-per-second 80
+  python3 stub_lm_server.py --port 1235 --fail-every 3 --fail-mode error
+  VibeCoderContextManager(summarizer_url="http://localhost:1235/v1/chat/completions")
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CONFIG = {
+    "latency": 0.0,            # seconds before the first token
+    "tokens_per_second": 0.0,  # generation rate; 0 = instant
+    "reply_tokens": 200,       # reply length when the request has no max_tokens
+    "fail_rate": 0.0,
+    "fail_every": 0,
+    "fail_mode": "error",      # error | timeout | malformed
+    "hang_seconds": 65.0,      # timeout mode; longer than the context manager's 60s summarizer timeout
+    "seed": 0,
+}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StubState:
+    """Config + counters shared by all handler threads."""
+
+    def __init__(self, **config: Any) -> None:
+        self.lock = threading.Lock()
+        self.config = dict(DEFAULT_CONFIG, **{k: v for k, v in config.items() if v is not None})
+        self.rng = random.Random(self.config["seed"])
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats: Dict[str, Any] = {
+                "requests": 0, "failures": 0, "streamed": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "bytes_in": 0, "bytes_out": 0, "models": {},
+            }
+
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            for key, value in changes.items():
+                if key in DEFAULT_CONFIG:
+                    self.config[key] = type(DEFAULT_CONFIG[key])(value)
+            return dict(self.config)
+
+    def begin(self, model: str, prompt_tokens: int) -> Tuple[int, Optional[str]]:
+        """Count a request; returns (request number, failure mode or None)."""
+        with self.lock:
+            self.stats["requests"] += 1
+            n = self.stats["requests"]
+            self.stats["prompt_tokens"] += prompt_tokens
+            per_model = self.stats["models"].setdefault(model, {"requests": 0, "prompt_tokens": 0})
+            per_model["requests"] += 1
+            per_model["prompt_tokens"] += prompt_tokens
+            every = self.config["fail_every"]
+            fail = (every and n % every == 0) or (self.config["fail_rate"] and self.rng.random() < self.config["fail_rate"])
+            if fail:
+                self.stats["failures"] += 1
+            return n, self.config["fail_mode"] if fail else None
+
+    def count(self, key: str, amount: int) -> None:
+        with self.lock:
+            self.stats[key] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return json.loads(json.dumps({"stats": self.stats, "config": self.config}))
+
+
+def _reply_text(prompt: str, n_tokens: int) -> str:
+    """Deterministic pseudo-summary: distinct prompt words, about n_tokens tokens long."""
+    words = list(dict.fromkeys(re.findall(r"[A-Za-z_][A-Za-z0-9_.]{2,}", prompt)))[: max(1, n_tokens)]
+    text = "## Summary\n- " + " ".join(words or ["ok"])
+    return text[: n_tokens * 4]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "StubLM/1.0"
+    protocol_version = "HTTP/1.1"
+    state: StubState  # set by make_server
+
+    def log_message(self, format, *args):  # quiet; use /stats
+        pass
+
+    def end_headers(self):
+        # Count the status line + headers too, so clients can subtract exactly what came from us
+        self.state.count("bytes_out", sum(len(chunk) for chunk in getattr(self, "_headers_buffer", [])) + 2)
+        super().end_headers()
+
+    def _send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.state.count("bytes_out", len(body))
+
+    def _read_body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        # Request line + headers + body: what the client wrote to the socket (for I/O accounting)
+        self.state.count("bytes_in", len(self.requestline) + 2 + len(str(self.headers)) + 2 + len(body))
+        return body
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(self.state.snapshot())
+        elif self.path == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        raw = self._read_body()
+        if self.path == "/stats/reset":
+            self.state.reset()
+            self._send_json({"ok": True})
+            return
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json({"error": "invalid JSON"}, 400)
+            return
+        if self.path == "/config":
+            self._send_json(self.state.update(payload))
+        elif self.path == "/v1/chat/completions":
+            self._chat(payload)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _chat(self, payload: Dict[str, Any]) -> None:
+        config = self.state.config
+        prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages") or [])
+        model = payload.get("model") or "stub-model"
+        prompt_tokens = _estimate_tokens(prompt)
+        n, failure = self.state.begin(model, prompt_tokens)
+
+        time.sleep(config["latency"])
+        if failure == "timeout":
+            time.sleep(config["hang_seconds"])
+            self.close_connection = True
+            return
+        if failure == "malformed":
+            body = b"{not json"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.state.count("bytes_out", len(body))
+            return
+        if failure:
+            self._send_json({"error": {"message": f"injected failure on request {n}"}}, 500)
+            return
+
+        max_tokens = int(payload.get("max_tokens") or config["reply_tokens"])
+        text = _reply_text(prompt, min(max_tokens, config["reply_tokens"]))
+        completion_tokens = _estimate_tokens(text)
+        self.state.count("completion_tokens", completion_tokens)
+        rate = config["tokens_per_second"]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if not payload.get("stream"):
+            if rate:
+                time.sleep(completion_tokens / rate)
+            self._send_json({
+                "id": f"stub-{n}", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.state.count("streamed", 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = re.findall(r"\S+\s*", text)
+        for i, piece in enumerate(pieces):
+            if rate:
+                time.sleep(_estimate_tokens(piece) / rate)
+            chunk = {"id": f"stub-{n}", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece},
+                                  "finish_reason": "stop" if i == len(pieces) - 1 else None}]}
+            self._write_event(json.dumps(chunk))
+        self._write_event("[DONE]")
+
+    def _write_event(self, data: str) -> None:
+        line = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(line)
+        self.wfile.flush()
+        self.state.count("bytes_out", len(line))
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, **config: Any) -> ThreadingHTTPServer:
+    """Build (not start) a stub server; port 0 picks a free port (server.server_port)."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": StubState(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    return server
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0, **config: Any) -> ThreadingHTTPServer:
+    """Start a stub server on a daemon thread (for tests and benchmarks); call .shutdown() when done."""
+    server = make_server(host, port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-lm").start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", type=float, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, help="generation rate (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, help="reply length cap")
+    parser.add_argument("--fail-rate", type=float, help="probability a request fails")
+    parser.add_argument("--fail-every", type=int, help="fail every Nth request")
+    parser.add_argument("--fail-mode", choices=["error", "timeout", "malformed"])
+    parser.add_argument("--hang-seconds", type=float, help="how long timeout mode hangs")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    config = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    server = make_server(args.host, args.port, **config)
+    print(f"Stub LM server: http://{args.host}:{server.server_port}/v1/chat/completions  (stats: /stats)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # pip install requests
 # LM Studio summarizer: gemma-3-4b-it-Q4_K_M.gguf loaded
 # Trigger: turns >=7 OR old tokens >1500
-# Fallback: raw recent turns + placeholder
+# Fallback: raw recent turns + extractive summary (no model) when the summarizer is down
 """
 Vibe Coder Dynamic Summarization Context Manager.
 
@@ -11,15 +11,125 @@ The old way sent the entire raw history every time → wasteful. This module imp
 summarization approach: keep the last 5 raw turns untouched, summarize everything older when
 turns >= 7 OR old tokens > 1500. Summarization runs via LM Studio (same server, summarizer model).
 Full history stays on disk for UI; LM Studio receives a compressed prompt.
+
+Session files are safe for several writers (UI tabs, worker processes): every read-modify-write
+holds a per-session in-process lock plus an OS file lock, files are replaced atomically
+(write temp + rename), and save_full_history can check a version for optimistic concurrency.
 """
 
+import contextlib
+import hashlib
 import json
+import os
 import re
+import tempfile
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from vibe_coder_precompress import extractive_summary, precompress_messages
+
+
+# Shared instrumentation (scripts/atom_metrics.py on PYTHONPATH) is optional: the manager is also used
+# as a plain library, where summarizer timings and stage timers are simply not recorded
+try:
+    from atom_metrics import SUMMARIZER_LATENCY, stage
+except ImportError:
+    class _NoHistogram:
+        def observe(self, value, **labels):
+            pass
+
+    SUMMARIZER_LATENCY = _NoHistogram()
+
+    def stage(name):
+        return contextlib.nullcontext()
+
+
+class HistoryConflictError(RuntimeError):
+    """save_full_history(expected_version=...) found the file changed since it was read."""
+
+
+class _SessionLock:
+    """In-process lock for one history file. depth is only touched by the thread holding rlock."""
+
+    def __init__(self) -> None:
+        self.rlock = threading.RLock()
+        self.depth = 0
+
+
+# prefix_stats: previous prompt kept per session, for this many sessions
+MAX_TRACKED_PROMPTS = 256
+# Hierarchical mode: summarizer calls one prompt may wait for; a long backlog is worked off over later turns
+MAX_CATCHUP_CALLS = 4
+
+# One lock per history file, shared by every manager instance in this process
+_PATH_LOCKS: Dict[str, _SessionLock] = {}
+_PATH_LOCKS_GUARD = threading.Lock()
+
 
-import requests
+def _session_lock_for(path: Path) -> _SessionLock:
+    with _PATH_LOCKS_GUARD:
+        return _PATH_LOCKS.setdefault(str(path), _SessionLock())
+
+
+@contextlib.contextmanager
+def _file_lock(lock_path: Path) -> Iterator[None]:
+    """Exclusive OS-level lock on lock_path (flock on POSIX, msvcrt on Windows); blocks until acquired."""
+    with open(lock_path, "a+b") as fh:
+        if os.name == "nt":
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    """Write payload to a temp file next to path, fsync, then rename over path."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_name)
+        raise
+
+
+def safe_session_id(session_id: str) -> str:
+    """Session id as both history backends key it: anything but word characters and '-' becomes '_'."""
+    return re.sub(r"[^\w\-]", "_", session_id)
+
+
+def _fingerprint(messages: List[Dict[str, Any]]) -> str:
+    """sha1 over roles + contents; detects a segment whose messages were edited or removed."""
+    h = hashlib.sha1()
+    for m in messages:
+        h.update(f"{m.get('role')}\x00{m.get('content', '')}\x00".encode("utf-8"))
+    return h.hexdigest()
 
 
 class VibeCoderContextManager:
@@ -38,6 +148,13 @@ class VibeCoderContextManager:
         summarizer_url: str = "http://localhost:1234/v1/chat/completions",
         summarizer_model: str = "gemma-3-4b-it-Q4_K_M.gguf",
         history_dir: str = "~/.vibe-coder/history",
+        history_store: Optional[Any] = None,
+        summary_mode: str = "single",
+        segment_messages: int = 20,
+        recall_segments: int = 0,
+        prompt_layout: str = "default",
+        precompress: bool = True,
+        max_catchup_calls: int = MAX_CATCHUP_CALLS,
     ) -> None:
         self.keep_raw_turns = keep_raw_turns
         self.token_threshold = token_threshold
@@ -46,34 +163,131 @@ class VibeCoderContextManager:
         self.summarizer_model = summarizer_model
         self.history_dir = Path(history_dir).expanduser().resolve()
         self.history_dir.mkdir(parents=True, exist_ok=True)
+        # Optional indexed backend (e.g. vibe_coder_sqlite_store.SQLiteHistoryStore); None = JSON files
+        self.history_store = history_store
+        # "single": one summary of everything older than the raw window, regenerated per prompt.
+        # "hierarchical": fixed-size segments summarized once (persisted), folded into a running digest.
+        if summary_mode not in ("single", "hierarchical"):
+            raise ValueError(f"summary_mode must be 'single' or 'hierarchical', not {summary_mode!r}")
+        self.summary_mode = summary_mode
+        self.segment_messages = max(2, segment_messages)
+        # Hierarchical only: add this many archived segment summaries that match the new message
+        self.recall_segments = recall_segments
+        # Hierarchical only: cap on segment + merge calls made while building one prompt
+        self.max_catchup_calls = max(1, max_catchup_calls)
+        # "prefix_stable": keep the prompt head byte-identical between turns so LM Studio can reuse its KV cache
+        if prompt_layout not in ("default", "prefix_stable"):
+            raise ValueError(f"prompt_layout must be 'default' or 'prefix_stable', not {prompt_layout!r}")
+        self.prompt_layout = prompt_layout
+        # Dedupe repeated code / tracebacks and collapse long logs before the summarizer sees them;
+        # also replaces the "Summary unavailable" placeholder with an extractive summary
+        self.precompress = precompress
+        self._last_prompts: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+        self._prefix_stats: Dict[str, Dict[str, Any]] = {}
+        self._prefix_lock = threading.Lock()
 
     def _get_history_path(self, session_id: str) -> Path:
         """Return the file path for this session's history JSON. Session ID can be e.g. 'project-main' or a UUID."""
-        safe_id = re.sub(r"[^\w\-]", "_", session_id)
-        return self.history_dir / f"{safe_id}.json"
+        return self.history_dir / f"{safe_session_id(session_id)}.json"
 
-    def load_full_history(self, session_id: str) -> List[Dict[str, str]]:
+    def _get_segments_path(self, session_id: str) -> Path:
+        """Segment summaries + digest for hierarchical mode (a subdirectory, so *.json globs skip it)."""
+        return self.history_dir / "segments" / self._get_history_path(session_id).name
+
+    @contextlib.contextmanager
+    def session_lock(self, session_id: str) -> Iterator[None]:
         """
-        Load the full raw history from disk for this session.
-        Returns list of {"role": "user"|"assistant", "content": str, "timestamp": iso string}.
+        Hold this session exclusively: in-process RLock (threads) + file lock (other processes).
+        Re-entrant within a thread, so locked helpers can call each other.
         """
         path = self._get_history_path(session_id)
-        if not path.exists():
-            return []
+        lock = _session_lock_for(path)
+        with lock.rlock:
+            lock.depth += 1
+            try:
+                if lock.depth > 1:
+                    yield
+                else:
+                    with _file_lock(path.with_name(path.name + ".lock")):
+                        yield
+            finally:
+                lock.depth -= 1
+
+    def _read_history_file(self, path: Path) -> Tuple[List[Dict[str, str]], str]:
+        """(history, version) where version is the sha1 of the file bytes ("" if missing)."""
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data if isinstance(data, list) else []
-        except (json.JSONDecodeError, OSError) as e:
+            raw = path.read_bytes()
+        except FileNotFoundError:
+            return [], ""
+        version = hashlib.sha1(raw).hexdigest()
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            # Keep the damaged file for inspection instead of letting the next save overwrite it
+            backup = path.with_name(f"{path.name}.corrupt-{int(time.time())}")
+            print(f"[VibeCoderContextManager] load_full_history error: {e}; moved to {backup.name}")
+            with contextlib.suppress(OSError):
+                os.replace(path, backup)
+            return [], ""
+        return (data if isinstance(data, list) else []), version
+
+    def load_history_with_version(self, session_id: str) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Load history plus an opaque version token for optimistic concurrency:
+        pass the token to save_full_history(expected_version=...) to detect concurrent writers.
+        """
+        if self.history_store is not None:
+            return self.history_store.load(session_id), self.history_store.version(session_id)
+        path = self._get_history_path(session_id)
+        try:
+            return self._read_history_file(path)
+        except OSError as e:
             print(f"[VibeCoderContextManager] load_full_history error: {e}")
-            return []
+            return [], ""
+
+    def load_full_history(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Load the full raw history from disk for this session.
+        Returns list of {"role": "user"|"assistant", "content": str, "timestamp": iso string}.
+        """
+        return self.load_history_with_version(session_id)[0]
 
-    def save_full_history(self, session_id: str, history: List[Dict[str, str]]) -> None:
-        """Save the full raw history to disk. Full history is ALWAYS saved for UI/display."""
+    def save_full_history(
+        self,
+        session_id: str,
+        history: List[Dict[str, str]],
+        expected_version: Optional[str] = None,
+    ) -> str:
+        """
+        Save the full raw history to disk atomically (temp file + rename). Full history is ALWAYS saved for UI/display.
+        If expected_version is given and the file changed since that version was read, raises HistoryConflictError.
+        Returns the new version.
+        """
+        if self.history_store is not None:
+            return self.history_store.replace(session_id, history, expected_version=expected_version)
         path = self._get_history_path(session_id)
         self.history_dir.mkdir(parents=True, exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        with self.session_lock(session_id):
+            if expected_version is not None:
+                _, current = self._read_history_file(path)
+                if current != expected_version:
+                    raise HistoryConflictError(f"history for {session_id!r} changed since it was read")
+            payload = json.dumps(history, indent=2, ensure_ascii=False).encode("utf-8")
+            _atomic_write(path, payload)
+            return hashlib.sha1(payload).hexdigest()
+
+    def update_history(
+        self,
+        session_id: str,
+        update: Callable[[List[Dict[str, str]]], List[Dict[str, str]]],
+    ) -> List[Dict[str, str]]:
+        """Atomic read-modify-write: update(history) -> new history, all under the session lock."""
+        with self.session_lock(session_id):
+            history, version = self.load_history_with_version(session_id)
+            history = update(history)
+            # The store has its own transactions; the version check keeps other processes honest there
+            self.save_full_history(session_id, history, expected_version=version if self.history_store else None)
+            return history
 
     def _estimate_tokens(self, text: str) -> int:
         """Standard rough estimate; works great for code + text."""
@@ -108,20 +322,12 @@ class VibeCoderContextManager:
         )
         return total_turns >= self.turn_threshold or old_tokens > self.token_threshold
 
-    def generate_summary(self, old_messages: List[Dict]) -> str:
-        """
-        Call LM Studio (summarizer model) to summarize old_messages.
-        On exception: print and return fallback string.
-        """
-        if not old_messages:
-            return "No prior conversation history."
-        history_text = "\n".join([f'{m["role"]}: {m["content"]}' for m in old_messages])
-        prompt = f"""You are an elite Context Compressor for Vibe Coder.
-Create dense summary of history. Preserve project goal, files, code, bugs/fixes, status, preferences, pending tasks.
-Format markdown sections.
-Be concise.
-History:
-{history_text}"""
+    def _call_summarizer(self, prompt: str) -> Optional[str]:
+        """One summarizer request; returns the text, or None if the call failed."""
+        import requests  # ~0.1s to import; only needed once a summary is actually due
+
+        start = time.perf_counter()
+        outcome = "error"
         try:
             resp = requests.post(
                 self.summarizer_url,
@@ -137,10 +343,252 @@ History:
             resp.raise_for_status()
             data = resp.json()
             summary = (data["choices"][0]["message"]["content"] or "").strip()
+            outcome = "ok"
             return summary or "Empty summary."
         except Exception as e:
             print(f"Summary failed: {e}")
-            return "Summary unavailable – continuing with raw history."
+            return None
+        finally:
+            SUMMARIZER_LATENCY.observe(time.perf_counter() - start, model=self.summarizer_model, outcome=outcome)
+
+    def _history_text(self, messages: List[Dict], offset: int = 0) -> str:
+        """Messages as "role: content" lines for a summarizer prompt, pre-compressed if enabled."""
+        if self.precompress:
+            with stage("context_precompress"):
+                messages, _ = precompress_messages(messages, offset)
+        return "\n".join([f'{m.get("role")}: {m.get("content", "")}' for m in messages])
+
+    def _fallback_summary(self, messages: List[Dict]) -> str:
+        """Used when the summarizer call failed."""
+        if self.precompress:
+            return extractive_summary(messages)
+        return "Summary unavailable – continuing with raw history."
+
+    def _summary_prompt(self, old_messages: List[Dict]) -> str:
+        history_text = self._history_text(old_messages)
+        return f"""You are an elite Context Compressor for Vibe Coder.
+Create dense summary of history. Preserve project goal, files, code, bugs/fixes, status, preferences, pending tasks.
+Format markdown sections.
+Be concise.
+History:
+{history_text}"""
+
+    def generate_summary(self, old_messages: List[Dict]) -> str:
+        """
+        Call LM Studio (summarizer model) to summarize old_messages.
+        On exception: print and return an extractive summary (or the placeholder if precompress is off).
+        """
+        if not old_messages:
+            return "No prior conversation history."
+        summary = self._call_summarizer(self._summary_prompt(old_messages))
+        return summary if summary is not None else self._fallback_summary(old_messages)
+
+    # --- hierarchical summaries ------------------------------------------
+
+    def _load_segments(self, session_id: str) -> Dict[str, Any]:
+        path = self._get_segments_path(session_id)
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = None
+        if not isinstance(state, dict) or state.get("segment_messages") != self.segment_messages:
+            # Missing, damaged or built with another segment size: start over
+            state = {"segment_messages": self.segment_messages, "segments": [], "digest": {"through": 0, "text": ""}}
+        return state
+
+    def _save_segments(self, session_id: str, state: Dict[str, Any]) -> None:
+        path = self._get_segments_path(session_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps(state, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    def _validate_segments(self, state: Dict[str, Any], history: List[Dict]) -> bool:
+        """Drop segments that no longer match history (edited or truncated). Returns True if anything changed."""
+        segments = state["segments"]
+        if not segments:
+            return False
+        last = segments[-1]
+        if last["end"] <= len(history) and _fingerprint(history[last["start"]:last["end"]]) == last["fingerprint"]:
+            return False  # common case: only new messages were appended
+        keep = 0
+        for seg in segments:
+            if seg["end"] > len(history) or _fingerprint(history[seg["start"]:seg["end"]]) != seg["fingerprint"]:
+                break
+            keep += 1
+        del segments[keep:]
+        if state["digest"]["through"] > keep:
+            state["digest"] = {"through": 0, "text": ""}
+        return True
+
+    def _summarize_segment(self, messages: List[Dict], start: int, end: int) -> Optional[str]:
+        history_text = self._history_text(messages, start)
+        prompt = f"""You are an elite Context Compressor for Vibe Coder.
+Summarize this segment (messages {start}-{end - 1}) of a long coding session. Preserve files, code, bugs/fixes,
+decisions, preferences and open tasks. Markdown bullets. Be concise.
+Segment:
+{history_text}"""
+        return self._call_summarizer(prompt)
+
+    def _merge_digest(self, digest: str, summaries: List[str]) -> Optional[str]:
+        if not digest and len(summaries) == 1:
+            return summaries[0]
+        newer = "\n\n".join(summaries)
+        prompt = f"""You maintain the running digest of a long Vibe Coder session.
+Merge the current digest with the newer segment summaries into one updated digest. Keep project goal, files,
+decisions, bugs/fixes, status, preferences and pending tasks; drop details that were superseded.
+Format markdown sections. Stay under 600 words.
+Current digest:
+{digest or "(empty)"}
+Newer segments:
+{newer}"""
+        return self._call_summarizer(prompt)
+
+    def update_segments(self, session_id: str, history: Optional[List[Dict]] = None,
+                        max_calls: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Hierarchical mode: summarize every complete segment of history older than the raw window that has
+        no summary yet, then fold new segment summaries into the digest (at most 4 per summarizer call).
+        Each segment is summarized once, so steady-state cost is one segment + one merge call per
+        segment_messages messages, whatever the session length. Failed calls are retried on a later turn.
+        max_calls bounds the summarizer calls made here (one is kept for the merge when there is room);
+        whatever is left is picked up by the next call.
+        Returns the persisted state {"segment_messages", "segments", "digest": {"through", "text"}}.
+        """
+        if history is None:
+            history = self.load_full_history(session_id)
+        size = self.segment_messages
+        old_count = max(0, len(history) - 2 * self.keep_raw_turns)
+        state = self._load_segments(session_id)
+        changed = self._validate_segments(state, history[:old_count])
+        segments = state["segments"]
+        calls_left = max_calls if max_calls is not None else len(history) + 1
+        segment_calls = calls_left - 1 if calls_left > 1 else calls_left
+
+        while segment_calls and (len(segments) + 1) * size <= old_count:
+            segment_calls -= 1
+            calls_left -= 1
+            start = len(segments) * size
+            end = start + size
+            summary = self._summarize_segment(history[start:end], start, end)
+            if summary is None:
+                break
+            segments.append({
+                "index": len(segments), "start": start, "end": end,
+                "fingerprint": _fingerprint(history[start:end]), "summary": summary,
+            })
+            changed = True
+
+        digest = state["digest"]
+        while calls_left and digest["through"] < len(segments):
+            calls_left -= 1
+            batch = segments[digest["through"]:digest["through"] + 4]
+            text = self._merge_digest(digest["text"], [seg["summary"] for seg in batch])
+            if text is None:
+                break
+            digest = state["digest"] = {"through": digest["through"] + len(batch), "text": text}
+            changed = True
+
+        if changed:
+            # Unlocked on purpose: summarizer calls take seconds and must not block add_message.
+            # Two writers racing here can only duplicate summarizer work; the file is replaced atomically.
+            self._save_segments(session_id, state)
+        return state
+
+    def list_segments(self, session_id: str) -> List[Dict[str, Any]]:
+        """Archived segments (index, start, end, summary) without their raw messages."""
+        return [
+            {k: seg[k] for k in ("index", "start", "end", "summary")}
+            for seg in self._load_segments(session_id)["segments"]
+        ]
+
+    def get_segment(self, session_id: str, index: int) -> Optional[Dict[str, Any]]:
+        """One archived segment with its summary and raw messages, or None if it does not exist."""
+        segments = self._load_segments(session_id)["segments"]
+        if not 0 <= index < len(segments):
+            return None
+        seg = segments[index]
+        if self.history_store is not None:
+            messages = self.history_store.load_range(session_id, seg["start"], seg["end"])
+        else:
+            messages = self.load_full_history(session_id)[seg["start"]:seg["end"]]
+        return {"index": seg["index"], "start": seg["start"], "end": seg["end"],
+                "summary": seg["summary"], "messages": messages}
+
+    def find_segments(self, session_id: str, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Archived segments whose summaries share the most words with query (best first)."""
+        words = set(re.findall(r"\w{3,}", (query or "").lower()))
+        if not words:
+            return []
+        scored = []
+        for seg in self.list_segments(session_id):
+            score = len(words & set(re.findall(r"\w{3,}", seg["summary"].lower())))
+            if score:
+                scored.append((score, seg["index"], seg))
+        scored.sort(key=lambda t: (-t[0], -t[1]))  # ties: most recent segment first
+        return [seg for _, _, seg in scored[:limit]]
+
+    def _frozen_summary(self, session_id: str, history: List[Dict], boundary: int) -> str:
+        """
+        prefix_stable + single mode: summary of history[:boundary], cached in the segments sidecar
+        so it is regenerated only when boundary moves (or the summarized messages change).
+        """
+        state = self._load_segments(session_id)
+        # Whole prefix: an edit anywhere before the boundary invalidates the summary (hashing is cheap next to it)
+        fingerprint = _fingerprint(history[:boundary])
+        frozen = state.get("frozen")
+        if frozen and frozen.get("through") == boundary and frozen.get("fingerprint") == fingerprint:
+            return frozen["text"]
+        summary = self._call_summarizer(self._summary_prompt(history[:boundary]))
+        if summary is None:
+            return self._fallback_summary(history[:boundary])  # not cached: retried next turn
+        state["frozen"] = {"through": boundary, "fingerprint": fingerprint, "text": summary}
+        self._save_segments(session_id, state)
+        return summary
+
+    def _record_prefix_stats(
+        self,
+        session_id: str,
+        prompt: List[Dict[str, str]],
+        stable_messages: int,
+        until_shift: Optional[int],
+    ) -> Dict[str, Any]:
+        """Compare with the previous prompt for this session and estimate how much of it LM Studio can reuse."""
+        with self._prefix_lock:
+            previous = self._last_prompts.pop(session_id, None)
+            self._last_prompts[session_id] = prompt
+            while len(self._last_prompts) > MAX_TRACKED_PROMPTS:
+                evicted, _ = self._last_prompts.popitem(last=False)
+                self._prefix_stats.pop(evicted, None)
+        shared_messages = shared_chars = 0
+        if previous is not None:
+            for old, new in zip(previous, prompt):
+                if old == new:
+                    shared_messages += 1
+                    shared_chars += len(new["content"])
+                    continue
+                if old["role"] == new["role"]:
+                    shared_chars += len(os.path.commonprefix([old["content"], new["content"]]))
+                break
+        stats = {
+            "layout": self.prompt_layout,
+            "prompt_tokens": self._estimate_tokens_for_messages(prompt),
+            "shared_prefix_messages": shared_messages if previous is not None else None,
+            "shared_prefix_tokens": shared_chars // 4 if previous is not None else None,
+            # Leading messages the next prompt should repeat verbatim (until the window shifts)
+            "stable_prefix_tokens": self._estimate_tokens_for_messages(prompt[:stable_messages]),
+            "messages_until_shift": until_shift,
+        }
+        with self._prefix_lock:
+            self._prefix_stats[session_id] = stats
+        return stats
+
+    def prefix_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Prefix-reuse estimate for the last prompt built for this session (this process only):
+        {layout, prompt_tokens, shared_prefix_messages, shared_prefix_tokens (vs the previous prompt),
+        stable_prefix_tokens (expected to be shared with the next one), messages_until_shift}.
+        """
+        with self._prefix_lock:
+            return self._prefix_stats.get(session_id)
 
     def prepare_prompt_for_lm_studio(
         self,
@@ -152,19 +600,75 @@ History:
         """
         Build the prompt to send to LM Studio: [main system] + [RAG if any] + [summary if any]
         + [last N raw messages] + [new user message].
+        In hierarchical mode the summary is the segment digest; whole segments it does not cover yet
+        get an extractive summary (or a placeholder without precompress), the rest is sent raw.
+        With prompt_layout="prefix_stable": [main system] + [summary frozen at a block boundary]
+        + [raw messages since that boundary] + [new user message with RAG context in front of it],
+        so consecutive prompts share everything up to the new turn until the next boundary.
         """
-        history = self.load_full_history(session_id)
+        with stage("context_load_history"):
+            history = self.load_full_history(session_id)
         keep_raw_turns = self.keep_raw_turns
         num_keep_messages = 2 * keep_raw_turns
+        stable = self.prompt_layout == "prefix_stable"
+        block = self.segment_messages
         out: List[Dict[str, str]] = []
+        volatile: List[str] = []  # prefix_stable: goes into the last user message instead of the head
+        until_shift: Optional[int] = None
 
         main_system = (main_system_prompt or "").strip() or "You are a helpful, high-vibe coding assistant."
         out.append({"role": "system", "content": main_system})
 
         if rag_context and (rag_context := rag_context.strip()):
-            out.append({"role": "system", "content": f"--- RELEVANT CONTEXT (from past sessions) ---\n{rag_context}\n--- END RELEVANT CONTEXT ---"})
+            rag_block = f"--- RELEVANT CONTEXT (from past sessions) ---\n{rag_context}\n--- END RELEVANT CONTEXT ---"
+            if stable:
+                volatile.append(rag_block)
+            else:
+                out.append({"role": "system", "content": rag_block})
 
-        if self.should_summarize(history, keep_raw_turns):
+        if self.summary_mode == "hierarchical":
+            state = self.update_segments(session_id, history, self.max_catchup_calls)
+            digest = state["digest"]
+            covered = digest["through"] * block
+            if digest["through"]:
+                summary = digest["text"]
+                recalled = []
+                if self.recall_segments > 0:
+                    recalled = [
+                        f"Segment {seg['index']} (messages {seg['start']}-{seg['end'] - 1}):\n{seg['summary']}"
+                        for seg in self.find_segments(session_id, new_user_message, self.recall_segments)
+                        if seg["index"] < digest["through"]
+                    ]
+                if recalled and stable:
+                    volatile.insert(0, "--- RECALLED DETAIL ---\n" + "\n\n".join(recalled) + "\n--- END RECALLED DETAIL ---")
+                elif recalled:
+                    summary += "\n\n### Recalled detail\n" + "\n\n".join(recalled)
+                out.append({"role": "system", "content": f"--- SUMMARY OF EARLIER CONVERSATION ---\n{summary}\n--- END SUMMARY ---"})
+            # Sent raw: at most one open segment + the raw window, however far the digest lags behind
+            pending = max(0, len(history) - num_keep_messages) // block * block
+            if pending > covered:
+                # Summarizer down or behind: whole segments it could not fold in get an extractive summary,
+                # or a placeholder without precompress
+                if self.precompress:
+                    lagging = extractive_summary(history[covered:pending], offset=covered)
+                    out.append({"role": "system", "content": "--- SUMMARY OF EARLIER CONVERSATION (extractive) ---\n"
+                                f"{lagging}\n--- END SUMMARY ---"})
+                else:
+                    out.append({"role": "system", "content": f"Messages {covered}-{pending - 1} of this conversation "
+                                "are not summarized yet and were left out."})
+            recent = history[pending:]
+            until_shift = pending + block + num_keep_messages - len(history)
+        elif stable:
+            # Summary covers whole blocks only; the raw window grows from the boundary, then jumps one block
+            boundary = max(0, len(history) - num_keep_messages) // block * block
+            until_shift = boundary + block + num_keep_messages - len(history)
+            if boundary and self.should_summarize(history, keep_raw_turns):
+                summary = self._frozen_summary(session_id, history, boundary)
+                out.append({"role": "system", "content": f"--- SUMMARY OF EARLIER CONVERSATION ---\n{summary}\n--- END SUMMARY ---"})
+                recent = history[boundary:]
+            else:
+                recent = history
+        elif self.should_summarize(history, keep_raw_turns):
             old_messages = history[:-num_keep_messages] if len(history) > num_keep_messages else []
             summary = self.generate_summary(old_messages)
             out.append({"role": "system", "content": f"--- SUMMARY OF EARLIER CONVERSATION ---\n{summary}\n--- END SUMMARY ---"})
@@ -178,23 +682,82 @@ History:
             if role in ("user", "assistant") and isinstance(content, str):
                 out.append({"role": role, "content": content})
 
-        out.append({"role": "user", "content": new_user_message if new_user_message is not None else ""})
+        user_content = new_user_message if new_user_message is not None else ""
+        if volatile:
+            user_content = "\n\n".join(volatile + [user_content])
+        out.append({"role": "user", "content": user_content})
+        # Default layout: a RAG block or a regenerated summary right after the system prompt changes every turn
+        volatile_head = not stable and bool(
+            rag_context
+            or (self.summary_mode == "single" and len(recent) < len(history))
+            or (self.summary_mode == "hierarchical" and self.recall_segments > 0)
+        )
+        self._record_prefix_stats(session_id, out, 1 if volatile_head else len(out) - 1, until_shift)
         return out
 
     def add_message(self, session_id: str, role: str, content: str) -> None:
-        """Append one message to full history and save to disk."""
-        history = self.load_full_history(session_id)
-        history.append({
-            "role": role,
-            "content": content,
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()),
-        })
-        self.save_full_history(session_id, history)
+        """Append one message to full history and save to disk (safe against concurrent writers)."""
+        self.add_messages(session_id, [(role, content)])
+
+    def add_messages(self, session_id: str, messages: List[Tuple[str, str]]) -> None:
+        """Append (role, content) pairs in one write, so no other writer's message lands between them."""
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+        new = [{"role": role, "content": content, "timestamp": timestamp} for role, content in messages]
+        if self.history_store is not None:
+            self.history_store.append(session_id, new)  # one transaction, no full read
+            return
+        self.update_history(session_id, lambda history: history + new)
 
     def get_full_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Return full raw history for UI display only."""
         return self.load_full_history(session_id)
 
+    def get_last_messages(self, session_id: str, n: int) -> List[Dict[str, Any]]:
+        """Last n messages, oldest first."""
+        if self.history_store is not None:
+            return self.history_store.last(session_id, n)
+        return self.load_full_history(session_id)[-n:] if n > 0 else []
+
+    def get_history_page(self, session_id: str, limit: int = 50, before: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Page of history for UI scrollback, newest page first: up to `limit` messages before index
+        `before` (default: the end). Returns {"messages", "next_cursor"}; pass next_cursor as
+        `before` for the next older page (None = start reached).
+        """
+        if self.history_store is not None:
+            return self.history_store.page(session_id, limit=limit, before=before)
+        history = self.load_full_history(session_id)
+        end = len(history) if before is None else max(0, min(before, len(history)))
+        start = max(0, end - max(0, limit))
+        return {"messages": history[start:end], "next_cursor": start if start > 0 else None}
+
+    def search_history(self, query: str, session_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find messages containing the query across sessions: [{session_id, seq, role, timestamp, snippet}].
+        Uses the store's full-text index when configured; the JSON backend scans every file.
+        """
+        if self.history_store is not None:
+            return self.history_store.search(query, session_id=session_id, limit=limit)
+        words = re.findall(r"\w+", (query or "").lower())
+        if not words:
+            return []
+        paths = [self._get_history_path(session_id)] if session_id else sorted(self.history_dir.glob("*.json"))
+        hits: List[Dict[str, Any]] = []
+        for path in paths:
+            history, _ = self._read_history_file(path)
+            for seq, m in enumerate(history):
+                content = m.get("content") if isinstance(m.get("content"), str) else ""
+                lower = content.lower()
+                if all(w in lower for w in words):
+                    pos = lower.find(words[0])
+                    hits.append({
+                        "session_id": path.stem, "seq": seq, "role": m.get("role"),
+                        "timestamp": m.get("timestamp"), "snippet": content[max(0, pos - 50):pos + 110],
+                    })
+                    if len(hits) >= limit:
+                        return hits
+        return hits
+
 
 if __name__ == "__main__":
     # Quick test
@@ -0,0 +1,248 @@
+"""
+Deterministic extractive pre-compression of old chat history, run before the LLM summarizer.
+
+Coding sessions repeat themselves: the same file pasted after every edit, the same traceback after
+every failed run, build logs hundreds of lines long. Feeding all of that to a 4B summarizer makes it
+slow and pushes the useful parts out of its context. precompress_messages() removes the repetition
+without a model call:
+
+- identical or near-identical code blocks (whitespace-insensitive hash): only the latest copy is kept
+- code blocks for the same file (path in the fence, a "# file:" comment, or the text just before it):
+  only the latest version is kept
+- tracebacks with the same frames and exception (line numbers ignored): only the latest is kept
+- runs of repeated lines outside code (numbers ignored) collapse to one line + a count
+- long text and code blocks collapse to head + tail
+
+Earlier copies are replaced by a short marker pointing at the message that kept them.
+extractive_summary() builds a plain markdown digest (files, errors, recent requests) with no model
+at all, which is what the context manager uses when the summarizer is down.
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Outside code: collapse text runs longer than this to LOG_HEAD + LOG_TAIL lines
+MAX_TEXT_LINES = 40
+# Code blocks are allowed more before head/tail collapsing kicks in
+MAX_CODE_LINES = 80
+LOG_HEAD = 10
+LOG_TAIL = 10
+
+_FENCE = re.compile(r"```([^\n`]*)\n(.*?)```", re.DOTALL)
+_PATH = re.compile(r"(?:[\w.-]+/)*[\w.-]+\.(?:py|pyi|js|jsx|ts|tsx|mjs|cjs|svelte|vue|json|ya?ml|toml|md|sh|"
+                   r"c|h|cc|cpp|hpp|rs|go|java|kt|rb|php|css|scss|html|sql|ini|cfg)\b")
+_FILE_COMMENT = re.compile(r"^\s*(?:#|//|--|/\*)\s*(?:file(?:name)?|path)\s*:\s*(\S+)", re.IGNORECASE)
+_PY_TRACEBACK = re.compile(
+    r"Traceback \(most recent call last\):\n(?:[ \t]+.*\n)*?"
+    r"[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning|Fault)\b[^\n]*",
+)
+_JS_STACK = re.compile(r"^[\w.]*(?:Error|Exception)\b[^\n]*\n(?:[ \t]+at [^\n]*(?:\n|$))+", re.MULTILINE)
+_DIGITS = re.compile(r"\d+")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _code_key(code: str) -> str:
+    """Whitespace-insensitive fingerprint: reindented or re-wrapped copies hash the same."""
+    return _digest(re.sub(r"\s+", "", code))
+
+
+def _traceback_key(tb: str) -> str:
+    """Same frames + same exception, ignoring line numbers, addresses and counters."""
+    return _digest(_DIGITS.sub("#", re.sub(r"[ \t]+", " ", tb.strip())))
+
+
+def _error_line(tb: str) -> str:
+    """The exception line: last line of a Python traceback, first line of a JS stack."""
+    lines = tb.strip().splitlines()
+    return (lines[-1] if lines[0].startswith("Traceback") else lines[0]).strip()
+
+
+def _split(content: str) -> List[Dict[str, Any]]:
+    """Content -> segments: {"kind": "text"|"code"|"traceback", "text", "info"}."""
+    segments: List[Dict[str, Any]] = []
+    pos = 0
+    for m in _FENCE.finditer(content):
+        segments.extend(_split_text(content[pos:m.start()]))
+        segments.append({"kind": "code", "text": m.group(2), "info": m.group(1).strip()})
+        pos = m.end()
+    segments.extend(_split_text(content[pos:]))
+    return segments
+
+
+def _split_text(text: str) -> List[Dict[str, Any]]:
+    if not text:
+        return []
+    spans = sorted((m.start(), m.end()) for pattern in (_PY_TRACEBACK, _JS_STACK) for m in pattern.finditer(text))
+    out: List[Dict[str, Any]] = []
+    pos = 0
+    for start, end in spans:
+        if start < pos:
+            continue  # overlapping match from the other pattern
+        if start > pos:
+            out.append({"kind": "text", "text": text[pos:start], "info": ""})
+        out.append({"kind": "traceback", "text": text[start:end], "info": ""})
+        pos = end
+    if pos < len(text):
+        out.append({"kind": "text", "text": text[pos:], "info": ""})
+    return out
+
+
+def _file_for(segment: Dict[str, Any], preceding: str) -> Optional[str]:
+    """File a code block belongs to: fence info, a leading file comment, or the last path mentioned just before it."""
+    m = _PATH.search(segment["info"])
+    if m:
+        return m.group(0)
+    first_line = segment["text"].split("\n", 1)[0]
+    m = _FILE_COMMENT.match(first_line)
+    if m:
+        return m.group(1)
+    paths = _PATH.findall(preceding[-200:])
+    return paths[-1] if paths else None
+
+
+def _head_tail(lines: List[str], limit: int) -> Tuple[List[str], int]:
+    if len(lines) <= limit:
+        return lines, 0
+    omitted = len(lines) - LOG_HEAD - LOG_TAIL
+    return lines[:LOG_HEAD] + [f"[... {omitted} lines omitted ...]"] + lines[-LOG_TAIL:], omitted
+
+
+def _collapse_repeats(lines: List[str]) -> Tuple[List[str], int]:
+    """Runs of lines that differ only in numbers (log counters, timestamps) -> first line + count."""
+    out: List[str] = []
+    collapsed = 0
+    i = 0
+    while i < len(lines):
+        key = _DIGITS.sub("#", lines[i].strip())
+        j = i + 1
+        while j < len(lines) and key and _DIGITS.sub("#", lines[j].strip()) == key:
+            j += 1
+        out.append(lines[i])
+        if j - i > 2:
+            out.append(f"[previous line repeated {j - i - 1} more times with different numbers]")
+            collapsed += j - i - 1
+        else:
+            out.extend(lines[i + 1:j])
+        i = j
+    return out, collapsed
+
+
+def precompress_messages(
+    messages: List[Dict[str, Any]], offset: int = 0
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Compressed copies of messages (same order, roles and other keys) plus stats:
+    {chars_before, chars_after, code_blocks_deduplicated, file_versions_dropped,
+     tracebacks_deduplicated, lines_collapsed}. Deterministic; no model call.
+    Markers refer to messages by offset + position (pass the slice start for a slice of history).
+    """
+    stats = {"chars_before": 0, "chars_after": 0, "code_blocks_deduplicated": 0, "file_versions_dropped": 0,
+             "tracebacks_deduplicated": 0, "lines_collapsed": 0}
+    parsed = []
+    for m in messages:
+        content = m.get("content") if isinstance(m.get("content"), str) else str(m.get("content", ""))
+        stats["chars_before"] += len(content)
+        parsed.append(_split(content))
+
+    # Newest first, so the latest copy of anything repeated is the one that survives
+    seen_code: Dict[str, int] = {}
+    seen_files: Dict[str, int] = {}
+    seen_tracebacks: Dict[str, int] = {}
+    for index in range(len(parsed) - 1, -1, -1):
+        preceding, contexts = "", []
+        for seg in parsed[index]:
+            contexts.append(preceding)
+            preceding += seg["text"] if seg["kind"] == "text" else ""
+        for seg, preceding in reversed(list(zip(parsed[index], contexts))):
+            if seg["kind"] == "code":
+                key = _code_key(seg["text"])
+                path = _file_for(seg, preceding)
+                if key in seen_code:
+                    seg["replacement"] = f"[code block omitted: same as in message {seen_code[key]}]"
+                    stats["code_blocks_deduplicated"] += 1
+                elif path and path in seen_files:
+                    seg["replacement"] = f"[older version of {path} omitted: latest in message {seen_files[path]}]"
+                    stats["file_versions_dropped"] += 1
+                else:
+                    seen_code[key] = offset + index
+                    if path:
+                        seen_files[path] = offset + index
+            elif seg["kind"] == "traceback":
+                key = _traceback_key(seg["text"])
+                if key in seen_tracebacks:
+                    seg["replacement"] = (f"[traceback omitted ({_error_line(seg['text'])}): "
+                                          f"same as in message {seen_tracebacks[key]}]")
+                    stats["tracebacks_deduplicated"] += 1
+                else:
+                    seen_tracebacks[key] = offset + index
+
+    out = []
+    for m, segments in zip(messages, parsed):
+        parts = []
+        for seg in segments:
+            if "replacement" in seg:
+                parts.append(seg["replacement"])
+            elif seg["kind"] == "code":
+                lines, omitted = _head_tail(seg["text"].rstrip("\n").split("\n"), MAX_CODE_LINES)
+                stats["lines_collapsed"] += omitted
+                parts.append(f"```{seg['info']}\n" + "\n".join(lines) + "\n```")
+            elif seg["kind"] == "traceback":
+                parts.append(seg["text"])
+            else:
+                lines, repeated = _collapse_repeats(seg["text"].split("\n"))
+                lines, omitted = _head_tail(lines, MAX_TEXT_LINES)
+                stats["lines_collapsed"] += repeated + omitted
+                parts.append("\n".join(lines))
+        content = "".join(parts)
+        stats["chars_after"] += len(content)
+        out.append(dict(m, content=content))
+    return out, stats
+
+
+def extractive_summary(messages: List[Dict[str, Any]], max_chars: int = 3000, offset: int = 0) -> str:
+    """
+    Model-free markdown digest of messages: most-discussed files, distinct errors with counts,
+    the most recent user requests and the last assistant reply. Used when the summarizer is unavailable.
+    Message numbers are offset + position, as in precompress_messages.
+    """
+    if not messages:
+        return "No prior conversation history."
+    files: Dict[str, List[int]] = {}
+    errors: Dict[str, List[int]] = {}
+    # Files from pre-compressed text, so a 500-line build log counts as a few mentions, not 500
+    for index, m in enumerate(precompress_messages(messages, offset)[0], offset):
+        for path in dict.fromkeys(_PATH.findall(m["content"])):
+            files.setdefault(path, []).append(index)
+    for index, m in enumerate(messages, offset):
+        content = m.get("content") if isinstance(m.get("content"), str) else ""
+        for seg in _split(content):
+            if seg["kind"] == "traceback":
+                errors.setdefault(_error_line(seg["text"])[:160], []).append(index)
+
+    def first_line(text: str, limit: int) -> str:
+        line = next((ln.split("```")[0].strip() for ln in (text or "").splitlines() if ln.split("```")[0].strip()), "")
+        return line if len(line) <= limit else line[: limit - 3] + "..."
+
+    sections = [f"## Extractive summary of messages {offset}-{offset + len(messages) - 1} (no summarizer)"]
+    if files:
+        top = sorted(files.items(), key=lambda kv: (-len(kv[1]), -kv[1][-1]))[:15]
+        sections.append("### Files\n" + "\n".join(
+            f"- {path} (in {len(seen)} messages, last {seen[-1]})" for path, seen in top))
+    if errors:
+        recent = sorted(errors.items(), key=lambda kv: -kv[1][-1])[:8]
+        sections.append("### Errors seen\n" + "\n".join(
+            f"- {error} (x{len(seen)}, last in message {seen[-1]})" for error, seen in recent))
+    requests = [(i, m) for i, m in enumerate(messages, offset) if m.get("role") == "user"][-5:]
+    if requests:
+        sections.append("### Recent requests\n" + "\n".join(
+            f"- [{i}] {first_line(m.get('content', ''), 160)}" for i, m in requests))
+    replies = [(i, m) for i, m in enumerate(messages, offset) if m.get("role") == "assistant"]
+    if replies:
+        i, m = replies[-1]
+        sections.append(f"### Last reply [{i}]\n{first_line(m.get('content', ''), 400)}")
+    text = "\n\n".join(sections)
+    return text if len(text) <= max_chars else text[: max_chars - 4] + "\n..."
@@ -1,18 +1,21 @@
-# pip install chromadb
+# pip install chromadb   (or numpy only, with MmapVectorStore)
 """
-Optional RAG layer for Vibe Coder: index past code chunks and fixes in Chroma (local vector DB).
+Optional RAG layer for Vibe Coder: index past code chunks and fixes in a local vector store
+(Chroma by default, or the lightweight MmapVectorStore from vibe_coder_vector_store).
 Retrieve only what's relevant to the current query so the model can "recall that regex fix from Tuesday"
 without re-sending 10k tokens. Does not replace or change summarization; use alongside it.
 """
 
-import re
+import sys
 import time
 import uuid
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-import chromadb
-from chromadb.config import Settings as ChromaSettings
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+if TYPE_CHECKING:
+    from vibe_coder_vector_store import VectorStore
 
 
 # Chunk long messages so we don't index one huge blob; ~500 chars per chunk with overlap.
@@ -42,38 +45,38 @@ def _chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OV
 
 class VibeCoderRAG:
     """
-    Hybrid RAG-style memory: index key code chunks and past fixes in Chroma (local, tiny).
+    Hybrid RAG-style memory: index key code chunks and past fixes in a local vector store.
     When you ask something, retrieve only what's relevant and stuff that into the prompt.
     Optional add-on to VibeCoderContextManager; does not change summarization behavior.
+    Pass store=MmapVectorStore(...) to skip Chroma entirely; the default stays Chroma in chroma_dir.
     """
 
     def __init__(
         self,
         chroma_dir: str = "~/.vibe-coder/chroma",
         collection_name: str = "vibe_coder_memory",
+        store: Optional["VectorStore"] = None,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
     ) -> None:
         self.chroma_dir = Path(chroma_dir).expanduser().resolve()
-        self.chroma_dir.mkdir(parents=True, exist_ok=True)
         self.collection_name = collection_name
-        # PersistentClient uses local disk; default embedding (all-MiniLM-L6-v2) runs on CPU, no GPU needed
-        self._client = chromadb.PersistentClient(
-            path=str(self.chroma_dir),
-            settings=ChromaSettings(anonymized_telemetry=False),
-        )
-        # Get or create collection; Chroma uses default embedding function if we don't pass one
-        self._collection = self._client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"},
-        )
+        if store is None:
+            # numpy + chromadb are imported here, so importing this module stays cheap
+            from vibe_coder_vector_store import ChromaVectorStore
+            store = ChromaVectorStore(str(self.chroma_dir), collection_name)
+        self.store = store
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
 
     def index_message(self, session_id: str, role: str, content: str) -> None:
         """
-        Index one message (e.g. assistant reply with a code fix) into Chroma.
+        Index one message (e.g. assistant reply with a code fix) into the vector store.
         Long content is chunked so retrieval returns relevant pieces, not one giant doc.
         """
         if not content or not content.strip():
             return
-        chunks = _chunk_text(content.strip())
+        chunks = _chunk_text(content.strip(), self.chunk_size, self.chunk_overlap)
         if not chunks:
             return
         ids = [f"{session_id}_{role}_{uuid.uuid4().hex[:12]}_{i}" for i in range(len(chunks))]
@@ -82,38 +85,48 @@ class VibeCoderRAG:
             for _ in chunks
         ]
         try:
-            self._collection.add(
-                documents=chunks,
-                ids=ids,
-                metadatas=metadatas,
-            )
+            self.store.add(ids, chunks, metadatas)
         except Exception as e:
             print(f"[VibeCoderRAG] index_message error: {e}")
 
-    def retrieve(
+    def retrieve_chunks(
         self,
         query: str,
         session_id: Optional[str] = None,
         top_k: int = 5,
-    ) -> str:
+    ) -> List[Dict[str, Any]]:
         """
-        Retrieve top_k most relevant chunks for the query. Optionally filter by session_id.
-        Returns a single string to inject as "Relevant context" in the prompt.
+        Top_k most relevant chunks, best first: [{id, document, session_id, role, timestamp, score}]
+        (score = cosine similarity). Optionally filter by session_id.
         """
         if not query or not query.strip():
-            return ""
+            return []
         try:
-            where = {"session_id": session_id} if session_id else None
-            results = self._collection.query(
-                query_texts=[query.strip()],
-                n_results=min(top_k, 20),
-                where=where,
-            )
-            docs = results.get("documents")
-            if not docs or not docs[0]:
-                return ""
-            combined = "\n\n---\n\n".join(docs[0])
-            return combined.strip()
+            hits = self.store.query(query.strip(), top_k=min(top_k, 20), session_id=session_id or None)
         except Exception as e:
             print(f"[VibeCoderRAG] retrieve error: {e}")
-            return ""
+            return []
+        return [
+            {
+                "id": h["id"],
+                "document": h["document"],
+                "session_id": h["metadata"].get("session_id"),
+                "role": h["metadata"].get("role"),
+                "timestamp": h["metadata"].get("timestamp"),
+                "score": round(h["score"], 4),
+            }
+            for h in hits
+        ]
+
+    def retrieve(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        top_k: int = 5,
+    ) -> str:
+        """
+        Retrieve top_k most relevant chunks for the query. Optionally filter by session_id.
+        Returns a single string to inject as "Relevant context" in the prompt.
+        """
+        chunks = self.retrieve_chunks(query, session_id=session_id, top_k=top_k)
+        return "\n\n---\n\n".join(c["document"] for c in chunks).strip()
@@ -0,0 +1,332 @@
+"""
+Optional SQLite history backend for VibeCoderContextManager.
+
+One WAL-mode database instead of one JSON file per session:
+- range / paginated reads (last N messages, pages before a cursor) without loading whole sessions
+- FTS5 full-text search over message content across all sessions ("that fix from Tuesday")
+- large message bodies stored zlib-compressed
+- appends are a single short transaction, safe across threads and processes
+
+  from vibe_coder_sqlite_store import SQLiteHistoryStore
+  manager = VibeCoderContextManager(history_store=SQLiteHistoryStore("~/.vibe-coder/history.db"))
+
+One-shot import of the existing JSON directory:
+
+  python3 vibe_coder_sqlite_store.py import --history-dir ~/.vibe-coder/history --db ~/.vibe-coder/history.db
+  python3 vibe_coder_sqlite_store.py search "regex fix"
+"""
+
+import argparse
+import contextlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from vibe_coder_context_manager import HistoryConflictError, safe_session_id
+
+# Bodies larger than this (UTF-8 bytes) are stored zlib-compressed
+COMPRESS_THRESHOLD = 2048
+SNIPPET_CHARS = 160
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content BLOB NOT NULL,
+    compressed INTEGER NOT NULL DEFAULT 0,
+    timestamp TEXT,
+    UNIQUE (session_id, seq)
+);
+"""
+
+# Contentless FTS5: the index holds only tokens, message text stays (compressed) in `messages`
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='')"
+
+
+def _encode(content: str):
+    raw = content.encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        return zlib.compress(raw, 6), 1
+    return content, 0
+
+
+def _decode(content, compressed: int) -> str:
+    return zlib.decompress(content).decode("utf-8") if compressed else content
+
+
+def _snippet(text: str, query: str) -> str:
+    """~SNIPPET_CHARS of text around the first query term (FTS5 snippet() needs stored content)."""
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t]
+    lower = text.lower()
+    pos = min((lower.find(t) for t in terms if t in lower), default=0)
+    start = max(0, pos - SNIPPET_CHARS // 3)
+    snippet = text[start:start + SNIPPET_CHARS].replace("\n", " ")
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match (quoted, so no syntax errors)."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{w}"' for w in words)
+
+
+class SQLiteHistoryStore:
+    """
+    Session histories in one SQLite database (WAL mode). One connection per thread; every write is
+    a BEGIN IMMEDIATE transaction, so concurrent writers in other threads/processes queue on
+    SQLite's own lock. Versions are per-session integers bumped on every write. Session ids are
+    keyed like the JSON backend's file names (safe_session_id), so an import keeps them matching.
+    """
+
+    def __init__(self, db_path: str = "~/.vibe-coder/history.db", busy_timeout_ms: int = 10000) -> None:
+        self.db_path = Path(db_path).expanduser().resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        try:
+            conn.execute(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to scanning (slow but correct)
+            self.has_fts = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error) on this thread's connection."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- reads ----------------------------------------------------------
+
+    @staticmethod
+    def _rows_to_messages(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+        return [
+            {"role": role, "content": _decode(content, compressed), "timestamp": ts}
+            for _seq, role, content, compressed, ts in rows
+        ]
+
+    def version(self, session_id: str) -> str:
+        session_id = safe_session_id(session_id)
+        row = self._conn().execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return str(row[0]) if row else ""
+
+    def count(self, session_id: str) -> int:
+        session_id = safe_session_id(session_id)
+        row = self._conn().execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        """Whole session, oldest first (same dicts as the JSON backend)."""
+        rows = self._conn().execute(
+            "SELECT seq, role, content, compressed, timestamp FROM messages WHERE session_id = ? ORDER BY seq",
+            (safe_session_id(session_id),),
+        ).fetchall()
+        return self._rows_to_messages(rows)
+
+    def load_range(self, session_id: str, start: int, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Messages with start <= seq < end (seq is the 0-based position in the session)."""
+        rows = self._conn().execute(
+            "SELECT seq, role, content, compressed, timestamp FROM messages "
+            "WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (safe_session_id(session_id), start, end if end is not None else 2**62),
+        ).fetchall()
+        return self._rows_to_messages(rows)
+
+    def last(self, session_id: str, n: int) -> List[Dict[str, Any]]:
+        """Last n messages, oldest first."""
+        return self.page(session_id, limit=n)["messages"]
+
+    def page(self, session_id: str, limit: int = 50, before: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Newest-first pagination for UI scrollback: up to `limit` messages with seq < before
+        (default: the end), returned oldest first. next_cursor is the `before` for the next older
+        page, or None when the start of the session was reached.
+        """
+        rows = self._conn().execute(
+            "SELECT seq, role, content, compressed, timestamp FROM messages "
+            "WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (safe_session_id(session_id), before if before is not None else 2**62, max(0, limit)),
+        ).fetchall()
+        first_seq = rows[-1][0] if rows else 0
+        return {"messages": self._rows_to_messages(reversed(rows)), "next_cursor": first_seq if first_seq > 0 else None}
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT session_id, message_count, updated_at FROM sessions ORDER BY updated_at DESC"
+        ).fetchall()
+        return [{"session_id": s, "message_count": n, "updated_at": u} for s, n, u in rows]
+
+    def search(self, query: str, session_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text search across sessions (best match first): [{session_id, seq, role, timestamp, snippet}]."""
+        if not query or not query.strip():
+            return []
+        conn = self._conn()
+        session_id = safe_session_id(session_id) if session_id else None
+        if self.has_fts:
+            fts_query = _fts_query(query)
+            if not fts_query:
+                return []
+            sql = (
+                "SELECT m.session_id, m.seq, m.role, m.content, m.compressed, m.timestamp "
+                "FROM messages_fts f JOIN messages m ON m.id = f.rowid "
+                "WHERE messages_fts MATCH ?" + (" AND m.session_id = ?" if session_id else "") +
+                " ORDER BY f.rank LIMIT ?"
+            )
+            params = [fts_query] + ([session_id] if session_id else []) + [limit]
+            rows = conn.execute(sql, params).fetchall()
+        else:
+            # Same rule as the FTS path: every word must appear, in any order
+            words = [w.lower() for w in re.findall(r"\w+", query)]
+            if not words:
+                return []
+            rows = []
+            sql = "SELECT session_id, seq, role, content, compressed, timestamp FROM messages"
+            for row in conn.execute(sql + (" WHERE session_id = ?" if session_id else ""),
+                                    (session_id,) if session_id else ()):
+                text = _decode(row[3], row[4]).lower()
+                if all(w in text for w in words):
+                    rows.append(row)
+                    if len(rows) >= limit:
+                        break
+        return [
+            {"session_id": sid, "seq": seq, "role": role, "timestamp": ts,
+             "snippet": _snippet(_decode(content, compressed), query)}
+            for sid, seq, role, content, compressed, ts in rows
+        ]
+
+    # --- writes ---------------------------------------------------------
+
+    def _insert(self, conn: sqlite3.Connection, session_id: str, seq: int, message: Dict[str, Any]) -> None:
+        content = message.get("content")
+        content = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+        stored, compressed = _encode(content)
+        cur = conn.execute(
+            "INSERT INTO messages (session_id, seq, role, content, compressed, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, seq, message.get("role", "user"), stored, compressed, message.get("timestamp")),
+        )
+        if self.has_fts:
+            conn.execute("INSERT INTO messages_fts (rowid, content) VALUES (?, ?)", (cur.lastrowid, content))
+
+    def _touch_session(self, conn: sqlite3.Connection, session_id: str, count: int) -> str:
+        conn.execute(
+            "INSERT INTO sessions (session_id, version, message_count, updated_at) VALUES (?, 1, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET version = version + 1, "
+            "message_count = excluded.message_count, updated_at = excluded.updated_at",
+            (session_id, count, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())),
+        )
+        return str(conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0])
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]]) -> str:
+        """Append messages in one transaction (no read of the existing history). Returns the new version."""
+        session_id = safe_session_id(session_id)
+        with self._write() as conn:
+            count = self.count(session_id)
+            for i, message in enumerate(messages):
+                self._insert(conn, session_id, count + i, message)
+            return self._touch_session(conn, session_id, count + len(messages))
+
+    def replace(self, session_id: str, history: List[Dict[str, Any]], expected_version: Optional[str] = None) -> str:
+        """Replace a whole session (save_full_history). Raises HistoryConflictError on a stale version."""
+        session_id = safe_session_id(session_id)
+        with self._write() as conn:
+            if expected_version is not None and self.version(session_id) != expected_version:
+                raise HistoryConflictError(f"history for {session_id!r} changed since it was read")
+            if self.has_fts:
+                # Contentless FTS rows are deleted by replaying their original text
+                for row_id, content, compressed in conn.execute(
+                    "SELECT id, content, compressed FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchall():
+                    conn.execute(
+                        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', ?, ?)",
+                        (row_id, _decode(content, compressed)),
+                    )
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            for seq, message in enumerate(history):
+                self._insert(conn, session_id, seq, message)
+            return self._touch_session(conn, session_id, len(history))
+
+    def import_json_directory(self, history_dir: str = "~/.vibe-coder/history", overwrite: bool = False) -> Dict[str, int]:
+        """
+        One-shot import of the JSON backend (<session>.json files). The file name is the session id as
+        safe_session_id() wrote it, which is also how this store keys sessions, so reads by the original
+        id ("proj/main") find the imported "proj_main". Sessions already in the database are skipped
+        unless overwrite=True. Returns counts of sessions/messages imported and skipped.
+        """
+        stats = {"sessions": 0, "messages": 0, "skipped": 0, "errors": 0}
+        for path in sorted(Path(history_dir).expanduser().glob("*.json")):
+            session_id = path.stem
+            if not overwrite and self.count(session_id):
+                stats["skipped"] += 1
+                continue
+            try:
+                history = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[SQLiteHistoryStore] skipping {path.name}: {e}")
+                stats["errors"] += 1
+                continue
+            if not isinstance(history, list):
+                stats["errors"] += 1
+                continue
+            self.replace(session_id, [m for m in history if isinstance(m, dict)])
+            stats["sessions"] += 1
+            stats["messages"] += len(history)
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite history store: import JSON histories or search them.")
+    parser.add_argument("--db", default="~/.vibe-coder/history.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="import <session>.json files from the JSON history dir")
+    imp.add_argument("--history-dir", default="~/.vibe-coder/history")
+    imp.add_argument("--overwrite", action="store_true", help="re-import sessions already in the database")
+    search = sub.add_parser("search", help="full-text search across all sessions")
+    search.add_argument("query")
+    search.add_argument("--session")
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    store = SQLiteHistoryStore(args.db)
+    if args.command == "import":
+        start = time.time()
+        stats = store.import_json_directory(args.history_dir, overwrite=args.overwrite)
+        print(f"Imported {stats['sessions']} sessions / {stats['messages']} messages into {store.db_path} "
+              f"in {time.time() - start:.2f}s (skipped {stats['skipped']}, errors {stats['errors']})")
+    else:
+        for hit in store.search(args.query, session_id=args.session, limit=args.limit):
+            print(f"[{hit['session_id']} #{hit['seq']} {hit['role']} {hit['timestamp']}] {hit['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# pip install numpy   (chromadb only for ChromaVectorStore)
+"""
+Vector stores for VibeCoderRAG.
+
+- MmapVectorStore: single-user desktop memory. float16 embeddings in a memory-mapped file, a JSONL
+  metadata sidecar read only for hits, vectorized brute-force search with an optional IVF index.
+  Opening it maps files and reads a small header, so startup stays in milliseconds at 100k chunks.
+- ChromaVectorStore: the original chromadb.PersistentClient backend (SQLite + HNSW).
+
+Both implement VectorStore: add(ids, documents, metadatas), query(text, top_k, session_id), count().
+Embedders are any callable List[str] -> array (n, dim); HashingEmbedder is the dependency-free default.
+"""
+
+import abc
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+Embedder = Callable[[List[str]], Any]
+
+# Rows scored per matmul when the float16 file is scored directly (bounds the temporary float32 copy)
+SCORE_BLOCK_ROWS = 65536
+# float16 -> float32 conversion costs more than the matmul itself, so up to this many bytes of float32
+# vectors are kept in RAM after the first query (256 MB = ~170k chunks at 384 dims); 0 disables it
+MAX_RESIDENT_BYTES = 256 * 1024 * 1024
+# Below this many candidate rows, brute force beats probing IVF lists
+IVF_MIN_ROWS = 20000
+# Default nprobe: this share of the IVF lists, at least IVF_MIN_NPROBE. At 100k chunks (316 lists) probing
+# 16 lists kept 71% of the exact top 5 (5 ms), 32 kept 84% (10 ms), 64 kept 88% but at 21 ms was slower
+# than brute force (17 ms). Pass nprobe= to pick another point on that curve.
+IVF_PROBE_FRACTION = 0.1
+IVF_MIN_NPROBE = 32
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of words + word bigrams into dim buckets, L2-normalized.
+    No model download and deterministic across runs; good for keyword-ish recall of code and errors.
+    For semantic matches pass a real model instead, e.g. a sentence-transformers encode function.
+    """
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            tokens = re.findall(r"[a-z0-9_]+", (text or "").lower())
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                h = zlib.crc32(feature.encode("utf-8"))  # stable across processes, unlike hash()
+                out[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(out)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorStore(abc.ABC):
+    """
+    Interface used by VibeCoderRAG. query() returns [{id, document, metadata, score}], best first;
+    a session_id of None or "" searches every session.
+    """
+
+    @abc.abstractmethod
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def query(self, text: str, top_k: int = 5, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Files in `path`:
+      store.json      header: dim, embedder, count, session names, IVF size (written last = commit point)
+      vectors.f16     count x dim float16, unit-normalized (cosine = dot product)
+      rows.i64        count x 2: session code, byte offset of the row in meta.jsonl
+      meta.jsonl      {"id", "document", "metadata"} per row
+      ivf.f32 / ivf_lists.i32   centroids and per-row list ids, after build_ivf()
+    Appends go to the data files first and the header last, so a crash mid-add loses only that batch.
+    One writer process at a time; readers in the same process are thread-safe.
+    """
+
+    def __init__(self, path: str = "~/.vibe-coder/vectors", embed: Optional[Embedder] = None,
+                 dim: int = 384, nprobe: Optional[int] = None, max_resident_bytes: int = MAX_RESIDENT_BYTES,
+                 ivf_min_rows: int = IVF_MIN_ROWS) -> None:
+        self.path = Path(path).expanduser().resolve()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embed = embed or HashingEmbedder(dim)
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows  # 0 probes IVF lists at any size (evaluation)
+        self.max_resident_bytes = max_resident_bytes
+        self._lock = threading.RLock()
+        self._views: Dict[str, np.ndarray] = {}
+        self._resident: Optional[np.ndarray] = None  # float32 copy, capacity >= count rows
+        header_path = self.path / "store.json"
+        if header_path.exists():
+            self._header = json.loads(header_path.read_text(encoding="utf-8"))
+            name = getattr(self.embed, "name", None)
+            if name and self._header.get("embedder") and name != self._header["embedder"]:
+                raise ValueError(f"store at {self.path} was built with {self._header['embedder']}, not {name}")
+            self._truncate_to_header()
+        else:
+            self._header = {"version": 1, "dim": getattr(self.embed, "dim", dim),
+                            "embedder": getattr(self.embed, "name", None), "count": 0, "meta_bytes": 0,
+                            "sessions": [], "ivf_lists": 0}
+        self.dim = self._header["dim"]
+        self._session_codes = {name: i for i, name in enumerate(self._header["sessions"])}
+
+    # --- files ----------------------------------------------------------
+
+    def _file(self, name: str) -> Path:
+        return self.path / name
+
+    def _truncate_to_header(self) -> None:
+        """Drop bytes a crashed add() wrote past the last committed header."""
+        count = self._header["count"]
+        sizes = {
+            "vectors.f16": count * self._header["dim"] * 2,
+            "rows.i64": count * 16,
+            "meta.jsonl": self._header["meta_bytes"],
+        }
+        if self._header["ivf_lists"]:
+            sizes["ivf_lists.i32"] = count * 4
+        for name, size in sizes.items():
+            path = self._file(name)
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def _write_header(self) -> None:
+        tmp = self._file("store.json.tmp")
+        tmp.write_text(json.dumps(self._header), encoding="utf-8")
+        os.replace(tmp, self._file("store.json"))
+        self._views.clear()  # sizes changed; re-map on next query
+
+    def _view(self, name: str, dtype: Any, cols: int) -> np.ndarray:
+        """Read-only memmap of the committed rows of a data file (cached until the next write)."""
+        view = self._views.get(name)
+        if view is None:
+            rows = self._header["ivf_lists"] if name == "ivf.f32" else self._header["count"]
+            if rows == 0:
+                view = np.zeros((0, cols), dtype=dtype)
+            else:
+                view = np.memmap(self._file(name), dtype=dtype, mode="r", shape=(rows, cols))
+            self._views[name] = view
+        return view
+
+    def count(self) -> int:
+        return self._header["count"]
+
+    def disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.path.iterdir() if p.is_file())
+
+    # --- writes ---------------------------------------------------------
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        if not documents:
+            return
+        vectors = _normalize(self.embed(documents))
+        if vectors.shape != (len(documents), self.dim):
+            raise ValueError(f"embedder returned shape {vectors.shape}, expected ({len(documents)}, {self.dim})")
+        with self._lock:
+            header = self._header
+            offset = header["meta_bytes"]
+            rows = np.empty((len(documents), 2), dtype=np.int64)
+            lines = []
+            for i, (doc_id, doc, meta) in enumerate(zip(ids, documents, metadatas)):
+                session = (meta or {}).get("session_id") or ""
+                code = self._session_codes.get(session)
+                if code is None:
+                    code = self._session_codes[session] = len(header["sessions"])
+                    header["sessions"].append(session)
+                line = (json.dumps({"id": doc_id, "document": doc, "metadata": meta}, ensure_ascii=False) + "\n").encode("utf-8")
+                rows[i] = (code, offset)
+                offset += len(line)
+                lines.append(line)
+            with open(self._file("vectors.f16"), "ab") as f:
+                f.write(vectors.astype(np.float16).tobytes())
+            with open(self._file("rows.i64"), "ab") as f:
+                f.write(rows.tobytes())
+            with open(self._file("meta.jsonl"), "ab") as f:
+                f.write(b"".join(lines))
+            if header["ivf_lists"]:
+                lists = self._nearest_centroid(vectors).astype(np.int32)
+                with open(self._file("ivf_lists.i32"), "ab") as f:
+                    f.write(lists.tobytes())
+            if self._resident is not None:
+                self._extend_resident(vectors)
+            header["count"] += len(documents)
+            header["meta_bytes"] = offset
+            self._write_header()
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, sample: int = 50000, seed: int = 0) -> int:
+        """
+        Cluster the stored vectors (spherical k-means on a sample) into nlist lists; later queries probe
+        the nprobe closest lists instead of scanning everything. New rows are assigned as they are added.
+        Worth it from roughly IVF_MIN_ROWS chunks up. Returns the number of lists.
+        """
+        with self._lock:
+            count = self.count()
+            if count == 0:
+                return 0
+            nlist = nlist or int(min(1024, max(16, np.sqrt(count))))
+            nlist = min(nlist, count)
+            rng = np.random.default_rng(seed)
+            vectors = self._view("vectors.f16", np.float16, self.dim)
+            picked = np.sort(rng.choice(count, size=min(sample, count), replace=False))
+            train = np.asarray(vectors[picked], dtype=np.float32)
+            centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(train @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, train)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = train[rng.choice(len(train), size=int(empty.sum()), replace=False)]
+                centroids = _normalize(sums)
+            self._file("ivf.f32").write_bytes(centroids.astype(np.float32).tobytes())
+            self._header["ivf_lists"] = nlist
+            self._views.pop("ivf.f32", None)
+            lists = np.concatenate([
+                self._nearest_centroid(np.asarray(vectors[i:i + SCORE_BLOCK_ROWS], dtype=np.float32))
+                for i in range(0, count, SCORE_BLOCK_ROWS)
+            ]).astype(np.int32)
+            self._file("ivf_lists.i32").write_bytes(lists.tobytes())
+            self._write_header()
+            return nlist
+
+    def _extend_resident(self, vectors: np.ndarray) -> None:
+        count = self.count()
+        needed = count + len(vectors)
+        if needed * self.dim * 4 > self.max_resident_bytes:
+            self._resident = None  # outgrew the budget; score from the float16 file from now on
+            return
+        if needed > len(self._resident):
+            grown = np.empty((max(needed, 2 * len(self._resident)), self.dim), dtype=np.float32)
+            grown[:count] = self._resident[:count]
+            self._resident = grown
+        # Round-trip through float16 so resident scores match the file exactly
+        self._resident[count:needed] = vectors.astype(np.float16)
+
+    def _matrix(self) -> np.ndarray:
+        """Vectors to score: the resident float32 copy if it fits the budget, else the float16 memmap."""
+        count = self.count()
+        if self._resident is None and 0 < count * self.dim * 4 <= self.max_resident_bytes:
+            self._resident = np.asarray(self._view("vectors.f16", np.float16, self.dim), dtype=np.float32)
+        if self._resident is not None:
+            return self._resident[:count]
+        return self._view("vectors.f16", np.float16, self.dim)
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        centroids = self._view("ivf.f32", np.float32, self.dim)
+        return np.argmax(vectors @ centroids.T, axis=1)
+
+    # --- reads ----------------------------------------------------------
+
+    def effective_nprobe(self, nlist: int) -> int:
+        """IVF lists to probe: the nprobe passed in, else IVF_PROBE_FRACTION of nlist (at least IVF_MIN_NPROBE)."""
+        if self.nprobe:
+            return min(nlist, self.nprobe)
+        return min(nlist, max(IVF_MIN_NPROBE, int(nlist * IVF_PROBE_FRACTION)))
+
+    def _candidates(self, q: np.ndarray, session_id: Optional[str]) -> Optional[np.ndarray]:
+        """Row indexes to score, or None for all rows."""
+        count = self.count()
+        rows = None
+        if session_id:
+            code = self._session_codes.get(session_id)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            rows = np.flatnonzero(self._view("rows.i64", np.int64, 2)[:, 0] == code)
+        n = count if rows is None else len(rows)
+        if not self._header["ivf_lists"] or n < self.ivf_min_rows:
+            return rows
+        centroids = self._view("ivf.f32", np.float32, self.dim)
+        probe = np.argsort(-(centroids @ q))[: self.effective_nprobe(len(centroids))]
+        lists = np.asarray(self._view("ivf_lists.i32", np.int32, 1)[:, 0])
+        in_probe = np.isin(lists if rows is None else lists[rows], probe)
+        return np.flatnonzero(in_probe) if rows is None else rows[in_probe]
+
+    def query(self, text: str, top_k: int = 5, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if not text or top_k <= 0:
+            return []
+        q = _normalize(self.embed([text]))[0]
+        with self._lock:
+            vectors = self._matrix()
+            candidates = self._candidates(q, session_id)
+            total = len(vectors) if candidates is None else len(candidates)
+            if total == 0:
+                return []
+            best_rows: List[np.ndarray] = []
+            best_scores: List[np.ndarray] = []
+            for start in range(0, total, SCORE_BLOCK_ROWS):
+                if candidates is None:
+                    index = np.arange(start, min(total, start + SCORE_BLOCK_ROWS))
+                    block = vectors[start:start + SCORE_BLOCK_ROWS]
+                else:
+                    index = candidates[start:start + SCORE_BLOCK_ROWS]
+                    block = vectors[index]
+                scores = np.asarray(block, dtype=np.float32) @ q
+                k = min(top_k, len(scores))
+                part = np.argpartition(-scores, k - 1)[:k]
+                best_rows.append(index[part])
+                best_scores.append(scores[part])
+            rows = np.concatenate(best_rows)
+            scores = np.concatenate(best_scores)
+            order = np.argsort(-scores)[:top_k]
+            offsets = self._view("rows.i64", np.int64, 2)[rows[order], 1]
+        hits = []
+        with open(self._file("meta.jsonl"), "rb") as f:
+            for offset, score in zip(offsets, scores[order]):
+                f.seek(int(offset))
+                record = json.loads(f.readline())
+                hits.append({"id": record["id"], "document": record["document"],
+                             "metadata": record.get("metadata") or {}, "score": float(score)})
+        return hits
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    chromadb.PersistentClient collection (cosine HNSW). chromadb is imported here, not at module load.
+    With embed=None Chroma's default embedding (all-MiniLM-L6-v2, ~80MB download on first use) is used.
+    """
+
+    def __init__(self, path: str = "~/.vibe-coder/chroma", collection_name: str = "vibe_coder_memory",
+                 embed: Optional[Embedder] = None) -> None:
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        self.path = Path(path).expanduser().resolve()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embed = embed
+        # PersistentClient uses local disk; default embedding runs on CPU, no GPU needed
+        self._client = chromadb.PersistentClient(
+            path=str(self.path),
+            settings=ChromaSettings(anonymized_telemetry=False),
+        )
+        self._collection = self._client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.path.rglob("*") if p.is_file())
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        if not documents:
+            return
+        kwargs: Dict[str, Any] = {"documents": documents, "ids": ids, "metadatas": metadatas}
+        if self.embed is not None:
+            kwargs["embeddings"] = _normalize(self.embed(documents)).tolist()
+        self._collection.add(**kwargs)
+
+    def query(self, text: str, top_k: int = 5, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if not text or top_k <= 0:
+            return []
+        kwargs: Dict[str, Any] = {"n_results": top_k, "where": {"session_id": session_id} if session_id else None}
+        if self.embed is not None:
+            kwargs["query_embeddings"] = _normalize(self.embed([text])).tolist()
+        else:
+            kwargs["query_texts"] = [text]
+        results = self._collection.query(**kwargs)
+        if not results.get("ids") or not results["ids"][0]:
+            return []
+        return [
+            {"id": doc_id, "document": doc, "metadata": meta or {}, "score": 1.0 - float(dist)}
+            for doc_id, doc, meta, dist in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
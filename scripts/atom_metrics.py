@@ -0,0 +1,295 @@
+"""
+Shared lightweight instrumentation for the Atom-Code Python services.
+Counters, gauges and histograms rendered in the Prometheus/OpenMetrics text format, served at
+/metrics/prom by hardware_server.py, unload_helper_server.py and voice-server/app.py.
+No dependencies; every metric is a dict of label values -> numbers behind one lock.
+
+Per-stage timers (stage("name")) are off by default and can be toggled at runtime with
+POST /metrics/prom/stages {"enabled": true} or ATOM_STAGE_TIMERS=1; when off they cost one
+attribute check.
+
+  from atom_metrics import REGISTRY, stage
+  REQUESTS = REGISTRY.counter("atom_x_total", "Things done", ["kind"])
+  REQUESTS.inc(kind="a")
+  with stage("decode"):
+      ...
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) covering fast HTTP handlers up to multi-second model inference
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class _Timer:
+    """Context manager that observes elapsed seconds into a histogram on exit."""
+
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (non-cumulative) ..., +Inf count], sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """with HISTOGRAM.time(label=...): ... observes the block's wall time."""
+        return _Timer(self, labels)
+
+    def snapshot(self, **labels):
+        """{"count", "sum"} for one label set (zeros if never observed)."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return {"count": state[2], "sum": state[1]} if state else {"count": 0, "sum": 0.0}
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Named collection of metrics. Re-registering a name returns the existing metric."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Whole registry in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Common metrics shared by every service (label "service" tells them apart when scraped together)
+HTTP_REQUESTS = REGISTRY.counter(
+    "atom_http_requests_total", "HTTP requests handled", ["service", "method", "path", "status"]
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "atom_http_request_duration_seconds", "HTTP request latency", ["service", "method", "path"]
+)
+INFERENCE_LATENCY = REGISTRY.histogram(
+    "atom_model_inference_seconds", "Model inference time", ["service", "model", "task"]
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "atom_queue_wait_seconds", "Time spent waiting for a shared lock or queue", ["service", "queue"]
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "atom_cache_requests_total", "Cache lookups by result (hit/miss)", ["service", "cache", "result"]
+)
+SUMMARIZER_LATENCY = REGISTRY.histogram(
+    "atom_summarizer_seconds", "Context summarizer call latency", ["model", "outcome"]
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "atom_stage_seconds", "Per-stage timings (only recorded while stage timers are enabled)", ["stage"]
+)
+
+
+class _StageTimers:
+    enabled = os.environ.get("ATOM_STAGE_TIMERS", "").lower() in ("1", "true", "yes")
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def stage(name):
+    """Time a block into atom_stage_seconds{stage=name} when stage timers are on; no-op otherwise."""
+    if not _StageTimers.enabled:
+        return _NULL_TIMER
+    return _Timer(STAGE_LATENCY, {"stage": name})
+
+
+def set_stage_timers(enabled):
+    _StageTimers.enabled = bool(enabled)
+
+
+def stage_timers_enabled():
+    return _StageTimers.enabled
+
+
+def record_cache(service, cache, hit):
+    CACHE_REQUESTS.inc(service=service, cache=cache, result="hit" if hit else "miss")
+
+
+def instrument_flask(app, service):
+    """
+    Count and time every request of a Flask app, and add GET /metrics/prom plus
+    GET/POST /metrics/prom/stages (toggle stage timers with {"enabled": bool}).
+    """
+    from flask import Response, g, jsonify, request
+
+    @app.before_request
+    def _start_timer():
+        g._atom_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "_atom_start", None)
+        if start is not None:
+            # Route template (e.g. /unload/<path:model>) keeps label cardinality bounded
+            path = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, service=service, method=request.method, path=path)
+            HTTP_REQUESTS.inc(service=service, method=request.method, path=path, status=response.status_code)
+        return response
+
+    @app.route("/metrics/prom")
+    def _prometheus_metrics():
+        return Response(REGISTRY.render(), mimetype="text/plain", content_type=CONTENT_TYPE)
+
+    @app.route("/metrics/prom/stages", methods=["GET", "POST"])
+    def _stage_timers():
+        if request.method == "POST":
+            body = request.get_json(silent=True) or {}
+            set_stage_timers(body.get("enabled", not stage_timers_enabled()))
+        return jsonify({"enabled": stage_timers_enabled()})
+
+    return app
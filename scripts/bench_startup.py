@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Startup-latency regression benchmark for the Python services.
+Starts each service the way start-atom-code.sh / watchdog.sh do and measures the time from spawn
+to the first 200 from its health URL, over several runs. Compare against a saved baseline to catch
+an import that slipped back to module level.
+
+  python scripts/bench_startup.py                              # all services, 3 runs each
+  python scripts/bench_startup.py voice context --runs 5
+  python scripts/bench_startup.py --save-baseline startup_baseline.json
+  python scripts/bench_startup.py --baseline startup_baseline.json --tolerance 0.25   # exit 1 on regression
+
+The Flask services use their fixed ports (5000, 8766); a service whose port is taken is skipped.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PY = sys.executable
+
+# Absolute slack (seconds) on top of the relative tolerance, so tiny services don't flap on noise
+MIN_REGRESSION_S = 0.1
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _port_in_use(port):
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+def services():
+    """name -> (command, port, health path). Ports for the uvicorn apps are picked fresh."""
+    voice_port, context_port = _free_port(), _free_port()
+    return {
+        "hardware": ([PY, str(ROOT / "scripts" / "hardware_server.py")], 5000, "/metrics"),
+        "unload": ([PY, str(ROOT / "scripts" / "unload_helper_server.py")], 8766, "/health"),
+        "voice": ([PY, "-m", "uvicorn", "app:app", "--app-dir", str(ROOT / "voice-server"),
+                   "--host", "127.0.0.1", "--port", str(voice_port)], voice_port, "/health"),
+        "context": ([PY, "-m", "uvicorn", "context_server:app", "--app-dir", str(ROOT / "context_manager"),
+                     "--host", "127.0.0.1", "--port", str(context_port)], context_port, "/health"),
+    }
+
+
+def time_to_healthy(command, port, path, timeout):
+    """Seconds from spawn to the first HTTP 200 on path; None if it never came up."""
+    env = dict(os.environ)
+    # Scratch cwd and history dir: logs and session files from the runs don't land in the tree or ~
+    with tempfile.TemporaryDirectory(prefix="atom-startup-") as scratch:
+        env.setdefault("VIBE_HISTORY_DIR", scratch)
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=scratch, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            while time.perf_counter() - start < timeout:
+                if proc.poll() is not None:
+                    err = proc.stderr.read().decode("utf-8", "replace").strip().splitlines()
+                    raise RuntimeError(err[-1] if err else f"exited with {proc.returncode}")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as resp:
+                        if resp.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    pass
+                time.sleep(0.02)
+            return None
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+
+def bench(names, runs, timeout):
+    results = {}
+    for name in names:
+        command, port, path = services()[name]
+        if _port_in_use(port):
+            print(f"{name}: port {port} in use (service already running?); skipped", file=sys.stderr)
+            continue
+        samples, error = [], None
+        for _ in range(runs):
+            try:
+                elapsed = time_to_healthy(command, port, path, timeout)
+            except RuntimeError as e:
+                error = str(e)
+                break
+            if elapsed is None:
+                error = f"no 200 from {path} within {timeout}s"
+                break
+            samples.append(elapsed)
+            # Let the OS release the fixed port before the next run
+            while _port_in_use(port):
+                time.sleep(0.05)
+        results[name] = {
+            "runs": len(samples),
+            "median_s": round(statistics.median(samples), 3) if samples else None,
+            "min_s": round(min(samples), 3) if samples else None,
+            "max_s": round(max(samples), 3) if samples else None,
+            "error": error,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Names whose median regressed beyond tolerance (relative) + MIN_REGRESSION_S (absolute)."""
+    regressions = []
+    for name, row in results.items():
+        base = (baseline.get(name) or {}).get("median_s")
+        if base is None or row["median_s"] is None:
+            continue
+        limit = base * (1 + tolerance) + MIN_REGRESSION_S
+        row["baseline_s"] = base
+        row["regressed"] = row["median_s"] > limit
+        if row["regressed"]:
+            regressions.append(f"{name}: {row['median_s']}s vs baseline {base}s (limit {limit:.3f}s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("services", nargs="*", help="hardware, unload, voice, context (default: all)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for health per run")
+    parser.add_argument("--baseline", help="JSON from --save-baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs baseline")
+    parser.add_argument("--save-baseline", help="write these results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    names = args.services or list(services())
+    unknown = [n for n in names if n not in services()]
+    if unknown:
+        parser.error(f"unknown service(s): {', '.join(unknown)}")
+
+    results = bench(names, args.runs, args.timeout)
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerance)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, row in results.items():
+            line = f"{name:<9} median {row['median_s']}s  min {row['min_s']}s  max {row['max_s']}s  ({row['runs']} runs)"
+            if row.get("baseline_s") is not None:
+                line += f"  baseline {row['baseline_s']}s"
+            if row["error"]:
+                line += f"  ERROR: {row['error']}"
+            print(line)
+    for r in regressions:
+        print(f"REGRESSION {r}", file=sys.stderr)
+    failed = regressions or any(row["error"] for row in results.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
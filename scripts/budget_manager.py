@@ -0,0 +1,221 @@
+"""
+Memory budget manager: keeps loaded models inside a configured VRAM/RAM budget by evicting the
+least-recently-used model, one at a time, before a new load.
+
+Sources (all optional; whatever is reachable is used):
+- hardware bridge   GET  http://localhost:5000/metrics            -> vram/ram used and total
+- unload helper     ModelInventory + unload_models (same process)  -> LM Studio models and sizes
+- voice server      GET  http://localhost:8765/models              -> faster-whisper / Kokoro handles
+                    POST http://localhost:8765/models/<name>/unload
+
+Used by unload_helper_server.py (POST /budget/ensure, POST /budget/touch, GET /budget).
+"""
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+
+HARDWARE_URL = os.environ.get("ATOM_HARDWARE_URL", "http://localhost:5000")
+VOICE_URL = os.environ.get("ATOM_VOICE_URL", "http://localhost:8765")
+# Budgets in GB; unset means "total reported by the hardware bridge minus BUDGET_HEADROOM_GB"
+VRAM_BUDGET_GB = os.environ.get("ATOM_VRAM_BUDGET_GB")
+RAM_BUDGET_GB = os.environ.get("ATOM_RAM_BUDGET_GB")
+BUDGET_HEADROOM_GB = float(os.environ.get("ATOM_BUDGET_HEADROOM_GB", "0.5"))
+# lms ps does not say where a model lives; LM Studio models count against this pool
+LM_STUDIO_POOL = os.environ.get("ATOM_LM_STUDIO_POOL", "vram")
+HTTP_TIMEOUT = 3
+# Hardware bridge samples every 0.5s; wait this long after an unload before re-reading usage
+SETTLE_SECONDS = 1.0
+MAX_DECISIONS = 200
+
+
+def _http_json(url, method="GET", timeout=HTTP_TIMEOUT):
+    req = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8") or "null")
+
+
+class MemoryBudgetManager:
+    """
+    LRU eviction across LM Studio (via the unload helper's inventory) and the voice server.
+    Call touch() whenever a model is used and ensure() before loading one; each ensure() is
+    serialized so two concurrent loads cannot both decide there is room.
+    """
+
+    def __init__(self, inventory, unload_lm_model, hardware_url=HARDWARE_URL, voice_url=VOICE_URL,
+                 vram_budget_gb=VRAM_BUDGET_GB, ram_budget_gb=RAM_BUDGET_GB, settle_seconds=SETTLE_SECONDS):
+        self.inventory = inventory
+        self.unload_lm_model = unload_lm_model  # (identifier) -> (ok, payload)
+        self.hardware_url = hardware_url.rstrip("/")
+        self.voice_url = voice_url.rstrip("/") if voice_url else None
+        self.budgets = {
+            "vram": float(vram_budget_gb) if vram_budget_gb else None,
+            "ram": float(ram_budget_gb) if ram_budget_gb else None,
+        }
+        self.settle_seconds = settle_seconds
+        self._last_used = {}  # (owner, name) -> timestamp
+        self._first_seen = {}
+        self._decisions = deque(maxlen=MAX_DECISIONS)
+        self._reclaimed_total_gb = 0.0
+        self._lock = threading.Lock()
+        self._ensure_lock = threading.Lock()
+
+    # --- usage tracking -------------------------------------------------
+
+    def touch(self, name, owner="lm_studio"):
+        """Mark a model as just used (moves it to the back of the eviction queue)."""
+        with self._lock:
+            self._last_used[(owner, name)] = time.time()
+
+    def _read_hardware(self):
+        try:
+            return _http_json(f"{self.hardware_url}/metrics")
+        except Exception:
+            return None
+
+    def _usage(self, pool, hardware, candidates):
+        """(used_gb, budget_gb) for the pool; falls back to summed model sizes without the bridge."""
+        budget = self.budgets.get(pool)
+        if hardware:
+            used = hardware.get(f"{pool}_used_gb")
+            total = hardware.get(f"{pool}_total_gb")
+            if budget is None and total:
+                budget = max(0.0, total - BUDGET_HEADROOM_GB)
+            if total:
+                return float(used or 0), budget
+        return sum(c["size_gb"] or 0 for c in candidates), budget
+
+    def _candidates(self):
+        """Every evictable model with owner, size, pool and last-used time (oldest first)."""
+        now = time.time()
+        models = []
+        for m in self.inventory.snapshot().get("models", []):
+            # Chat requests may name the model by its key rather than the loaded identifier
+            models.append({"owner": "lm_studio", "name": m["identifier"], "size_gb": m.get("size_gb"),
+                           "pool": LM_STUDIO_POOL, "_alias": m.get("model")})
+        if self.voice_url:
+            try:
+                voice = _http_json(f"{self.voice_url}/models") or {}
+                for m in voice.get("models", []):
+                    if m.get("loaded"):
+                        models.append({
+                            "owner": "voice", "name": m["name"], "size_gb": m.get("size_gb"),
+                            "pool": m.get("pool"), "reported_last_used": m.get("last_used"),
+                        })
+            except Exception:
+                pass
+        with self._lock:
+            for m in models:
+                key = (m["owner"], m["name"])
+                first_seen = self._first_seen.setdefault(key, now)
+                alias = m.pop("_alias", None)
+                touched = [self._last_used.get(key), self._last_used.get((m["owner"], alias)) if alias else None]
+                used = [t for t in (*touched, m.pop("reported_last_used", None)) if t]
+                m["last_used"] = max(used) if used else None
+                m["_order"] = (bool(used), max(used) if used else first_seen)
+        # Never-used models go first (oldest sighting first), then used ones by last use
+        models.sort(key=lambda m: m.pop("_order"))
+        return models
+
+    # --- eviction -------------------------------------------------------
+
+    def _evict(self, candidate):
+        if candidate["owner"] == "lm_studio":
+            ok, payload = self.unload_lm_model(candidate["name"])
+            return ok, payload.get("error")
+        try:
+            name = urllib.parse.quote(candidate["name"], safe="")
+            payload = _http_json(f"{self.voice_url}/models/{name}/unload", method="POST", timeout=30)
+            return bool(payload and payload.get("ok")), (payload or {}).get("error")
+        except Exception as e:
+            return False, str(e)
+
+    def ensure(self, model, size_gb, pool="vram", owner="lm_studio"):
+        """
+        Make room for `model` (size_gb in `pool`) by unloading LRU models until it fits the budget.
+        Returns {"ok", "fits", "budget_gb", "used_gb_before", "used_gb_after", "reclaimed_gb", "decisions"}.
+        """
+        with self._ensure_lock:
+            self.inventory.refresh()
+            # Only models in the requested pool free anything there (pool None: unknown, may be either)
+            candidates = [c for c in self._candidates()
+                          if (c["owner"], c["name"]) != (owner, model) and c["pool"] in (pool, None)]
+            hardware = self._read_hardware()
+            used, budget = self._usage(pool, hardware, candidates)
+            used_before = used
+            decisions = []
+            reclaimed_total = 0.0
+
+            if budget is None:
+                return {"ok": False, "error": f"no {pool} budget configured and hardware bridge unreachable",
+                        "decisions": [], "reclaimed_gb": 0.0}
+
+            while used + size_gb > budget and candidates:
+                victim = candidates.pop(0)
+                ok, error = self._evict(victim)
+                decision = {
+                    "time": time.time(),
+                    "for_model": model,
+                    "evicted": victim["name"],
+                    "owner": victim["owner"],
+                    "last_used": victim["last_used"],
+                    "estimated_gb": victim["size_gb"],
+                    "ok": ok,
+                }
+                if not ok:
+                    decision["error"] = error
+                    decisions.append(decision)
+                    continue
+                time.sleep(self.settle_seconds)
+                hardware = self._read_hardware()
+                if hardware and hardware.get(f"{pool}_total_gb"):
+                    # Re-read what is actually in use; the next iteration decides on that, not on estimates
+                    now_used = float(hardware.get(f"{pool}_used_gb") or 0)
+                    reclaimed = max(0.0, used - now_used)
+                    decision["measured_gb"] = round(reclaimed, 2)
+                    used = now_used
+                else:
+                    reclaimed = victim["size_gb"] or 0.0
+                    used = max(0.0, used - reclaimed)
+                reclaimed_total += reclaimed
+                decisions.append(decision)
+
+            with self._lock:
+                self._decisions.extend(decisions)
+                self._reclaimed_total_gb += reclaimed_total
+            self.touch(model, owner)
+            fits = used + size_gb <= budget
+            return {
+                "ok": True,
+                "fits": fits,
+                "pool": pool,
+                "budget_gb": round(budget, 2),
+                "used_gb_before": round(used_before, 2),
+                "used_gb_after": round(used, 2),
+                "reclaimed_gb": round(reclaimed_total, 2),
+                "decisions": decisions,
+            }
+
+    def status(self):
+        """Current budgets, usage, LRU order (next eviction first) and recent decisions."""
+        candidates = self._candidates()
+        hardware = self._read_hardware()
+        pools = {}
+        for pool in ("vram", "ram"):
+            in_pool = [c for c in candidates if c["pool"] in (pool, None)]
+            used, budget = self._usage(pool, hardware, in_pool)
+            pools[pool] = {"used_gb": round(used, 2), "budget_gb": round(budget, 2) if budget is not None else None}
+        with self._lock:
+            decisions = list(self._decisions)
+            reclaimed = self._reclaimed_total_gb
+        return {
+            "ok": True,
+            "pools": pools,
+            "hardware_bridge": hardware is not None,
+            "lru": candidates,
+            "decisions": decisions,
+            "reclaimed_total_gb": round(reclaimed, 2),
+        }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Fake `lms` CLI for exercising the unload helper without LM Studio.
+Supports: ps, ps --json, unload <identifier>, unload --all, load <model> [--context-length N] [--size-gb N].
+Loaded models are kept in a JSON state file (FAKE_LMS_STATE, default: <tmp>/fake_lms_state.json);
+FAKE_LMS_DELAY adds seconds of latency to every call, FAKE_LMS_FAIL=unload makes unloads exit 1,
+FAKE_LMS_NO_JSON=1 rejects `ps --json` like an lms that predates it.
+
+  chmod +x scripts/fake_lms.py
+  python scripts/fake_lms.py load qwen/qwen3-8b --size-gb 5.03 --context-length 8192
+  LMSTUDIO_CLI_PATH=scripts/fake_lms.py python scripts/unload_helper_server.py
+  python -m unittest discover -s scripts -p "test_*.py"    # test_unload_helper.py runs against this fake
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+STATE_PATH = Path(os.environ.get("FAKE_LMS_STATE", Path(tempfile.gettempdir()) / "fake_lms_state.json"))
+
+DEFAULT_MODELS = [
+    {"identifier": "qwen/qwen3-8b", "modelKey": "qwen/qwen3-8b", "sizeBytes": 5_030_000_000, "contextLength": 8192, "status": "IDLE"},
+    {"identifier": "gemma-3-4b-it", "modelKey": "google/gemma-3-4b", "sizeBytes": 2_490_000_000, "contextLength": 4096, "status": "IDLE"},
+]
+
+
+def load_state():
+    if not STATE_PATH.exists():
+        return [dict(m) for m in DEFAULT_MODELS]
+    return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+
+
+def save_state(models):
+    STATE_PATH.write_text(json.dumps(models, indent=2), encoding="utf-8")
+
+
+def print_table(models):
+    if not models:
+        print("No models are currently loaded.")
+        return
+    rows = [("IDENTIFIER", "MODEL", "STATUS", "SIZE", "CONTEXT")]
+    for m in models:
+        rows.append((m["identifier"], m["modelKey"], m["status"], f"{m['sizeBytes'] / 1e9:.2f} GB", str(m["contextLength"])))
+    widths = [max(len(r[i]) for r in rows) + 4 for i in range(len(rows[0]))]
+    for r in rows:
+        print("".join(cell.ljust(w) for cell, w in zip(r, widths)).rstrip())
+
+
+def option(args, name, default):
+    return type(default)(args[args.index(name) + 1]) if name in args else default
+
+
+def main(argv):
+    time.sleep(float(os.environ.get("FAKE_LMS_DELAY", "0")))
+    if not argv:
+        print("usage: fake_lms.py ps [--json] | unload <id>|--all | load <model>", file=sys.stderr)
+        return 2
+    command, args = argv[0], argv[1:]
+    models = load_state()
+
+    if command == "ps":
+        if "--json" in args and os.environ.get("FAKE_LMS_NO_JSON") == "1":
+            print("error: unknown option '--json'", file=sys.stderr)
+            return 1
+        if "--json" in args:
+            print(json.dumps(models))
+        else:
+            print_table(models)
+        return 0
+
+    if command == "unload":
+        if os.environ.get("FAKE_LMS_FAIL") == "unload":
+            print("Error: simulated unload failure", file=sys.stderr)
+            return 1
+        if "--all" in args:
+            save_state([])
+            print(f"Unloaded {len(models)} model(s).")
+            return 0
+        if not args:
+            print("Error: specify a model identifier or --all", file=sys.stderr)
+            return 1
+        remaining = [m for m in models if m["identifier"] != args[0]]
+        if len(remaining) == len(models):
+            print(f"Error: no loaded model with identifier {args[0]}", file=sys.stderr)
+            return 1
+        save_state(remaining)
+        print(f"Unloaded {args[0]}.")
+        return 0
+
+    if command == "load":
+        if not args:
+            print("Error: specify a model", file=sys.stderr)
+            return 1
+        model = args[0]
+        identifier = option(args, "--identifier", model)
+        models = [m for m in models if m["identifier"] != identifier]
+        models.append({
+            "identifier": identifier,
+            "modelKey": model,
+            "sizeBytes": int(option(args, "--size-gb", 4.0) * 1e9),
+            "contextLength": option(args, "--context-length", 4096),
+            "status": "IDLE",
+        })
+        save_state(models)
+        print(f"Loaded {identifier}.")
+        return 0
+
+    print(f"Error: unknown command {command}", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,9 +2,25 @@
 Hardware bridge for ATOM floating metrics panel.
 Exposes GPU (pynvml) and CPU/RAM (psutil) at http://localhost:5000/metrics.
 
+A background sampler thread collects one sample every HARDWARE_SAMPLE_INTERVAL seconds
+into a fixed-size numpy ring buffer, so /metrics is a non-blocking read of the latest sample
+and /metrics/history?window=<seconds>&points=<n> returns a downsampled series for the panel.
+/metrics/stream?interval=<seconds> pushes the same samples as server-sent events (full snapshot,
+then only the fields that changed); slow clients skip stale samples instead of queueing them.
+/metrics/processes attributes CPU, RSS and GPU memory (all NVML devices) to processes, grouped
+into Atom-Code service roles (LM Studio, voice server, file server, browser, ...).
+/metrics/prom exposes request and sampling timings in the Prometheus text format (atom_metrics.py).
+
 Run: pip install -r scripts/requirements-hardware.txt
      python scripts/hardware_server.py
 """
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
 import psutil
 
 try:
@@ -13,30 +29,86 @@ try:
 except ImportError:
     HAS_NVML = False
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 
+from atom_metrics import instrument_flask, stage
+
+# Sampling rate and history length (defaults: 2 samples/s, 1 hour of history)
+SAMPLE_INTERVAL = float(os.environ.get("HARDWARE_SAMPLE_INTERVAL", "0.5"))
+HISTORY_SIZE = int(os.environ.get("HARDWARE_HISTORY_SIZE", "7200"))
+DEFAULT_HISTORY_POINTS = 120
+MAX_HISTORY_POINTS = 2000
+# Per-process attribution runs on its own (slower) cadence, only once someone asks for it
+PROCESS_SAMPLE_INTERVAL = float(os.environ.get("HARDWARE_PROCESS_INTERVAL", "2.0"))
+# How long the first /metrics/processes request waits for the collector's first snapshot
+PROCESS_FIRST_SAMPLE_TIMEOUT = 10.0
+TOP_PROCESSES = 15
+# SSE: default push interval per client and keepalive comment interval when nothing changes
+DEFAULT_STREAM_INTERVAL = 1.0
+MAX_STREAM_INTERVAL = 3600.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+# Column order of the ring buffer; every field is stored as float64
+FIELDS = (
+    "timestamp",
+    "cpu_percent",
+    "ram_used_gb",
+    "ram_total_gb",
+    "gpu_util",
+    "vram_used_gb",
+    "vram_total_gb",
+)
+
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, "hardware")
 
-gpu_handle = None
+# One handle per NVML device, resolved once at startup and reused for every sample
+gpu_handles = []
+gpu_names = []
 if HAS_NVML:
     try:
         pynvml.nvmlInit()
-        gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+        for i in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+            name = pynvml.nvmlDeviceGetName(handle)
+            gpu_handles.append(handle)
+            gpu_names.append(name.decode() if isinstance(name, bytes) else str(name))
     except Exception as e:
         print(f"NVML Init Failed: {e}")
-        gpu_handle = None
+        gpu_handles = []
+        gpu_names = []
 
 
-@app.route("/metrics")
-def get_metrics():
-    # interval=0.1 so we get a real value (interval=None returns 0 on first call)
-    cpu_usage = psutil.cpu_percent(interval=0.1)
-    ram_info = psutil.virtual_memory()
+def collect_gpus():
+    """Per-device utilization and memory for every NVML device; [] without a GPU."""
+    gpus = []
+    for index, handle in enumerate(gpu_handles):
+        try:
+            util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+            mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+        except Exception:
+            continue
+        gpus.append({
+            "index": index,
+            "name": gpu_names[index],
+            "gpu_util": util.gpu,
+            "vram_used_gb": round(mem.used / (1024**3), 1),
+            "vram_total_gb": round(mem.total / (1024**3), 1),
+        })
+    return gpus
+
 
-    metrics = {
-        "cpu_percent": cpu_usage,
+def collect_sample():
+    """
+    Read CPU, RAM and GPU once. Non-blocking: cpu_percent is measured since the previous call.
+    GPU fields are totals across all devices (utilization is the mean).
+    """
+    ram_info = psutil.virtual_memory()
+    sample = {
+        "timestamp": time.time(),
+        "cpu_percent": psutil.cpu_percent(interval=None),
         "ram_used_gb": round(ram_info.used / (1024**3), 1),
         "ram_total_gb": round(ram_info.total / (1024**3), 1),
         "gpu_util": 0,
@@ -44,19 +116,442 @@ def get_metrics():
         "vram_total_gb": 0,
     }
 
-    if gpu_handle:
+    gpus = collect_gpus()
+    if gpus:
+        sample["gpu_util"] = round(sum(g["gpu_util"] for g in gpus) / len(gpus), 1)
+        sample["vram_used_gb"] = round(sum(g["vram_used_gb"] for g in gpus), 1)
+        sample["vram_total_gb"] = round(sum(g["vram_total_gb"] for g in gpus), 1)
+
+    return sample
+
+
+# (role, substrings matched against the lowercased process name + command line); first match wins
+SERVICE_ROLES = (
+    ("hardware_bridge", ("hardware_server.py",)),
+    ("unload_helper", ("unload_helper_server.py",)),
+    ("voice_server", ("voice-server", "app:app --host 0.0.0.0 --port 8765", "faster_whisper", "kokoro")),
+    ("file_server", ("file-server/server.js", "file-server\\server.js")),
+    ("terminal_server", ("terminal-server/server.js", "terminal-server\\server.js")),
+    ("search_proxy", ("search-proxy.mjs",)),
+    ("lm_studio", ("lm studio", "lm-studio", "lmstudio", ".lmstudio", "llmster", "llama-server")),
+    ("ui", ("vite",)),
+    ("browser", ("chrome", "chromium", "firefox", "msedge", "brave", "safari")),
+)
+
+
+def classify_process(name, cmdline):
+    """Map a process to an Atom-Code service role by name/command line; 'other' if unknown."""
+    haystack = f"{name} {' '.join(cmdline)}".lower()
+    for role, needles in SERVICE_ROLES:
+        if any(n in haystack for n in needles):
+            return role
+    return "other"
+
+
+def _gpu_memory_by_pid():
+    """{pid: {device_index: bytes}} from NVML compute + graphics process lists; {} without a GPU."""
+    usage = {}
+    for index, handle in enumerate(gpu_handles):
+        for getter in ("nvmlDeviceGetComputeRunningProcesses", "nvmlDeviceGetGraphicsRunningProcesses"):
+            try:
+                procs = getattr(pynvml, getter)(handle)
+            except Exception:
+                continue
+            for p in procs:
+                used = getattr(p, "usedGpuMemory", None) or 0  # None when the driver hides it (e.g. WDDM)
+                per_device = usage.setdefault(p.pid, {})
+                per_device[index] = max(per_device.get(index, 0), used)
+    return usage
+
+
+class ProcessAttributor:
+    """
+    Per-process CPU / RSS / GPU memory grouped by service role. psutil.Process objects and their
+    roles are cached by pid across samples (cpu_percent needs the same object between calls and
+    the command line is only read once), so each cycle is one pid listing plus cheap reads.
+    Collection only starts on the first request, on its own thread and cadence; requests only
+    read the collector's latest snapshot.
+    """
+
+    # The first snapshot is taken this soon after priming cpu_percent, not a full interval later
+    FIRST_SAMPLE_DELAY = 0.2
+
+    def __init__(self, interval=PROCESS_SAMPLE_INTERVAL):
+        self.interval = max(0.5, interval)
+        self._procs = {}  # pid -> (psutil.Process, role); only touched with _procs_lock held
+        self._procs_lock = threading.Lock()
+        self._latest = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._cpu_count = psutil.cpu_count() or 1
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="process-attributor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
         try:
-            util = pynvml.nvmlDeviceGetUtilizationRates(gpu_handle)
-            mem = pynvml.nvmlDeviceGetMemoryInfo(gpu_handle)
-            metrics["gpu_util"] = util.gpu
-            metrics["vram_used_gb"] = round(mem.used / (1024**3), 1)
-            metrics["vram_total_gb"] = round(mem.total / (1024**3), 1)
-        except Exception:
-            pass
+            self._refresh_processes()  # prime cpu_percent for every process
+        except Exception as e:
+            print(f"Process attribution failed: {e}")
+        delay = self.FIRST_SAMPLE_DELAY
+        while True:
+            time.sleep(delay)
+            delay = self.interval
+            try:
+                with stage("process_attribution"):
+                    snapshot = self.collect()
+                with self._lock:
+                    self._latest = snapshot
+                self._ready.set()
+            except Exception as e:
+                print(f"Process attribution failed: {e}")
+
+    def latest(self, wait=0.0):
+        """Latest snapshot; waits up to `wait` seconds for the first one. None if there is none yet."""
+        if wait:
+            self._ready.wait(wait)
+        with self._lock:
+            return self._latest
+
+    def _refresh_processes(self):
+        """Sync the pid cache with the live pid list: add new processes, drop dead ones."""
+        with self._procs_lock:
+            self._refresh_processes_locked()
+
+    def _refresh_processes_locked(self):
+        pids = set(psutil.pids())
+        for pid in list(self._procs):
+            if pid not in pids:
+                del self._procs[pid]
+        for pid in pids - self._procs.keys():
+            try:
+                proc = psutil.Process(pid)
+                name = proc.name()
+                try:
+                    cmdline = proc.cmdline()
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    cmdline = []
+                role = "hardware_bridge" if pid == os.getpid() else classify_process(name, cmdline)
+                proc.cpu_percent(interval=None)
+                self._procs[pid] = (proc, role)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+    def collect(self):
+        """
+        One attribution pass: {"gpus": [...], "roles": {role: totals}, "processes": [top N]}.
+        Called by the collector thread; the pid cache lock keeps cpu_percent deltas consistent.
+        """
+        gpu_mem = _gpu_memory_by_pid()
+        readings = []
+        with self._procs_lock:
+            self._refresh_processes_locked()
+            for pid, (proc, role) in list(self._procs.items()):
+                try:
+                    with proc.oneshot():
+                        cpu = proc.cpu_percent(interval=None) / self._cpu_count
+                        rss = proc.memory_info().rss
+                        name = proc.name()
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    self._procs.pop(pid, None)
+                    continue
+                readings.append((pid, role, cpu, rss, name))
+        rows = []
+        for pid, role, cpu, rss, name in readings:
+            per_device = gpu_mem.get(pid, {})
+            rows.append({
+                "pid": pid,
+                "name": name,
+                "role": role,
+                "cpu_percent": round(cpu, 1),
+                "rss_gb": round(rss / (1024**3), 2),
+                "gpu_mem_gb": round(sum(per_device.values()) / (1024**3), 2),
+                "gpu_mem_by_device": {str(i): round(b / (1024**3), 2) for i, b in per_device.items()},
+            })
+
+        roles = {}
+        for r in rows:
+            if r["role"] == "other":
+                continue
+            agg = roles.setdefault(r["role"], {"pids": [], "cpu_percent": 0.0, "rss_gb": 0.0, "gpu_mem_gb": 0.0})
+            agg["pids"].append(r["pid"])
+            agg["cpu_percent"] += r["cpu_percent"]
+            agg["rss_gb"] += r["rss_gb"]
+            agg["gpu_mem_gb"] += r["gpu_mem_gb"]
+        for agg in roles.values():
+            for key in ("cpu_percent", "rss_gb", "gpu_mem_gb"):
+                agg[key] = round(agg[key], 2)
+
+        rows.sort(key=lambda r: (r["gpu_mem_gb"], r["cpu_percent"], r["rss_gb"]), reverse=True)
+        return {
+            "timestamp": time.time(),
+            "gpus": collect_gpus(),
+            "roles": roles,
+            "processes": rows[:TOP_PROCESSES],
+        }
+
+
+class _Subscriber:
+    """
+    One-slot mailbox for a stream client. A new sample replaces an unread one, so a slow
+    client always gets the freshest sample and never builds up a backlog.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._sample = None
+        self._replaced = 0
 
+    def offer(self, sample):
+        with self._cond:
+            if self._sample is not None:
+                self._replaced += 1
+            self._sample = sample
+            self._cond.notify()
+
+    def pop_replaced(self):
+        """Unread samples overwritten since the last call (and reset the count)."""
+        with self._cond:
+            replaced, self._replaced = self._replaced, 0
+            return replaced
+
+    def take(self, timeout):
+        """Return the pending sample, waiting up to timeout seconds; None if nothing arrived."""
+        with self._cond:
+            if self._sample is None:
+                self._cond.wait(timeout)
+            sample, self._sample = self._sample, None
+            return sample
+
+
+class MetricsSampler:
+    """
+    Background thread that appends one sample per interval to a fixed-size ring buffer.
+    Readers never block on psutil/NVML; they only take a short lock to copy rows out.
+    """
+
+    # First sample this soon after priming cpu_percent, so its CPU figure spans a real window (not ~0 ms)
+    FIRST_SAMPLE_DELAY = 0.1
+
+    def __init__(self, interval=SAMPLE_INTERVAL, size=HISTORY_SIZE):
+        self.interval = max(0.05, interval)
+        self.size = max(1, size)
+        self._buffer = np.zeros((self.size, len(FIELDS)), dtype=np.float64)
+        self._count = 0  # total samples written (next write index = _count % size)
+        self._latest = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscribers = set()
+
+    def start(self):
+        """Start the sampler thread (idempotent). The first sample lands FIRST_SAMPLE_DELAY later."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            # Prime cpu_percent: the first interval=None call always returns 0.0
+            psutil.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = self.FIRST_SAMPLE_DELAY
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                with stage("hardware_sample"):
+                    sample = collect_sample()
+                self._record(sample)
+            except Exception as e:
+                print(f"Metrics sample failed: {e}")
+
+    def _record(self, sample):
+        row = [float(sample[f]) for f in FIELDS]
+        with self._lock:
+            self._buffer[self._count % self.size] = row
+            self._count += 1
+            self._latest = sample
+            subscribers = list(self._subscribers)
+        self._ready.set()
+        for sub in subscribers:
+            sub.offer(sample)
+
+    def subscribe(self):
+        """Register a stream client; it receives every new sample until unsubscribe()."""
+        sub = _Subscriber()
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def latest(self, wait=0.0):
+        """Most recent sample as a dict; waits up to `wait` seconds for the first one (None if none yet)."""
+        if wait > 0:
+            self._ready.wait(wait)
+        with self._lock:
+            return dict(self._latest) if self._latest is not None else None
+
+    def _ordered_rows(self):
+        """Copy of the buffered rows, oldest first."""
+        with self._lock:
+            if self._count < self.size:
+                return self._buffer[: self._count].copy()
+            start = self._count % self.size
+            return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def history(self, window, points=DEFAULT_HISTORY_POINTS):
+        """
+        Samples from the last `window` seconds, bucket-averaged down to at most `points` rows.
+        Returns {"fields": [...], "series": {field: [values...]}}.
+        """
+        rows = self._ordered_rows()
+        if len(rows):
+            rows = rows[rows[:, 0] >= time.time() - window]
+        points = max(1, points)
+        if len(rows) > points:
+            # Bucket boundaries are strictly increasing because len(rows) > points
+            edges = np.linspace(0, len(rows), points + 1).astype(int)[:-1]
+            rows = np.add.reduceat(rows, edges, axis=0) / np.diff(np.append(edges, len(rows)))[:, None]
+        series = {f: np.round(rows[:, i], 3 if f == "timestamp" else 1).tolist() for i, f in enumerate(FIELDS)}
+        return {"fields": list(FIELDS), "series": series}
+
+
+sampler = MetricsSampler()
+attributor = ProcessAttributor()
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Latest sample from the background sampler; never blocks on psutil/NVML."""
+    sampler.start()
+    # First request: wait for the sampler's first pass instead of reading CPU over a ~0 ms window
+    metrics = sampler.latest(wait=1.0) or collect_sample()
+    metrics.pop("timestamp", None)
     return jsonify(metrics)
 
 
+@app.route("/metrics/history")
+def get_metrics_history():
+    """Downsampled series: ?window=<seconds, default 300>&points=<max rows, default 120>."""
+    sampler.start()
+    try:
+        window = float(request.args.get("window", 300))
+        points = int(request.args.get("points", DEFAULT_HISTORY_POINTS))
+    except ValueError:
+        return jsonify({"error": "window and points must be numbers"}), 400
+    if math.isnan(window):
+        return jsonify({"error": "window must be a number"}), 400
+    points = min(max(1, points), MAX_HISTORY_POINTS)
+    history = sampler.history(window, points)
+    history.update({"window": window, "interval": sampler.interval, "points": len(history["series"]["timestamp"])})
+    return jsonify(history)
+
+
+@app.route("/metrics/processes")
+def get_process_metrics():
+    """Per-role and top-N per-process CPU / RSS / GPU memory across all GPUs."""
+    attributor.start()
+    # First request: wait for the collector's first pass (cpu_percent needs a primed baseline)
+    snapshot = attributor.latest(wait=PROCESS_FIRST_SAMPLE_TIMEOUT)
+    if snapshot is None:
+        return jsonify({"error": "process attribution not ready yet; retry shortly"}), 503
+    return jsonify(snapshot)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _stream_events(interval):
+    """
+    SSE generator for one client: a full snapshot first, then deltas with only the fields that
+    changed since the last frame sent to this client. Pushes at most once per `interval`.
+    Deltas carry "dropped" when samples were lost because the client was slow to read the
+    previous frame (samples skipped to honour `interval` are not counted).
+    """
+    # Subscribed here, not in the view: a client gone before the first chunk never starts the
+    # generator, so it must not hold a subscription that only the finally below would release
+    sub = sampler.subscribe()
+    last_sent = {}
+    next_due = 0.0
+    last_write = time.monotonic()
+    dropped = 0
+    try:
+        yield "retry: 2000\n\n"
+        while True:
+            # Overwritten while the previous frame was being written: the client is not keeping up
+            dropped += sub.pop_replaced()
+            # Throttle to the client's rate; samples arriving meanwhile replace each other in the slot
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                sub.pop_replaced()  # skipped on purpose, not dropped
+            sample = sub.take(timeout=STREAM_KEEPALIVE_SECONDS)
+            now = time.monotonic()
+            if sample is None:
+                if now - last_write >= STREAM_KEEPALIVE_SECONDS:
+                    last_write = now
+                    yield ": keepalive\n\n"
+                continue
+            next_due = now + interval
+            if not last_sent:
+                frame = _sse("snapshot", sample)
+            else:
+                changed = {k: v for k, v in sample.items() if k != "timestamp" and last_sent.get(k) != v}
+                if not changed:
+                    continue
+                changed["timestamp"] = sample["timestamp"]
+                if dropped:
+                    changed["dropped"] = dropped
+                    dropped = 0
+                frame = _sse("delta", changed)
+            last_sent = sample
+            last_write = now
+            yield frame
+    finally:
+        sampler.unsubscribe(sub)
+
+
+@app.route("/metrics/stream")
+def stream_metrics():
+    """Server-sent events: ?interval=<seconds between pushes, default 1, min = sampling interval>."""
+    sampler.start()
+    try:
+        interval = float(request.args.get("interval", DEFAULT_STREAM_INTERVAL))
+    except ValueError:
+        return jsonify({"error": "interval must be a number"}), 400
+    if not math.isfinite(interval):
+        return jsonify({"error": "interval must be a finite number"}), 400
+    interval = min(max(sampler.interval, interval), MAX_STREAM_INTERVAL)
+    return Response(
+        stream_with_context(_stream_events(interval)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
+    sampler.start()
     print("Hardware bridge: http://localhost:5000/metrics")
-    app.run(port=5000)
+    print(f"  History: http://localhost:5000/metrics/history?window=300 (sampling every {sampler.interval}s)")
+    print("  Stream:  http://localhost:5000/metrics/stream?interval=1 (server-sent events)")
+    print(f"  Processes: http://localhost:5000/metrics/processes ({len(gpu_handles)} GPU(s) via NVML)")
+    print("  Prometheus: http://localhost:5000/metrics/prom")
+    app.run(port=5000, threaded=True)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the Python services (python -X importtime, one fresh interpreter per target).
+Shows what each service pays before it can answer /health: heaviest imports by cumulative time,
+and self time summed per top-level package.
+
+  python scripts/profile_imports.py                 # all services
+  python scripts/profile_imports.py voice rag --top 15
+  python scripts/profile_imports.py context_manager/usage_example.py   # any module file
+  python scripts/profile_imports.py --json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (directory, module); the directory goes on sys.path like when the service is started
+SERVICES = {
+    "voice": ("voice-server", "app"),
+    "context": ("context_manager", "context_server"),
+    "context-manager": ("context_manager", "vibe_coder_context_manager"),
+    "rag": ("context_manager", "vibe_coder_rag"),
+    "hardware": ("scripts", "hardware_server"),
+    "unload": ("scripts", "unload_helper_server"),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def resolve(target):
+    """(name, directory, module) for a service name or a path to a .py file."""
+    if target in SERVICES:
+        directory, module = SERVICES[target]
+        return target, ROOT / directory, module
+    path = Path(target).resolve()
+    if path.suffix != ".py" or not path.exists():
+        raise SystemExit(f"unknown target {target!r}: use one of {', '.join(SERVICES)} or a .py file")
+    return str(path.relative_to(ROOT) if path.is_relative_to(ROOT) else path), path.parent, path.stem
+
+
+def _env(directory):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(directory), str(ROOT / "scripts"), env.get("PYTHONPATH")]))
+    return env
+
+
+def _run(args, directory):
+    # Scratch cwd: services write logs / default files relative to it on import
+    with tempfile.TemporaryDirectory(prefix="atom-importtime-") as cwd:
+        return subprocess.run([sys.executable, *args], cwd=cwd, env=_env(directory), capture_output=True, text=True)
+
+
+def profile(directory, module):
+    """Parse -X importtime output into [(depth, name, self_us, cumulative_us)] in import order."""
+    proc = _run(["-X", "importtime", "-c", f"import {module}"], directory)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+            rows.append(((len(indent) - 1) // 2, name, self_us, cumulative_us))
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["import failed"])[-1]
+    return rows, error
+
+
+def wall_clock(directory, module, runs=3):
+    """Best-of-N wall time for a fresh interpreter to import the module (includes interpreter startup)."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(["-c", f"import {module}"], directory)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def summarize(name, directory, module, top):
+    rows, error = profile(directory, module)
+    # Children are printed before their parent: the target's subtree is the run of depth >= 1 rows
+    # right before its own depth-0 row (interpreter startup such as site comes earlier)
+    end = next((i for i, r in enumerate(rows) if r[0] == 0 and r[1] == module), None)
+    subtree = []
+    if end is not None:
+        start = end
+        while start > 0 and rows[start - 1][0] >= 1:
+            start -= 1
+        subtree = rows[start:end]
+    total_us = rows[end][3] if end is not None else None
+    by_package = defaultdict(int)
+    for _, mod, self_us, _ in subtree:
+        by_package[mod.split(".")[0]] += self_us
+    heaviest = sorted((r for r in subtree if r[0] == 1), key=lambda r: -r[3])[:top]
+    return {
+        "target": name,
+        "module": module,
+        "error": error,
+        "import_ms": round(total_us / 1000, 1) if total_us is not None else None,
+        "wall_s": round(wall_clock(directory, module), 3),
+        "modules_loaded": len(subtree) + (end is not None),
+        "heaviest": [{"module": mod, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(s / 1000, 1)}
+                     for _, mod, s, cum in heaviest],
+        "packages": [{"package": pkg, "self_ms": round(us / 1000, 1)}
+                     for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]],
+    }
+
+
+def print_report(report):
+    print(f"== {report['target']} ({report['module']})")
+    if report["error"]:
+        print(f"   import failed: {report['error']}")
+    print(f"   import {report['import_ms']} ms, fresh interpreter {report['wall_s']} s, "
+          f"{report['modules_loaded']} modules")
+    print("   heaviest imports (cumulative ms / self ms):")
+    for row in report["heaviest"]:
+        print(f"     {row['cumulative_ms']:>9.1f} {row['self_ms']:>8.1f}  {row['module']}")
+    print("   self time by package (ms):")
+    for row in report["packages"]:
+        print(f"     {row['self_ms']:>9.1f}  {row['package']}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="*", help=f"service names ({', '.join(SERVICES)}) or .py files")
+    parser.add_argument("--top", type=int, default=10, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = [summarize(*resolve(t), args.top) for t in (args.targets or list(SERVICES))]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
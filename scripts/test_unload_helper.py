@@ -0,0 +1,163 @@
+"""
+Checks for unload_helper_server.py against the fake lms CLI (fake_lms.py); no LM Studio needed.
+Needs the unload helper's own dependencies (requirements-unload.txt).
+
+  python -m unittest discover -s scripts -p "test_*.py"
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+import budget_manager  # noqa: E402
+import unload_helper_server as helper  # noqa: E402
+
+FAKE_LMS = str(HERE / "fake_lms.py")
+
+
+class FakeLmsTestCase(unittest.TestCase):
+    """Every test gets a fresh fake state file (two loaded models) and a fresh lms lookup."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {
+            "LMSTUDIO_CLI_PATH": FAKE_LMS,
+            "FAKE_LMS_STATE": str(Path(self.tmp.name) / "state.json"),
+        })
+        self.env.start()
+        for key in ("FAKE_LMS_FAIL", "FAKE_LMS_NO_JSON", "FAKE_LMS_DELAY"):
+            os.environ.pop(key, None)
+        helper._lms_lookup.update(path=None, checked_at=0.0)
+        helper.inventory._json_supported = True
+        self.client = helper.app.test_client()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def fake_output(self, *args):
+        return subprocess.run([FAKE_LMS, *args], capture_output=True, text=True, check=True).stdout
+
+    def wait_for_job(self, job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(f"/jobs/{job_id}").get_json()
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish in {timeout}s")
+
+
+class ParseTests(FakeLmsTestCase):
+    def test_json_and_text_output_agree(self):
+        from_json = helper.parse_lms_ps_json(self.fake_output("ps", "--json"))
+        from_text = helper.parse_lms_ps_text(self.fake_output("ps"))
+        self.assertEqual([m["identifier"] for m in from_json], ["qwen/qwen3-8b", "gemma-3-4b-it"])
+        self.assertEqual(from_json, from_text)
+        self.assertEqual(from_json[0]["size_gb"], 5.03)
+        self.assertEqual(from_json[1]["context_length"], 4096)
+
+    def test_empty_table(self):
+        self.fake_output("unload", "--all")
+        self.assertEqual(helper.parse_lms_ps_text(self.fake_output("ps")), [])
+
+
+class InventoryTests(FakeLmsTestCase):
+    def test_refresh_uses_json(self):
+        snapshot = helper.ModelInventory().refresh()
+        self.assertTrue(snapshot["ok"])
+        self.assertEqual(len(snapshot["models"]), 2)
+
+    def test_falls_back_to_text_when_json_flag_is_unknown(self):
+        os.environ["FAKE_LMS_NO_JSON"] = "1"
+        inventory = helper.ModelInventory()
+        snapshot = inventory.refresh()
+        self.assertTrue(snapshot["ok"])
+        self.assertEqual(len(snapshot["models"]), 2)
+        self.assertFalse(inventory._json_supported)
+
+    def test_keeps_json_after_a_transient_failure(self):
+        inventory = helper.ModelInventory()
+        with mock.patch.object(helper, "run_lms", return_value=subprocess.CompletedProcess(
+                [], 1, stdout="", stderr="LM Studio is not running")):
+            snapshot = inventory.refresh()
+        self.assertFalse(snapshot["ok"])
+        self.assertTrue(inventory._json_supported)
+
+    def test_models_route_is_cached_until_refresh(self):
+        self.assertEqual(len(self.client.get("/models?refresh=1").get_json()["models"]), 2)
+        self.fake_output("unload", "qwen/qwen3-8b")
+        self.assertEqual(len(helper.inventory.snapshot()["models"]), 2)
+        self.assertEqual(len(self.client.get("/models?refresh=1").get_json()["models"]), 1)
+
+
+class LookupTests(FakeLmsTestCase):
+    def test_miss_is_cached_then_rechecked(self):
+        with mock.patch.object(helper, "_scan_for_lms", return_value=None) as scan:
+            self.assertIsNone(helper.find_lms_command())
+            self.assertIsNone(helper.find_lms_command())
+            self.assertEqual(scan.call_count, 1)
+            helper._lms_lookup["checked_at"] -= helper.LMS_LOOKUP_RETRY_SECONDS + 1
+            helper.find_lms_command()
+            self.assertEqual(scan.call_count, 2)
+
+    def test_override_path_is_found(self):
+        self.assertEqual(helper.find_lms_command(), FAKE_LMS)
+
+
+class UnloadTests(FakeLmsTestCase):
+    def test_job_unloads_one_model(self):
+        resp = self.client.post("/jobs/unload", json={"identifier": "gemma-3-4b-it"})
+        self.assertEqual(resp.status_code, 202)
+        job = self.wait_for_job(resp.get_json()["job_id"])
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["target"], "gemma-3-4b-it")
+        models = self.client.get("/models?refresh=1").get_json()["models"]
+        self.assertEqual([m["identifier"] for m in models], ["qwen/qwen3-8b"])
+
+    def test_failed_unload_is_reported(self):
+        os.environ["FAKE_LMS_FAIL"] = "unload"
+        job = self.wait_for_job(self.client.post("/jobs/unload", json={"all": True}).get_json()["job_id"])
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("simulated unload failure", job["result"]["error"])
+        resp = self.client.post("/unload/qwen/qwen3-8b")
+        self.assertEqual(resp.status_code, 500)
+
+    def test_job_requires_a_target(self):
+        self.assertEqual(self.client.post("/jobs/unload", json={}).status_code, 400)
+        self.assertEqual(self.client.get("/jobs/nope").status_code, 404)
+
+    def test_unload_all(self):
+        resp = self.client.post("/unload-all")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get("/models?refresh=1").get_json()["models"], [])
+
+
+class BudgetTests(FakeLmsTestCase):
+    def make_budget(self):
+        helper.inventory.refresh()
+        return helper.MemoryBudgetManager(helper.inventory, helper.unload_models_queued,
+                                          hardware_url="", voice_url="")
+
+    def test_touch_by_model_key_counts_for_the_loaded_identifier(self):
+        budget = self.make_budget()
+        budget.touch("google/gemma-3-4b")
+        lru = budget.status()["lru"]
+        self.assertEqual([m["name"] for m in lru], ["qwen/qwen3-8b", "gemma-3-4b-it"])
+        self.assertIsNotNone(lru[1]["last_used"])
+
+    def test_status_counts_models_only_in_their_pool(self):
+        pools = self.make_budget().status()["pools"]
+        self.assertEqual(pools[budget_manager.LM_STUDIO_POOL]["used_gb"], 7.52)
+        self.assertEqual(pools["ram" if budget_manager.LM_STUDIO_POOL == "vram" else "vram"]["used_gb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
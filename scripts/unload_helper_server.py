@@ -1,26 +1,89 @@
 """
-Unload helper: ejects all loaded models via LM Studio CLI (lms unload --all).
+Unload helper: ejects loaded models via LM Studio CLI (lms unload --all / lms unload <id>).
 Exposes POST http://localhost:8766/unload-all. Started by start_atom_ui.bat.
+Prometheus metrics (request latency, lms CLI timings) at GET /metrics/prom.
+
+A background thread keeps a cached model inventory (parsed `lms ps`) so /models and /status
+answer without shelling out, and POST /jobs/unload runs unloads on a worker so Flask threads
+don't block for up to 30s. Set LMSTUDIO_CLI_PATH=scripts/fake_lms.py to try it without LM Studio.
+POST /budget/ensure evicts least-recently-used models (LM Studio and voice server) until a new
+model fits the VRAM/RAM budget; see budget_manager.py.
 
   pip install flask flask-cors && python scripts/unload_helper_server.py
 """
+import json
 import os
+import re
 import subprocess
 import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from atom_metrics import REGISTRY, instrument_flask
+from budget_manager import MemoryBudgetManager
+
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, "unload_helper")
+
+LMS_COMMAND_LATENCY = REGISTRY.histogram(
+    "atom_lms_command_seconds", "Wall time of lms CLI invocations", ["command", "outcome"]
+)
+
+INVENTORY_REFRESH_SECONDS = float(os.environ.get("UNLOAD_HELPER_REFRESH", "5"))
+LMS_LOOKUP_RETRY_SECONDS = 30  # re-scan for a missing lms CLI at most this often
+MAX_JOBS = 100  # finished jobs kept for GET /jobs/<id>
+# stderr of an lms that predates `ps --json`
+_UNKNOWN_FLAG = re.compile(r"unknown (?:option|flag|argument)|unrecognized (?:option|argument)", re.IGNORECASE)
+
+
+def run_lms(lms_cmd, args, timeout):
+    """subprocess.run for the lms CLI, timed into atom_lms_command_seconds."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = subprocess.run([lms_cmd, *args], capture_output=True, text=True, timeout=timeout)
+        outcome = "ok" if result.returncode == 0 else "failed"
+        return result
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    finally:
+        LMS_COMMAND_LATENCY.observe(time.perf_counter() - start, command=args[0], outcome=outcome)
+
+
+_lms_lookup = {"path": None, "checked_at": 0.0}
+_lms_lookup_lock = threading.Lock()
 
 
 def find_lms_command():
-    """lms CLI path (PATH or Windows default locations)."""
+    """
+    lms CLI path (LMSTUDIO_CLI_PATH, PATH, ~/.lmstudio/bin or Windows default locations).
+    A found path is cached for the life of the process; a miss is re-checked every 30s.
+    """
+    with _lms_lookup_lock:
+        checked_at = _lms_lookup["checked_at"]
+        if _lms_lookup["path"] or (checked_at and time.monotonic() - checked_at < LMS_LOOKUP_RETRY_SECONDS):
+            return _lms_lookup["path"]
+        _lms_lookup["path"] = _scan_for_lms()
+        _lms_lookup["checked_at"] = time.monotonic()
+        return _lms_lookup["path"]
+
+
+def _scan_for_lms():
+    override = os.environ.get("LMSTUDIO_CLI_PATH")
+    if override and os.path.exists(override):
+        return override
     lms_cmd = shutil.which("lms")
     if lms_cmd:
         return lms_cmd
     for path in [
+        os.path.expanduser("~/.lmstudio/bin/lms"),
         os.path.expandvars(r"%LOCALAPPDATA%\LM-Studio\lms.exe"),
         r"C:\Program Files\LM Studio\lms.exe",
     ]:
@@ -29,41 +92,316 @@ def find_lms_command():
     return None
 
 
-@app.route("/unload-all", methods=["POST", "GET"])
-def unload_all():
-    """Run lms unload --all; return { ok } or 500."""
+_SIZE_UNITS = {"b": 1e-9, "kb": 1e-6, "mb": 1e-3, "gb": 1.0, "tb": 1e3, "kib": 2**10 / 1e9, "mib": 2**20 / 1e9, "gib": 2**30 / 1e9}
+
+
+def _parse_size_gb(text):
+    """'4.68 GB' -> 4.68 (decimal GB); None if unparseable."""
+    m = re.match(r"\s*([\d.]+)\s*([KMGT]i?B|B)\b", text or "", re.IGNORECASE)
+    if not m:
+        return None
+    return round(float(m.group(1)) * _SIZE_UNITS[m.group(2).lower()], 3)
+
+
+def _parse_int(text):
+    m = re.search(r"\d+", (text or "").replace(",", ""))
+    return int(m.group()) if m else None
+
+
+def _model_record(identifier, model=None, size_gb=None, context_length=None, status=None):
+    return {
+        "identifier": identifier,
+        "model": model or identifier,
+        "size_gb": size_gb,
+        "context_length": context_length,
+        "status": status,
+    }
+
+
+def parse_lms_ps_json(output):
+    """Records from `lms ps --json` (list of objects; field names vary across lms versions)."""
+    data = json.loads(output)
+    if isinstance(data, dict):
+        data = data.get("models") or data.get("loaded") or []
+    records = []
+    for obj in data:
+        if not isinstance(obj, dict):
+            continue
+        identifier = obj.get("identifier") or obj.get("modelKey") or obj.get("path")
+        if not identifier:
+            continue
+        size_bytes = obj.get("sizeBytes") or obj.get("size_bytes")
+        records.append(_model_record(
+            identifier,
+            model=obj.get("modelKey") or obj.get("path"),
+            size_gb=round(size_bytes / 1e9, 3) if isinstance(size_bytes, (int, float)) else None,
+            context_length=obj.get("contextLength") or obj.get("context_length") or obj.get("maxContextLength"),
+            status=obj.get("status"),
+        ))
+    return records
+
+
+def parse_lms_ps_text(output):
+    """
+    Records from human-readable `lms ps`: either the column table
+    (IDENTIFIER  MODEL  STATUS  SIZE  CONTEXT ...) or the older "Identifier: x / • Size: y" blocks.
+    """
+    lines = [l.rstrip() for l in (output or "").splitlines() if l.strip()]
+    header_index = next((i for i, l in enumerate(lines) if l.lstrip().upper().startswith("IDENTIFIER ")), None)
+    records = []
+    if header_index is not None:
+        header = lines[header_index]
+        columns = [(m.group().lower(), m.start()) for m in re.finditer(r"\S+", header)]
+        for row in lines[header_index + 1:]:
+            cells = {}
+            for i, (name, start) in enumerate(columns):
+                end = columns[i + 1][1] if i + 1 < len(columns) else None
+                cells[name] = row[start:end].strip()
+            if not cells.get("identifier"):
+                continue
+            records.append(_model_record(
+                cells["identifier"],
+                model=cells.get("model"),
+                size_gb=_parse_size_gb(cells.get("size")),
+                context_length=_parse_int(cells.get("context")),
+                status=cells.get("status") or None,
+            ))
+        return records
+
+    current = None
+    for line in lines:
+        key, _, value = line.strip().lstrip("•*- ").partition(":")
+        key, value = key.strip().lower(), value.strip()
+        if key == "identifier":
+            current = _model_record(value)
+            records.append(current)
+        elif current is None:
+            continue
+        elif key == "path":
+            current["model"] = value
+        elif key == "size":
+            current["size_gb"] = _parse_size_gb(value)
+        elif key in ("context length", "context"):
+            current["context_length"] = _parse_int(value)
+        elif key == "status":
+            current["status"] = value
+    return records
+
+
+class ModelInventory:
+    """
+    Cached view of `lms ps`, refreshed by a background thread every INVENTORY_REFRESH_SECONDS
+    and immediately after any unload. Readers get the last snapshot without running the CLI.
+    """
+
+    def __init__(self, interval=INVENTORY_REFRESH_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._json_supported = True  # flips to False if this lms has no `ps --json`
+        self._snapshot = {"ok": False, "models": [], "updated_at": None, "error": "not refreshed yet", "output": ""}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-inventory", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def invalidate(self):
+        """Ask the background thread to refresh now (e.g. after an unload)."""
+        self._wake.set()
+
+    def refresh(self):
+        """Run `lms ps` once and replace the snapshot. Returns the new snapshot."""
+        snapshot = {"ok": False, "models": [], "updated_at": time.time(), "error": None, "output": ""}
+        lms_cmd = find_lms_command()
+        if not lms_cmd:
+            snapshot["error"] = "lms CLI not found"
+        else:
+            try:
+                snapshot.update(self._read_models(lms_cmd))
+            except subprocess.TimeoutExpired:
+                snapshot["error"] = "lms ps timed out after 10s"
+            except Exception as e:
+                snapshot["error"] = f"Failed to run lms CLI: {e}"
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _read_models(self, lms_cmd):
+        if self._json_supported:
+            result = run_lms(lms_cmd, ["ps", "--json"], timeout=10)
+            if result.returncode == 0:
+                try:
+                    return {"ok": True, "models": parse_lms_ps_json(result.stdout), "output": result.stdout.strip()}
+                except ValueError:
+                    self._json_supported = False  # exit 0 but not JSON: an lms without --json
+            elif _UNKNOWN_FLAG.search(result.stderr or ""):
+                self._json_supported = False
+            # Any other failure (server not running, transient error) keeps --json for the next refresh
+        result = run_lms(lms_cmd, ["ps"], timeout=10)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip() or f"lms ps failed (exit {result.returncode})"}
+        return {"ok": True, "models": parse_lms_ps_text(result.stdout), "output": result.stdout.strip()}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._snapshot)
+
+
+inventory = ModelInventory()
+
+
+def unload_models(identifier=None, timeout=30):
+    """
+    `lms unload <identifier>` or `lms unload --all` when identifier is None.
+    Returns (ok, payload) where payload is the JSON body for the response / job result.
+    """
     lms_cmd = find_lms_command()
     if not lms_cmd:
-        return jsonify({
+        return False, {
             "ok": False,
             "error": "lms CLI not found. Install LM Studio and ensure 'lms' command is in PATH or at %LOCALAPPDATA%\\LM-Studio\\lms.exe"
-        }), 500
-    
+        }
+    args = ["unload", identifier] if identifier else ["unload", "--all"]
     try:
-        result = subprocess.run(
-            [lms_cmd, "unload", "--all"],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
+        result = run_lms(lms_cmd, args, timeout=timeout)
         if result.returncode == 0:
-            output = result.stdout.strip()
-            return jsonify({
+            return True, {
                 "ok": True,
-                "message": "All models unloaded via CLI",
-                "output": output
-            })
-        else:
-            return jsonify({
-                "ok": False,
-                "error": f"lms unload failed (exit {result.returncode}): {result.stderr.strip()}"
-            }), 500
-            
+                "message": f"Unloaded {identifier} via CLI" if identifier else "All models unloaded via CLI",
+                "output": result.stdout.strip()
+            }
+        return False, {
+            "ok": False,
+            "error": f"lms unload failed (exit {result.returncode}): {result.stderr.strip()}"
+        }
     except subprocess.TimeoutExpired:
-        return jsonify({"ok": False, "error": "lms unload timed out after 30s"}), 500
+        return False, {"ok": False, "error": f"lms unload timed out after {timeout}s"}
     except Exception as e:
-        return jsonify({"ok": False, "error": f"Failed to run lms CLI: {e}"}), 500
+        return False, {"ok": False, "error": f"Failed to run lms CLI: {e}"}
+    finally:
+        inventory.invalidate()
+
+
+# Async unload jobs: one worker so lms calls never overlap; Flask threads return immediately
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unload-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _run_job(job_id, identifier):
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "running"
+        _jobs[job_id]["started_at"] = time.time()
+    ok, payload = unload_models(identifier)
+    with _jobs_lock:
+        _jobs[job_id].update({"status": "done" if ok else "failed", "finished_at": time.time(), "result": payload})
+
+
+def submit_unload_job(identifier=None):
+    job_id = uuid.uuid4().hex[:12]
+    with _jobs_lock:
+        finished = [j for j, v in _jobs.items() if v["status"] in ("done", "failed")]
+        for old in finished[: max(0, len(_jobs) - MAX_JOBS + 1)]:
+            del _jobs[old]
+        _jobs[job_id] = {"id": job_id, "target": identifier or "--all", "status": "queued", "created_at": time.time()}
+    _executor.submit(_run_job, job_id, identifier)
+    return job_id
+
+
+def unload_models_queued(identifier=None):
+    """unload_models() on the job worker, so synchronous unloads queue behind async jobs instead of overlapping."""
+    return _executor.submit(unload_models, identifier).result()
+
+
+budget = MemoryBudgetManager(inventory, unload_models_queued)
+
+
+@app.route("/unload-all", methods=["POST", "GET"])
+def unload_all():
+    """Run lms unload --all; return { ok } or 500."""
+    ok, payload = unload_models_queued()
+    return jsonify(payload), 200 if ok else 500
+
+
+@app.route("/unload/<path:identifier>", methods=["POST"])
+def unload_one(identifier):
+    """Run lms unload <identifier> for one loaded model; return { ok } or 500."""
+    ok, payload = unload_models_queued(identifier)
+    return jsonify(payload), 200 if ok else 500
+
+
+@app.route("/jobs/unload", methods=["POST"])
+def create_unload_job():
+    """Queue an unload without blocking: body {"identifier": "<id>"} or {"all": true}. Returns 202 + job id."""
+    body = request.get_json(silent=True) or {}
+    identifier = body.get("identifier")
+    if not identifier and not body.get("all"):
+        return jsonify({"ok": False, "error": "identifier or all=true required"}), 400
+    job_id = submit_unload_job(None if body.get("all") else identifier)
+    return jsonify({"ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        job = dict(job) if job else None
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+    return jsonify({"ok": True, **job})
+
+
+@app.route("/models")
+def list_models():
+    """Cached inventory of loaded models; ?refresh=1 runs lms ps now."""
+    inventory.start()
+    snapshot = inventory.refresh() if request.args.get("refresh") else inventory.snapshot()
+    return jsonify(snapshot), 200 if snapshot["ok"] else 500
+
+
+@app.route("/budget")
+def budget_status():
+    """Budgets, current usage, LRU order and the recent eviction decisions."""
+    inventory.start()
+    return jsonify(budget.status())
+
+
+@app.route("/budget/touch", methods=["POST"])
+def budget_touch():
+    """Record that a model was just used: body {"model": "<id>", "owner": "lm_studio"|"voice"}."""
+    body = request.get_json(silent=True) or {}
+    if not body.get("model"):
+        return jsonify({"ok": False, "error": "model required"}), 400
+    budget.touch(body["model"], body.get("owner", "lm_studio"))
+    return jsonify({"ok": True})
+
+
+@app.route("/budget/ensure", methods=["POST"])
+def budget_ensure():
+    """
+    Before loading a model: body {"model": "<id>", "size_gb": 5.0, "pool": "vram"|"ram", "owner": "lm_studio"}.
+    Unloads LRU models one at a time until it fits; returns the decisions and memory reclaimed.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        size_gb = float(body.get("size_gb"))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "size_gb (number) required"}), 400
+    pool = body.get("pool", "vram")
+    if not body.get("model") or pool not in ("vram", "ram"):
+        return jsonify({"ok": False, "error": "model required and pool must be vram or ram"}), 400
+    result = budget.ensure(body["model"], size_gb, pool=pool, owner=body.get("owner", "lm_studio"))
+    return jsonify(result), 200 if result["ok"] else 500
 
 
 @app.route("/health")
@@ -73,24 +411,23 @@ def health():
 
 @app.route("/status")
 def status():
-    """Loaded model count via lms ps."""
-    lms_cmd = find_lms_command()
-    if not lms_cmd:
-        return jsonify({"ok": False, "error": "lms CLI not found"}), 500
-    
-    try:
-        result = subprocess.run([lms_cmd, "ps"], capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            lines = [l.strip() for l in result.stdout.strip().split('\n') if l.strip()]
-            # Count non-header lines as loaded models
-            loaded_count = max(0, len(lines) - 1) if lines else 0
-            return jsonify({"ok": True, "loaded": loaded_count, "output": result.stdout.strip()})
-        else:
-            return jsonify({"ok": False, "error": result.stderr.strip()}), 500
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    """Loaded model count from the cached inventory."""
+    inventory.start()
+    snapshot = inventory.snapshot()
+    if snapshot["updated_at"] is None:
+        snapshot = inventory.refresh()
+    if not snapshot["ok"]:
+        return jsonify({"ok": False, "error": snapshot["error"]}), 500
+    return jsonify({
+        "ok": True,
+        "loaded": len(snapshot["models"]),
+        "models": [m["identifier"] for m in snapshot["models"]],
+        "output": snapshot["output"],
+    })
 
 
 if __name__ == "__main__":
+    inventory.start()
     print("Unload helper: http://localhost:8766/unload-all (POST to eject all models)")
-    app.run(port=8766)
+    print("  Models: http://localhost:8766/models  |  Async: POST /jobs/unload {\"identifier\": \"...\"}")
+    app.run(port=8766, threaded=True)
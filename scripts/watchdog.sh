@@ -40,6 +40,8 @@ restart_voice() {
   pkill -f "uvicorn.*app:app.*8765" 2>/dev/null
   sleep 1
   if [ -f "$ATOM_DIR/voice-server/app.py" ]; then
+    # Shared atom_metrics module for /metrics/prom
+    export PYTHONPATH="$ATOM_DIR/scripts${PYTHONPATH:+:$PYTHONPATH}"
     if [ -x "$ATOM_DIR/voice-server/venv/bin/python3" ]; then
       cd "$ATOM_DIR/voice-server" && \
         nohup ./venv/bin/python3 -m uvicorn app:app \
@@ -54,7 +54,9 @@ else
 fi
 
 # Voice server (optional) — faster-whisper; venv must have deps from voice-server/requirements.txt
+# scripts/ on PYTHONPATH provides the shared atom_metrics module (without it /metrics/prom is empty)
 if [ -f voice-server/app.py ]; then
+  export PYTHONPATH="$PWD/scripts${PYTHONPATH:+:$PYTHONPATH}"
   if [ -x voice-server/venv/bin/python3 ]; then
     (cd voice-server && ./venv/bin/python3 -m pip install -r requirements.txt -q 2>/dev/null)
     (cd voice-server && exec ./venv/bin/python3 -m uvicorn app:app --host 0.0.0.0 --port 8765) &
@@ -2,18 +2,70 @@
 Voice-to-text server for ATOM UI.
 Uses faster-whisper with int8 quantization (~1.5GB VRAM).
 Run: uvicorn app:app --host 0.0.0.0 --port 8765
+Prometheus metrics (request latency, inference time, lock wait, model cache) at GET /metrics/prom.
+Heavy dependencies (faster-whisper, kokoro, librosa, numpy, soundfile) are imported on first use,
+so /health answers as soon as uvicorn is up. VOICE_PRELOAD=whisper,kokoro warms them in the background.
 """
+import asyncio
 import os
+import sys
 import tempfile
 import threading
+import uuid
+from collections import OrderedDict
 from pathlib import Path
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+
+class _NoMetrics:
+    """Stands in for atom_metrics when it is not importable: every metric, timer and registry call is a no-op."""
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def render(self):
+        return ""
+
+    def stage_timers_enabled(self):
+        return False
+
+
+# Shared instrumentation (scripts/atom_metrics.py, put on PYTHONPATH by start-atom-code.sh). Optional:
+# started on its own, the server runs the same and /metrics/prom is empty.
+try:
+    import atom_metrics
+    from atom_metrics import HTTP_LATENCY, HTTP_REQUESTS, INFERENCE_LATENCY, QUEUE_WAIT, record_cache, stage
+except ImportError:
+    atom_metrics = _NoMetrics()
+    HTTP_LATENCY = HTTP_REQUESTS = INFERENCE_LATENCY = QUEUE_WAIT = record_cache = stage = atom_metrics
+from audio_prep import probe_duration, speech_chunks
+
+AUDIO_SECONDS = atom_metrics.REGISTRY.counter(
+    "atom_voice_audio_seconds_total", "Audio seconds received vs. sent to Whisper after silence trimming", ["kind"]
+)
+TRANSCRIBE_TIER = atom_metrics.REGISTRY.counter(
+    "atom_voice_transcribe_tier_total", "Which tier answered /transcribe (draft, large, or draft refined later)", ["tier"]
+)
 
 # Limits to avoid crashing the system
 MAX_FILE_BYTES = 10 * 1024 * 1024  # 10 MB
 MAX_DURATION_SECONDS = 120  # 2 minutes max audio
+# Drop leading/trailing silence and long pauses before Whisper (0 = send the decoded clip as is)
+TRIM_SILENCE = os.environ.get("VOICE_TRIM_SILENCE", "1") != "0"
+CHUNK_SECONDS = 30.0  # Whisper's window: each chunk is one encoder pass
 REQUEST_LOCK = threading.Lock()
 LOCK_TIMEOUT = 300  # 5 min max wait for lock
 
@@ -21,6 +73,17 @@ LOCK_TIMEOUT = 300  # 5 min max wait for lock
 WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "large-v3-turbo")
 COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
 
+# Two-tier mode: a small draft model answers first; low-confidence drafts are re-run on the large model
+# before answering ("auto"), in the background ("async", GET /transcribe/refined/{id}) or not at all ("never").
+STT_MODE = os.environ.get("VOICE_STT_MODE", "single")  # single | two_tier
+DRAFT_MODEL = os.environ.get("WHISPER_DRAFT_MODEL", "base")
+DRAFT_COMPUTE_TYPE = os.environ.get("WHISPER_DRAFT_COMPUTE_TYPE", "int8")
+REFINE_MODE = os.environ.get("VOICE_REFINE", "auto")  # auto | async | never
+# Draft is trusted when its duration-weighted avg_logprob is at least this and no_speech_prob at most this
+DRAFT_MIN_LOGPROB = float(os.environ.get("VOICE_DRAFT_MIN_LOGPROB", "-0.5"))
+DRAFT_MAX_NO_SPEECH = float(os.environ.get("VOICE_DRAFT_MAX_NO_SPEECH", "0.6"))
+MAX_REFINE_RESULTS = 64  # async refinements kept for GET /transcribe/refined/{id}
+
 import logging
 
 # Configure logging to file
@@ -35,6 +98,12 @@ logger = logging.getLogger("voice-server")
 from starlette.middleware.base import BaseHTTPMiddleware
 import time
 
+def _route_path(request):
+    """Route template for metric labels (bounded cardinality); 'unmatched' for 404s."""
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
 class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         start_time = time.time()
@@ -43,10 +112,14 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             response = await call_next(request)
             process_time = time.time() - start_time
             logger.info(f"RES: {request.method} {request.url.path} - {response.status_code} ({process_time:.3f}s)")
+            path = _route_path(request)
+            HTTP_LATENCY.observe(process_time, service="voice", method=request.method, path=path)
+            HTTP_REQUESTS.inc(service="voice", method=request.method, path=path, status=response.status_code)
             return response
         except Exception as e:
             process_time = time.time() - start_time
             logger.error(f"RES ERROR: {request.method} {request.url.path} - {str(e)} ({process_time:.3f}s)", exc_info=True)
+            HTTP_REQUESTS.inc(service="voice", method=request.method, path=_route_path(request), status=500)
             raise
 
 app = FastAPI(title="ATOM Voice", version="2.0.0")
@@ -65,23 +138,224 @@ app.add_middleware(
 )
 
 _model = None
+_draft_model = None
+# Model handle -> last time it served a request; reported by GET /models for the budget manager
+_last_used = {"whisper": None, "whisper_draft": None, "kokoro": None}
+# Approximate resident size per handle (GB) so the budget manager can estimate what an unload frees
+MODEL_SIZE_GB = {
+    "whisper": float(os.environ.get("WHISPER_SIZE_GB", "1.5")),
+    "whisper_draft": float(os.environ.get("WHISPER_DRAFT_SIZE_GB", "0.15")),
+    "kokoro": float(os.environ.get("KOKORO_SIZE_GB", "0.5")),
+}
+
+
+# Serializes lazy model creation, so VOICE_PRELOAD and a first request cannot both load the same model
+_load_lock = threading.Lock()
 
 
 def _get_model():
     global _model
-    if _model is None:
-        from faster_whisper import WhisperModel
-        _model = WhisperModel(
-            WHISPER_MODEL,
-            device="auto",
-            compute_type=COMPUTE_TYPE,
-        )
-    return _model
+    model = _model
+    record_cache("voice", "whisper_model", model is not None)
+    _last_used["whisper"] = time.time()
+    if model is None:
+        with _load_lock:
+            if _model is None:
+                from faster_whisper import WhisperModel
+                _model = WhisperModel(
+                    WHISPER_MODEL,
+                    device="auto",
+                    compute_type=COMPUTE_TYPE,
+                )
+            model = _model
+    return model
+
+
+def _get_draft_model():
+    global _draft_model
+    model = _draft_model
+    record_cache("voice", "whisper_draft_model", model is not None)
+    _last_used["whisper_draft"] = time.time()
+    if model is None:
+        with _load_lock:
+            if _draft_model is None:
+                from faster_whisper import WhisperModel
+                _draft_model = WhisperModel(DRAFT_MODEL, device="auto", compute_type=DRAFT_COMPUTE_TYPE)
+            model = _draft_model
+    return model
+
+
+def _run_whisper(model, model_name, pieces):
+    """Transcribe chunks with one model: (text, {"avg_logprob", "no_speech_prob"}) weighted by segment length."""
+    import numpy as np
+    texts, weight, logprob, no_speech = [], 0.0, 0.0, 0.0
+    # segments is lazy: decoding happens while joining, so time both
+    with INFERENCE_LATENCY.time(service="voice", model=model_name, task="transcribe"):
+        for piece in pieces:
+            # 16 kHz float32 samples go straight to faster-whisper; no temporary WAV
+            segments, _ = model.transcribe(piece.astype(np.float32, copy=False))
+            parts = []
+            for seg in segments:
+                parts.append(seg.text or "")
+                length = max(0.01, float(seg.end - seg.start))
+                weight += length
+                logprob += length * float(seg.avg_logprob)
+                no_speech += length * float(seg.no_speech_prob)
+            texts.append("".join(parts).strip())
+    confidence = {
+        "avg_logprob": round(logprob / weight, 3) if weight else None,
+        "no_speech_prob": round(no_speech / weight, 3) if weight else None,
+    }
+    return " ".join(t for t in texts if t), confidence
+
+
+def _draft_is_confident(text, confidence):
+    if not text or confidence["avg_logprob"] is None:
+        return False
+    return confidence["avg_logprob"] >= DRAFT_MIN_LOGPROB and confidence["no_speech_prob"] <= DRAFT_MAX_NO_SPEECH
+
+
+# Async refinements: id -> {"status": "pending"|"done"|"error", "text", "draft"}; oldest dropped first
+_refined = OrderedDict()
+_refined_lock = threading.Lock()
+
+
+def _refine_in_background(refine_id, pieces):
+    try:
+        if not _acquire_request_lock():
+            raise RuntimeError("request lock timeout")
+        try:
+            text, confidence = _run_whisper(_get_model(), WHISPER_MODEL, pieces)
+        finally:
+            REQUEST_LOCK.release()
+        result = {"status": "done", "text": text, "confidence": confidence}
+        TRANSCRIBE_TIER.inc(tier="refined")
+    except Exception as e:
+        logger.error(f"Refinement {refine_id} failed: {e}", exc_info=True)
+        result = {"status": "error", "error": str(e)}
+    with _refined_lock:
+        if refine_id in _refined:
+            _refined[refine_id].update(result)
+
+
+def _acquire_request_lock():
+    """REQUEST_LOCK.acquire with the wait time recorded in atom_queue_wait_seconds."""
+    start = time.perf_counter()
+    acquired = REQUEST_LOCK.acquire(timeout=LOCK_TIMEOUT)
+    QUEUE_WAIT.observe(time.perf_counter() - start, service="voice", queue="request_lock")
+    return acquired
+
+
+# Comma-separated handles to load in the background at startup ("whisper", "whisper_draft", "kokoro"); empty = load on first use
+VOICE_PRELOAD = [n.strip() for n in os.environ.get("VOICE_PRELOAD", "").split(",") if n.strip()]
+
+
+def _preload_models():
+    loaders = {"whisper": lambda: _get_model(), "whisper_draft": lambda: _get_draft_model(),
+               "kokoro": lambda: get_tts_pipeline()}
+    for name in VOICE_PRELOAD:
+        start = time.perf_counter()
+        try:
+            loaders[name]()
+            logger.info(f"Preloaded {name} in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"Preloading {name} failed: {e}")
+
+
+@app.on_event("startup")
+def _start_preload():
+    if VOICE_PRELOAD:
+        # Daemon thread: startup (and /health) must not wait for model loads
+        threading.Thread(target=_preload_models, daemon=True, name="voice-preload").start()
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "engine": "faster-whisper", "model": WHISPER_MODEL}
+    result = {"status": "ok", "engine": "faster-whisper", "model": WHISPER_MODEL, "stt_mode": STT_MODE}
+    if STT_MODE == "two_tier":
+        result.update({"draft_model": DRAFT_MODEL, "refine": REFINE_MODE})
+    return result
+
+
+@app.get("/metrics/prom")
+def prometheus_metrics():
+    return PlainTextResponse(atom_metrics.REGISTRY.render(), media_type=atom_metrics.CONTENT_TYPE)
+
+
+@app.api_route("/metrics/prom/stages", methods=["GET", "POST"])
+async def stage_timers(request: Request):
+    """Toggle per-stage timers at runtime: POST {"enabled": true|false}."""
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+        atom_metrics.set_stage_timers(body.get("enabled", not atom_metrics.stage_timers_enabled()))
+    return {"enabled": atom_metrics.stage_timers_enabled()}
+
+
+def _transcribe_file(tmp_path):
+    """
+    Decode, trim and transcribe an upload. Blocking (decode, REQUEST_LOCK wait of up to LOCK_TIMEOUT,
+    Whisper), so /transcribe runs it in a worker thread and the event loop keeps answering /health.
+    """
+    import librosa
+    try:
+        with stage("voice_decode"):
+            # Capped: a header without a duration (MediaRecorder webm) can't make us decode more than the limit
+            y, sr = librosa.load(tmp_path, sr=16000, mono=True, duration=MAX_DURATION_SECONDS + 1)
+    except Exception as e:
+        raise HTTPException(
+            400,
+            f"Could not load audio (install ffmpeg for webm support): {getattr(e, 'message', str(e))}",
+        )
+    duration = len(y) / sr
+    if duration > MAX_DURATION_SECONDS:
+        raise HTTPException(413, f"Audio too long (max {MAX_DURATION_SECONDS}s)")
+
+    import numpy as np
+    if TRIM_SILENCE:
+        with stage("voice_trim"):
+            pieces = [np.concatenate([y[s:e] for s, e in chunk]) for chunk in speech_chunks(y, sr, CHUNK_SECONDS)]
+    else:
+        pieces = [y]
+    speech = sum(len(p) for p in pieces) / sr
+    AUDIO_SECONDS.inc(duration, kind="received")
+    AUDIO_SECONDS.inc(speech, kind="transcribed")
+    logger.info(
+        f"Transcribe: {duration:.1f}s audio, {speech:.1f}s sent in {len(pieces)} chunk(s), "
+        f"{duration - speech:.1f}s of silence saved"
+    )
+    if not pieces:
+        return {"text": "", "tier": "none"}
+
+    acquired = _acquire_request_lock()
+    if not acquired:
+        raise HTTPException(503, "Server busy; try again in a moment")
+    try:
+        if STT_MODE != "two_tier":
+            text, confidence = _run_whisper(_get_model(), WHISPER_MODEL, pieces)
+            result = {"text": text, "tier": "large", "confidence": confidence}
+        else:
+            text, confidence = _run_whisper(_get_draft_model(), DRAFT_MODEL, pieces)
+            result = {"text": text, "tier": "draft", "confidence": confidence}
+            if REFINE_MODE == "auto" and not _draft_is_confident(text, confidence):
+                # Low-confidence draft: answer with the large model instead (lock still held)
+                text, confidence = _run_whisper(_get_model(), WHISPER_MODEL, pieces)
+                result = {"text": text, "tier": "large", "confidence": confidence, "draft": result["text"]}
+    finally:
+        REQUEST_LOCK.release()
+    if result["tier"] == "draft" and REFINE_MODE == "async" and not _draft_is_confident(text, confidence):
+        # Answer with the draft now; the large model's version is fetched later
+        refine_id = uuid.uuid4().hex
+        with _refined_lock:
+            _refined[refine_id] = {"status": "pending", "draft": result["text"]}
+            while len(_refined) > MAX_REFINE_RESULTS:
+                _refined.popitem(last=False)
+        threading.Thread(target=_refine_in_background, args=(refine_id, pieces), daemon=True).start()
+        result["refine_id"] = refine_id
+    TRANSCRIBE_TIER.inc(tier=result["tier"])
+    return result
 
 
 @app.post("/transcribe")
@@ -99,38 +373,15 @@ async def transcribe(audio: UploadFile = File(..., description="Audio file (webm
         tmp_path = tmp.name
 
     try:
-        import librosa
-        try:
-            y, sr = librosa.load(tmp_path, sr=16000, mono=True)
-        except Exception as e:
-            raise HTTPException(
-                400,
-                f"Could not load audio (install ffmpeg for webm support): {getattr(e, 'message', str(e))}",
-            )
-        duration = len(y) / sr
-        if duration > MAX_DURATION_SECONDS:
+        # Header-only probe: an oversized clip is rejected before any decode. Off the event loop, since the
+        # libsndfile / ffprobe fallbacks read the file and can take up to FFPROBE_TIMEOUT
+        with stage("voice_probe"):
+            probed = await asyncio.to_thread(probe_duration, tmp_path, raw[:4096])
+        if probed is not None and probed > MAX_DURATION_SECONDS:
+            logger.info(f"Rejected {probed:.1f}s upload from its header (no decode)")
             raise HTTPException(413, f"Audio too long (max {MAX_DURATION_SECONDS}s)")
 
-        # Write 16 kHz mono WAV for faster-whisper
-        import soundfile as sf
-        wav_path = tmp_path + ".wav"
-        sf.write(wav_path, y, 16000)
-        try:
-            acquired = REQUEST_LOCK.acquire(timeout=LOCK_TIMEOUT)
-            if not acquired:
-                raise HTTPException(503, "Server busy; try again in a moment")
-            try:
-                model = _get_model()
-                segments, _ = model.transcribe(wav_path)
-                text = "".join(s.text or "" for s in segments).strip()
-                return {"text": text}
-            finally:
-                REQUEST_LOCK.release()
-        finally:
-            try:
-                os.unlink(wav_path)
-            except OSError:
-                pass
+        return await asyncio.to_thread(_transcribe_file, tmp_path)
     except HTTPException:
         raise
     except Exception as e:
@@ -140,12 +391,23 @@ async def transcribe(audio: UploadFile = File(..., description="Audio file (webm
             os.unlink(tmp_path)
         except OSError:
             pass
-from kokoro import KPipeline
-import soundfile as sf
-import numpy as np
+
+
+@app.get("/transcribe/refined/{refine_id}")
+def transcribe_refined(refine_id: str):
+    """Large-model result for a draft answered with refine_id (VOICE_REFINE=async)."""
+    with _refined_lock:
+        entry = _refined.get(refine_id)
+        entry = dict(entry) if entry else None
+    if entry is None:
+        raise HTTPException(404, "Unknown or expired refine_id")
+    if entry["status"] == "done":
+        entry["changed"] = entry["text"].strip() != (entry.get("draft") or "").strip()
+    return entry
+
+
 import io
 import base64
-from fastapi import Request
 from fastapi.responses import JSONResponse
 
 # Initialize Kokoro pipeline once at startup — not per request
@@ -154,9 +416,59 @@ tts_pipeline = None
 
 def get_tts_pipeline():
     global tts_pipeline
-    if tts_pipeline is None:
-        tts_pipeline = KPipeline(lang_code='a')
-    return tts_pipeline
+    pipeline = tts_pipeline
+    record_cache("voice", "tts_pipeline", pipeline is not None)
+    _last_used["kokoro"] = time.time()
+    if pipeline is None:
+        with _load_lock:
+            if tts_pipeline is None:
+                from kokoro import KPipeline  # pulls in torch; imported on first TTS request, not at startup
+                tts_pipeline = KPipeline(lang_code='a')
+            pipeline = tts_pipeline
+    return pipeline
+
+def _synthesize(chunks, voice, speed):
+    """Kokoro over the text chunks as a base64 WAV response. Blocking (REQUEST_LOCK wait + TTS), run in a worker thread."""
+    # Use existing REQUEST_LOCK to prevent concurrent GPU/resource heavy operations
+    acquired = _acquire_request_lock()
+    if not acquired:
+        return JSONResponse({"error": "Server busy; try again in a moment"}, status_code=503)
+
+    try:
+        pipeline = get_tts_pipeline()
+        audio_chunks = []
+
+        with INFERENCE_LATENCY.time(service="voice", model="kokoro", task="tts"):
+            for i, chunk in enumerate(chunks):
+                if not chunk.strip(): continue
+                logger.debug(f"Generating audio for chunk {i+1}/{len(chunks)}: {len(chunk)} chars")
+                # Use split_pattern=None because we've already chunked it manually
+                generator = pipeline(chunk, voice=voice, speed=speed, split_pattern=None)
+                for _, _, audio in generator:
+                    audio_chunks.append(audio)
+
+        if not audio_chunks:
+            return JSONResponse({"error": "no audio generated"}, status_code=500)
+
+        # Combine chunks and encode as base64 WAV
+        with stage("tts_encode"):
+            import numpy as np
+            import soundfile as sf
+            combined = np.concatenate(audio_chunks)
+            buffer = io.BytesIO()
+            sf.write(buffer, combined, 24000, format='WAV')
+            buffer.seek(0)
+            audio_b64 = base64.b64encode(buffer.read()).decode('utf-8')
+
+        logger.info(f"Successfully generated audio: {len(audio_b64)} b64 bytes")
+        return JSONResponse({
+            "audio": audio_b64,
+            "format": "wav",
+            "sample_rate": 24000
+        })
+    finally:
+        REQUEST_LOCK.release()
+
 
 @app.post("/tts")
 async def text_to_speech(request: Request):
@@ -227,41 +539,7 @@ async def text_to_speech(request: Request):
         if current_chunk:
             chunks.append(current_chunk.strip())
             
-        # Use existing REQUEST_LOCK to prevent concurrent GPU/resource heavy operations
-        acquired = REQUEST_LOCK.acquire(timeout=LOCK_TIMEOUT)
-        if not acquired:
-            return JSONResponse({"error": "Server busy; try again in a moment"}, status_code=503)
-            
-        try:
-            pipeline = get_tts_pipeline()
-            audio_chunks = []
-            
-            for i, chunk in enumerate(chunks):
-                if not chunk.strip(): continue
-                logger.debug(f"Generating audio for chunk {i+1}/{len(chunks)}: {len(chunk)} chars")
-                # Use split_pattern=None because we've already chunked it manually
-                generator = pipeline(chunk, voice=voice, speed=speed, split_pattern=None)
-                for _, _, audio in generator:
-                    audio_chunks.append(audio)
-            
-            if not audio_chunks:
-                return JSONResponse({"error": "no audio generated"}, status_code=500)
-            
-            # Combine chunks and encode as base64 WAV
-            combined = np.concatenate(audio_chunks)
-            buffer = io.BytesIO()
-            sf.write(buffer, combined, 24000, format='WAV')
-            buffer.seek(0)
-            audio_b64 = base64.b64encode(buffer.read()).decode('utf-8')
-            
-            logger.info(f"Successfully generated audio: {len(audio_b64)} b64 bytes")
-            return JSONResponse({
-                "audio": audio_b64,
-                "format": "wav",
-                "sample_rate": 24000
-            })
-        finally:
-            REQUEST_LOCK.release()
+        return await asyncio.to_thread(_synthesize, chunks, voice, speed)
         
     except Exception as e:
         logger.error(f"TTS Exception: {str(e)}", exc_info=True)
@@ -277,3 +555,65 @@ async def list_voices():
             {"id": "am_michael", "name": "Michael (Male, Deep)", "lang": "en-us"}
         ]
     })
+
+
+def _model_handle(name):
+    return {"whisper": _model, "whisper_draft": _draft_model, "kokoro": tts_pipeline}[name]
+
+
+def _model_pool(name):
+    """Pool a loaded handle lives in, "vram" or "ram" (device="auto" decides at load time); None if not loaded."""
+    handle = _model_handle(name)
+    if handle is None:
+        return None
+    # faster-whisper: WhisperModel.model is the CTranslate2 model; Kokoro: KPipeline.model is a torch module
+    device = getattr(getattr(handle, "model", None), "device", None)
+    return "vram" if str(device).startswith("cuda") else "ram"
+
+
+@app.get("/models")
+def list_models():
+    """Loaded model handles with approximate size and last use (for the unload helper's budget manager)."""
+    names = {"whisper": WHISPER_MODEL, "whisper_draft": DRAFT_MODEL, "kokoro": "kokoro"}
+    return {
+        "models": [
+            {
+                "name": name,
+                "model": names[name],
+                "loaded": _model_handle(name) is not None,
+                "pool": _model_pool(name),
+                "size_gb": MODEL_SIZE_GB[name],
+                "last_used": _last_used[name],
+            }
+            for name in ("whisper", "whisper_draft", "kokoro")
+            if name != "whisper_draft" or STT_MODE == "two_tier" or _draft_model is not None
+        ]
+    }
+
+
+@app.post("/models/{name}/unload")
+def unload_model(name: str):
+    """Drop a model handle so its memory can be reclaimed; it reloads lazily on next use."""
+    global _model, _draft_model, tts_pipeline
+    if name not in MODEL_SIZE_GB:
+        return JSONResponse({"ok": False, "error": f"unknown model {name}"}, status_code=404)
+    # Wait for any in-flight transcription/TTS so we never pull a model out from under it
+    if not _acquire_request_lock():
+        return JSONResponse({"ok": False, "error": "Server busy; try again in a moment"}, status_code=503)
+    try:
+        was_loaded = _model_handle(name) is not None
+        if name == "whisper":
+            _model = None
+        elif name == "whisper_draft":
+            _draft_model = None
+        else:
+            tts_pipeline = None
+        import gc
+        gc.collect()
+        torch = sys.modules.get("torch")  # Kokoro runs on torch; release its cached CUDA blocks too
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    finally:
+        REQUEST_LOCK.release()
+    logger.info(f"Unloaded {name} (was_loaded={was_loaded})")
+    return {"ok": True, "name": name, "was_loaded": was_loaded, "size_gb": MODEL_SIZE_GB[name] if was_loaded else 0}
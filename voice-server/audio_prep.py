@@ -0,0 +1,131 @@
+"""
+Pre-flight helpers for /transcribe: cheap duration probing and energy-based silence trimming.
+
+probe_duration() reads the duration from the container header (WAV RIFF chunk sizes, then
+libsndfile, then ffprobe), so oversized uploads are rejected before any decode. None means the
+header has no usable duration (e.g. MediaRecorder WebM); the caller then decodes with a length cap.
+
+speech_chunks() finds the speech in 16 kHz mono samples by frame RMS energy relative to the loudest
+frame, drops leading/trailing silence and shortens long pauses, and packs what is left into chunks
+of at most max_chunk_s (a stretch of speech longer than that is cut at its quietest frame).
+numpy and soundfile are imported on first use, like the rest of the voice server.
+"""
+import json
+import shutil
+import struct
+import subprocess
+from typing import List, Optional, Tuple
+
+FRAME_MS = 30
+# A frame is speech if its RMS is within REL_DB of the loudest frame and above FLOOR_DB (full scale)
+REL_DB = -35.0
+FLOOR_DB = -60.0
+# Pauses shorter than this stay inside a chunk; longer ones are cut out
+MIN_GAP_S = 1.0
+# Silence kept around speech so word onsets / endings are not clipped
+PAD_S = 0.2
+FFPROBE_TIMEOUT = 5
+
+
+def _wav_header_duration(head: bytes) -> Optional[float]:
+    """Duration from a RIFF/WAVE header (byte rate + data chunk size); None if absent or streamed."""
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        chunk_id, size = head[pos:pos + 4], struct.unpack("<I", head[pos + 4:pos + 8])[0]
+        if chunk_id == b"fmt " and pos + 16 <= len(head):
+            byte_rate = struct.unpack("<I", head[pos + 16:pos + 20])[0] if pos + 20 <= len(head) else None
+        elif chunk_id == b"data":
+            # 0 / 0xFFFFFFFF: size unknown (streamed recorder output)
+            if not byte_rate or size in (0, 0xFFFFFFFF):
+                return None
+            return size / byte_rate
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _ffprobe_duration(path: str) -> Optional[float]:
+    if shutil.which("ffprobe") is None:
+        return None
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+            capture_output=True, text=True, timeout=FFPROBE_TIMEOUT,
+        )
+        return float(json.loads(proc.stdout)["format"]["duration"])
+    except (subprocess.TimeoutExpired, OSError, ValueError, KeyError, TypeError):
+        return None  # "N/A" duration, unreadable file, ffprobe missing/stuck
+
+
+def probe_duration(path: str, head: bytes = b"") -> Optional[float]:
+    """Seconds of audio according to the file's header, without decoding; None if unknown."""
+    duration = _wav_header_duration(head)
+    if duration is not None:
+        return duration
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+        if info.frames > 0 and info.samplerate > 0:
+            return info.frames / info.samplerate
+    except Exception:
+        pass  # not a libsndfile format (webm, m4a) or libsndfile too old for mp3
+    return _ffprobe_duration(path)
+
+
+def _frame_rms(y, frame: int):
+    import numpy as np
+    n = len(y) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = y[: n * frame].reshape(n, frame).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def speech_chunks(
+    y, sr: int = 16000, max_chunk_s: float = 30.0, min_gap_s: float = MIN_GAP_S, pad_s: float = PAD_S
+) -> List[List[Tuple[int, int]]]:
+    """
+    Speech in y as chunks of (start, end) sample ranges, in order. Concatenating one chunk's ranges
+    gives at most max_chunk_s of audio (Whisper's 30 s window), so each chunk costs one encoder pass.
+    Empty list if y is all silence.
+    """
+    import numpy as np
+    frame = max(1, int(sr * FRAME_MS / 1000))
+    rms = _frame_rms(y, frame)
+    if len(rms) == 0 or rms.max() <= 0:
+        return []
+    threshold = max(rms.max() * 10 ** (REL_DB / 20), 10 ** (FLOOR_DB / 20))
+    voiced = np.flatnonzero(rms >= threshold)
+    if len(voiced) == 0:
+        return []
+
+    # Runs of voiced frames, merged across pauses shorter than min_gap_s, padded on both sides
+    max_gap = max(1, int(min_gap_s * 1000 / FRAME_MS))
+    breaks = np.flatnonzero(np.diff(voiced) > max_gap)
+    starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+    pad = int(pad_s * 1000 / FRAME_MS)
+    regions = []
+    limit = max(1, int(max_chunk_s * 1000 / FRAME_MS))
+    for start, end in zip(starts, ends):
+        start, end = max(0, start - pad), min(len(rms), end + pad)
+        # Longer than one window: cut at the quietest frame of the window's second half
+        while end - start > limit:
+            cut = start + limit // 2 + int(np.argmin(rms[start + limit // 2:start + limit]))
+            regions.append((start, cut))
+            start = cut
+        regions.append((start, end))
+
+    # Pack regions greedily into chunks of at most limit frames
+    chunks: List[List[Tuple[int, int]]] = []
+    used = limit
+    for start, end in regions:
+        if used + (end - start) > limit:
+            chunks.append([])
+            used = 0
+        chunks[-1].append((start, end))
+        used += end - start
+    last = len(rms)
+    # Frame ranges -> samples; a region reaching the last full frame also takes the partial tail
+    return [[(int(s * frame), len(y) if e == last else int(e * frame)) for s, e in chunk] for chunk in chunks]